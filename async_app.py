@@ -0,0 +1,467 @@
+"""Asyncio variant of mock.py: same endpoints, validation and rate limits.
+
+Each worker serves many requests concurrently instead of blocking on
+Nominatim, Gemini and Chroma. Reverse geocoding and the embedding call of
+an add run in parallel, HTTP clients are shared and pooled, and the
+(synchronous) Chroma client runs in worker threads so it never blocks the
+event loop.
+
+Run with:  hypercorn async_app:app --bind 0.0.0.0:5001
+"""
+from quart import Quart, Response, g, request, jsonify
+from quart_rate_limiter import RateLimiter, RateLimit, rate_exempt, rate_limit
+from dotenv import load_dotenv
+from datetime import timedelta
+from typing import Dict, Any
+import asyncio
+import codecs
+import os
+import time
+import uuid
+import httpx
+
+import metrics
+from bulk_ingest import ingest, iter_records
+from embedding_cache import cache_from_env, cache_key as embedding_key
+from ingest_queue import job_processor, queue_from_env, workers_from_env
+from metrics import stage
+from geo import payload_coordinates
+from offline_geocoder import geocoder_from_env
+from photo_matcher import attach_photos as match_photos
+from opportunities import (
+    build_metadata, bulk_body, cache_query, cached_query, degrade, ndjson_lines, needs_embedding,
+    parse_bulk_options, parse_filter_args, parse_n, parse_query, query_body, select_docs, validate_payload,
+)
+from quantization import normalize_vector
+from resilience import UpstreamUnavailable, request_deadline_from_env, start_deadline
+from query_cache import query_cache_from_env
+from services import Services, register_gauges
+from similar import DEFAULT_N as SIMILAR_N
+from suggest import DEFAULT_N as SUGGEST_N, TOP_K as SUGGEST_TOP_K
+from singleflight import SingleFlight
+
+# ----------------- Load environment -----------------
+load_dotenv()
+
+# ----------------- Quart setup -----------------
+app = Quart(__name__)
+app.json.ensure_ascii = False  # allow Polish chars
+
+# Budget shared by all upstream calls of a request (see resilience.py)
+REQUEST_DEADLINE = request_deadline_from_env()
+
+# Per-stage timing (see metrics.py)
+@app.before_request
+async def start_timing():
+    g.started = time.perf_counter()
+    metrics.start_request()
+    start_deadline(REQUEST_DEADLINE)
+
+# Security headers middleware (also emits Server-Timing and request metrics)
+@app.after_request
+async def apply_security_headers(response):
+    response.headers["X-Content-Type-Options"] = "nosniff"
+    response.headers["X-Frame-Options"] = "DENY"
+    response.headers["X-XSS-Protection"] = "1; mode=block"
+    response.headers["Content-Security-Policy"] = "default-src 'self'"
+    if "started" in g:
+        elapsed = time.perf_counter() - g.started
+        response.headers["Server-Timing"] = metrics.server_timing(total=elapsed)
+        metrics.finish_request(request.endpoint or "unmatched", request.method, response.status_code, elapsed)
+    return response
+
+# Rate limiter (prevent abuse)
+limiter = RateLimiter(app, default_limits=[RateLimit(60, timedelta(minutes=1))])
+
+# ----------------- Initialize clients -----------------
+# Chroma/Gemini clients, collection and search backend are created on first use (see services.py)
+services = Services()
+embedding_cache = cache_from_env()
+query_cache = query_cache_from_env()
+geocoder = geocoder_from_env()
+# Queued adds (see ingest_queue.py); None keeps /add_opportunity synchronous
+ingest_queue = queue_from_env()
+# Concurrent identical calls share one upstream round trip (see singleflight.py)
+embed_flight, search_flight, geocode_flight = SingleFlight(), SingleFlight(), SingleFlight()
+register_gauges(lambda: services, embedding_cache, query_cache, geocoder,
+                {"embed": embed_flight, "search": search_flight, "geocode": geocode_flight}, ingest_queue)
+
+EMBEDDING_MODEL = "gemini-embedding-001"
+# Matryoshka truncation (e.g. 768); the collection must be embedded at the same size
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM") or 0) or None
+EMBEDDING_CONFIG = {"output_dimensionality": EMBEDDING_DIM} if EMBEDDING_DIM else None
+# Cache namespace: vectors of different sizes must not be mixed
+EMBEDDING_KEY = f"{EMBEDDING_MODEL}@{EMBEDDING_DIM}" if EMBEDDING_DIM else EMBEDDING_MODEL
+NOMINATIM_URL = os.getenv("NOMINATIM_URL", "https://nominatim.openstreetmap.org/reverse")
+GEOCODER = os.getenv("GEOCODER", "offline")  # offline | hybrid (offline, then Nominatim) | nominatim
+QUERY_MODE = os.getenv("QUERY_MODE", "semantic")  # default ranking for text=: semantic | lexical | hybrid
+
+# Shared, pooled HTTP client (opened/closed with the server)
+http_client: httpx.AsyncClient = None
+event_loop: asyncio.AbstractEventLoop = None
+
+@app.before_serving
+async def open_clients():
+    global http_client, event_loop
+    http_client = httpx.AsyncClient(
+        timeout=httpx.Timeout(5.0),
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+        headers={"User-Agent": "FlaskApp"},
+    )
+    event_loop = asyncio.get_running_loop()
+    if services.setting("WARM_UP", "1") != "0":
+        services.start_warm_up()
+    if ingest_workers is not None:
+        ingest_workers.start()  # worker threads reach the loop through _run_on_loop
+
+@app.after_serving
+async def close_clients():
+    await http_client.aclose()
+
+# ----------------- API Key Auth -----------------
+API_KEY = os.getenv("API_KEY") or "super-secret-key"
+
+def require_api_key():
+    key = request.headers.get("x-api-key")
+    if not key or key != API_KEY:
+        return jsonify({"error": "Unauthorized"}), 401
+
+# ----------------- Helpers -----------------
+def _embedding_values(result) -> list[list[float]]:
+    vectors = [e.values for e in result.embeddings]
+    # Only the full-size output comes normalized
+    return [normalize_vector(v) for v in vectors] if EMBEDDING_DIM else vectors
+
+async def _embed_remote(text: str) -> list[float]:
+    # Hedged: a second call goes out if the first is slow (EMBED_HEDGE_MS); the loser is cancelled
+    result = await services.upstreams["gemini"].call_async(
+        lambda: services.gemini_client.aio.models.embed_content(
+            model=EMBEDDING_MODEL, contents=text, config=EMBEDDING_CONFIG
+        ),
+        hedge=True
+    )
+    return _embedding_values(result)[0]
+
+async def generate_embedding(text: str) -> list[float]:
+    with stage("embed"):
+        return await embed_flight.do_async(
+            embedding_key(EMBEDDING_KEY, text),
+            lambda: embedding_cache.get_or_compute_async(EMBEDDING_KEY, text, _embed_remote)
+        )
+
+async def _embed_remote_batch(texts: list[str]) -> list[list[float]]:
+    result = await services.upstreams["gemini"].call_async(
+        lambda: services.gemini_client.aio.models.embed_content(
+            model=EMBEDDING_MODEL, contents=texts, config=EMBEDDING_CONFIG
+        )
+    )
+    return _embedding_values(result)
+
+async def _nominatim_city(lat: float, lon: float) -> str:
+    """Use OpenStreetMap Nominatim to get city from coordinates."""
+    params = {"lat": lat, "lon": lon, "format": "json", "zoom": 10}
+    upstream = services.upstreams["nominatim"]
+
+    async def fetch():
+        resp = await http_client.get(NOMINATIM_URL, params=params)
+        resp.raise_for_status()
+        return resp.json()
+
+    try:
+        data = await upstream.call_async(fetch)
+        return data.get("address", {}).get("city") or data.get("address", {}).get("town") or "Unknown"
+    except Exception:
+        return "Unknown"
+
+async def _nominatim_city_shared(lat: float, lon: float) -> str:
+    """Concurrent lookups of the same point share one Nominatim request."""
+    return await geocode_flight.do_async((round(lat, 5), round(lon, 5)), lambda: _nominatim_city(lat, lon))
+
+async def get_city_from_coords(lat: float, lon: float) -> str:
+    """Resolve city from the bundled gazetteer; Nominatim only when GEOCODER asks for it."""
+    with stage("geocode"):
+        if GEOCODER == "nominatim":
+            return await _nominatim_city_shared(lat, lon)
+        city = geocoder.lookup(round(lat, 5), round(lon, 5))
+        if city is None and GEOCODER == "hybrid":
+            return await _nominatim_city_shared(lat, lon)
+        return city or "Unknown"
+
+async def get_payload_city(data: Dict[str, Any]) -> str:
+    """City of an add payload's lat/lon; offers without a place have none."""
+    point = payload_coordinates(data)
+    return await get_city_from_coords(*point) if point else ""
+
+def _run_on_loop(coro):
+    """Run a coroutine on the server loop from a worker thread (used by bulk ingest)."""
+    return asyncio.run_coroutine_threadsafe(coro, event_loop).result()
+
+class BodyReader:
+    """
+    Blocking `read()` over the request body's chunks as they arrive, for
+    bulk_ingest.iter_records in a worker thread; the body is never held whole.
+    """
+
+    def __init__(self, body):
+        self._chunks = body.__aiter__()
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+
+    def read(self, size: int = -1) -> str:
+        # A chunk may end inside a multi-byte character: keep reading until
+        # there is text, since "" means end of input to the parser
+        while True:
+            try:
+                chunk = _run_on_loop(self._chunks.__anext__())
+            except StopAsyncIteration:
+                return self._decoder.decode(b"", final=True)
+            text = self._decoder.decode(chunk)
+            if text:
+                return text
+
+def generate_embeddings(texts: list[str]) -> list[list[float]]:
+    """Blocking (worker thread); the Gemini calls run on the server loop."""
+    return embedding_cache.get_or_compute_many(
+        EMBEDDING_KEY, texts, lambda missing: _run_on_loop(_embed_remote_batch(missing))
+    )
+
+def attach_photos(records, metadatas) -> None:
+    """Blocking, best effort; call via asyncio.to_thread."""
+    match_photos(services.photo_matcher, records, metadatas, generate_embeddings)
+
+def ingest_records(records, **options) -> Dict[str, Any]:
+    """Blocking; call via asyncio.to_thread."""
+    return ingest(
+        records,
+        backend=services.search_backend,
+        validate=validate_payload,
+        build_metadata=lambda data: build_metadata(
+            data, _run_on_loop(get_payload_city(data))
+        ),
+        embed_batch=generate_embeddings,
+        enrich=attach_photos,
+        **options
+    )
+
+# Blocking (worker thread): store a batch of queued adds
+process_jobs = job_processor(ingest_records, query_cache.bump)
+ingest_workers = workers_from_env(ingest_queue, process_jobs) if ingest_queue is not None else None
+
+# ----------------- Endpoint: Add -----------------
+@app.route("/add_opportunity", methods=["POST"])
+@rate_limit(10, timedelta(minutes=1))
+async def add_opportunity():
+    auth = require_api_key()
+    if auth: return auth
+
+    data = await request.get_json(silent=True) or {}
+    validation = validate_payload(data)
+    if validation:
+        return jsonify(validation), 400
+
+    if ingest_queue is not None:
+        with stage("enqueue"):
+            job = await asyncio.to_thread(ingest_queue.enqueue, data)
+        return jsonify(job), 202, {"Location": f"/jobs/{job['job_id']}"}
+
+    record_id = str(uuid.uuid4())
+
+    try:
+        # Geocoding and embedding are independent, run them together
+        city, embedding = await asyncio.gather(
+            get_payload_city(data),
+            generate_embedding(data["description"]),
+        )
+        metadata = build_metadata(data, city)
+        await asyncio.to_thread(attach_photos, [data], [metadata])
+        with stage("store"):
+            await asyncio.to_thread(
+                services.search_backend.add,
+                documents=[data["description"]],
+                metadatas=[metadata],
+                ids=[record_id],
+                embeddings=[embedding]
+            )
+        query_cache.bump()
+        return jsonify({"status": "success", "record_id": record_id}), 200
+    except UpstreamUnavailable as e:
+        return jsonify({"status": "error", "message": str(e)}), 503
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+# ----------------- Endpoint: Bulk add -----------------
+@app.route("/add_opportunities/bulk", methods=["POST"])
+@rate_limit(2, timedelta(minutes=1))
+async def add_opportunities_bulk():
+    auth = require_api_key()
+    if auth: return auth
+
+    # A load takes as long as it takes: no request budget, only per-call timeouts
+    start_deadline(None)
+
+    options, error = parse_bulk_options(request.args)
+    if error:
+        return jsonify(error), 400
+
+    try:
+        with stage("ingest"):
+            report = await asyncio.to_thread(ingest_records, iter_records(BodyReader(request.body)), **options)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": f"Malformed input: {e}"}), 400
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+    if report["inserted"]:
+        query_cache.bump()
+    return jsonify(bulk_body(report)), 200
+
+# ----------------- Endpoint: Query -----------------
+@app.route("/query", methods=["GET"])
+@rate_limit(30, timedelta(minutes=1))
+async def query_opportunities():
+    auth = require_api_key()
+    if auth: return auth
+
+    # Serialized responses, invalidated by every write (see query_cache.py)
+    slot, cached = cached_query(query_cache, request.args)
+    if cached is not None:
+        return Response(cached[0], mimetype=cached[1], headers={"X-Cache": "HIT"})
+
+    query, error = parse_query(request.args, QUERY_MODE)
+    if error:
+        return jsonify(error), 400
+
+    try:
+        search_backend = await asyncio.to_thread(lambda: services.search_backend)
+        embedding = None
+        if needs_embedding(query):
+            try:
+                embedding = await generate_embedding(query["text"])
+            except Exception as e:
+                degrade(query, search_backend, e)
+        # Store reads (and the lazy scans behind `docs`) run in worker threads
+        docs = await asyncio.to_thread(
+            select_docs, query, search_backend, embedding, search_flight,
+            embedding_key(EMBEDDING_KEY, query["text"] or ""),
+        )
+
+        if query["page"]["format"] == "ndjson":
+            lines = ndjson_lines(docs, query["page"])
+
+            async def stream():
+                while (line := await asyncio.to_thread(next, lines, None)) is not None:
+                    yield line
+
+            return Response(stream(), mimetype="application/x-ndjson")
+
+        body = await asyncio.to_thread(query_body, query, docs)
+        with stage("serialize"):
+            response = jsonify(body)
+        if cache_query(query_cache, slot, query, await response.get_data(), response.mimetype):
+            response.headers["X-Cache"] = "MISS"
+        return response, 200
+
+    except UpstreamUnavailable as e:
+        return jsonify({"error": str(e)}), 503
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# ----------------- Endpoint: Facets -----------------
+@app.route("/facets", methods=["GET"])
+async def facet_counts():
+    """
+    Query args: the /query filters (see query_filters.FILTER_ARGS). Offers per
+    tag, form, workload and city within that selection (see facets.py).
+    """
+    auth = require_api_key()
+    if auth: return auth
+
+    query_args, error = parse_filter_args(request.args)
+    if error:
+        return jsonify(error), 400
+    try:
+        with stage("facets"):
+            body = await asyncio.to_thread(lambda: services.search_backend.facets.counts(query_args))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    return jsonify(body), 200
+
+# ----------------- Endpoint: Similar -----------------
+@app.route("/opportunities/<record_id>/similar", methods=["GET"])
+async def similar_opportunities(record_id):
+    """Query args: n (default 10, at most SIMILAR_K). Served from the precomputed graph (similar.py)."""
+    auth = require_api_key()
+    if auth: return auth
+
+    n, error = parse_n(request.args, SIMILAR_N)
+    if error:
+        return jsonify(error), 400
+    try:
+        with stage("similar"):
+            graph = await asyncio.to_thread(lambda: services.search_backend.similar)
+            results = graph.similar(record_id, min(n, graph.k))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    if results is None:
+        return jsonify({"error": "Unknown opportunity"}), 404
+    return jsonify({"id": record_id, "count": len(results), "results": results}), 200
+
+# ----------------- Endpoint: Suggest -----------------
+@app.route("/suggest", methods=["GET"])
+@rate_limit(600, timedelta(minutes=1))
+async def suggest_values():
+    """
+    Query args: q (prefix typed so far), n (default 8, at most 20). Most
+    popular titles, organisers and cities with a word starting with q,
+    Polish letters folded (see suggest.py).
+    """
+    auth = require_api_key()
+    if auth: return auth
+
+    q = request.args.get("q", "")
+    n, error = parse_n(request.args, SUGGEST_N, SUGGEST_TOP_K)
+    if error:
+        return jsonify(error), 400
+    try:
+        with stage("suggest"):
+            index = await asyncio.to_thread(lambda: services.search_backend.suggest)
+            suggestions = index.suggest(q, n)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    return jsonify({"q": q, "suggestions": suggestions}), 200
+
+# ----------------- Endpoint: Jobs -----------------
+@app.route("/jobs/<job_id>", methods=["GET"])
+@rate_limit(120, timedelta(minutes=1))  # clients poll this
+async def job_status(job_id):
+    """Status of a queued /add_opportunity (see ingest_queue.py)."""
+    auth = require_api_key()
+    if auth: return auth
+
+    job = await asyncio.to_thread(ingest_queue.get, job_id) if ingest_queue is not None else None
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(job), 200
+
+# ----------------- Endpoint: Metrics -----------------
+@app.route("/metrics", methods=["GET"])
+@rate_exempt
+async def prometheus_metrics():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+# ----------------- Endpoint: Health -----------------
+@app.route("/healthz", methods=["GET"])
+@rate_exempt
+async def healthz():
+    """Liveness: the process is up (never touches Chroma or Gemini)."""
+    return jsonify({"status": "ok"}), 200
+
+@app.route("/readyz", methods=["GET"])
+@rate_exempt
+async def readyz():
+    """Readiness: 200 once clients are connected and indexes primed, 503 until then."""
+    ready, body = services.readiness()
+    return jsonify(body), 200 if ready else 503
+
+# ----------------- Run -----------------
+if __name__ == "__main__":
+    app.run(host="0.0.0.0", port=5001, debug=False)
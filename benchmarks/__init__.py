@@ -0,0 +1,16 @@
+"""Offline benchmark and load-test suite for the Flask app (mock.py).
+
+Chroma, Gemini and Nominatim are replaced by in-process stand-ins with
+configurable injected latency (`benchmarks.fakes`), the store is seeded
+from `output_data.json` scaled up synthetically (`benchmarks.corpus`), and
+`benchmarks.run` drives `/add_opportunity` and every `/query` mode,
+writing a JSON report (p50/p95/p99 latency, throughput, peak RSS).
+Reports from two commits can be compared with `benchmarks.compare`.
+Narrower benchmarks on the same corpus: `benchmarks.filters` (filter
+evaluation), `benchmarks.geocoder` (offline reverse geocoder) and
+`benchmarks.embeddings` (recall vs. size of the embedding profiles).
+
+    python -m benchmarks.run --offers 10000 --output before.json
+    python -m benchmarks.run --offers 10000 --output after.json
+    python -m benchmarks.compare before.json after.json
+"""
@@ -0,0 +1,120 @@
+"""Cold-start timings of mock.py, each run in a fresh interpreter.
+
+    python -m benchmarks.cold_start [--runs 5] [--connect-ms 800] [--chroma-ms 20]
+        [--gemini-ms 80] [--output report.json]
+
+Two start-up paths are measured, wall clock from process spawn:
+
+  lazy  - WARM_UP=0, the first /query is sent right after import and pays
+          for every client it needs
+  warm  - WARM_UP=1 (the default), the platform waits for /readyz and only
+          then sends the first /query
+
+Reported per path (median over runs, ms): `import` (module imported and
+`create_app()` returned), `healthz`, `readyz` (warm only), `first_query`
+(first successful /query answered) and `first_query_request` (that
+request alone). The fakes import both SDKs before the app does, so
+`import` includes them here; in production the app loads them lazily or
+in the warm-up thread.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List
+
+from benchmarks import fakes
+from benchmarks.run import git_commit
+
+PATHS = ("lazy", "warm")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def child(path: str, spawned: float, args) -> Dict[str, float]:
+    os.environ.update({
+        "API_KEY": "benchmark",
+        "GOOGLE_GENAI_KEY": "fake",
+        "WARM_UP": "1" if path == "warm" else "0",
+        "EMBEDDING_CACHE_SIZE": "0",
+        "QUERY_CACHE_SIZE": "0",
+    })
+    for var in ("EMBEDDING_CACHE_PATH", "QUERY_CACHE_PATH", "VECTOR_INDEX_PATH"):
+        os.environ.pop(var, None)
+    fakes.install()
+    fakes.LATENCY.update({
+        "connect": args.connect_ms / 1000, "chroma": args.chroma_ms / 1000, "gemini": args.gemini_ms / 1000,
+    })
+
+    def since_spawn() -> float:
+        return round((time.time() - spawned) * 1000, 1)
+
+    import mock
+
+    mock.limiter.enabled = False
+    client = mock.create_app().test_client()
+    timings = {"import": since_spawn()}
+    if client.get("/healthz").status_code == 200:
+        timings["healthz"] = since_spawn()
+    if path == "warm":
+        while client.get("/readyz").status_code != 200:
+            time.sleep(0.01)
+        timings["readyz"] = since_spawn()
+    started = time.perf_counter()
+    response = client.get("/query", query_string={"text": "pomoc dzieciom"}, headers={"x-api-key": mock.API_KEY})
+    if response.status_code != 200:
+        raise SystemExit(f"/query failed: {response.status_code} {response.get_data(as_text=True)}")
+    timings["first_query"] = since_spawn()
+    timings["first_query_request"] = round((time.perf_counter() - started) * 1000, 1)
+    return timings
+
+
+def measure(path: str, args) -> List[Dict[str, float]]:
+    runs = []
+    for _ in range(args.runs):
+        command = [
+            sys.executable, "-m", "benchmarks.cold_start", "--child", path, "--spawned", repr(time.time()),
+            "--connect-ms", str(args.connect_ms), "--chroma-ms", str(args.chroma_ms),
+            "--gemini-ms", str(args.gemini_ms),
+        ]
+        result = subprocess.run(command, capture_output=True, text=True, check=True, cwd=ROOT)
+        runs.append(json.loads(result.stdout.strip().splitlines()[-1]))
+    return runs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--connect-ms", type=float, default=800.0, help="Chroma Cloud client handshake")
+    parser.add_argument("--chroma-ms", type=float, default=20.0)
+    parser.add_argument("--gemini-ms", type=float, default=80.0)
+    parser.add_argument("--output", help="write the JSON report here as well as to stdout")
+    parser.add_argument("--child", choices=PATHS, help=argparse.SUPPRESS)
+    parser.add_argument("--spawned", type=float, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(child(args.child, args.spawned, args)))
+        return
+
+    paths: Dict[str, Any] = {}
+    for path in PATHS:
+        runs = measure(path, args)
+        paths[path] = {key: round(statistics.median(run[key] for run in runs), 1) for key in runs[0]}
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "config": {k: v for k, v in vars(args).items() if k not in ("child", "spawned")},
+        "median_ms": paths,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""Compare two benchmark reports scenario by scenario.
+
+    python -m benchmarks.compare before.json after.json
+
+Prints each metric with its relative change (negative latency / positive
+throughput deltas are improvements).
+"""
+import argparse
+import json
+
+METRICS = ["p50_ms", "p95_ms", "p99_ms", "throughput_rps"]
+
+
+def delta(before, after) -> str:
+    if not before or after is None:
+        return "n/a"
+    return f"{(after - before) / before * 100:+.1f}%"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("before")
+    parser.add_argument("after")
+    args = parser.parse_args()
+
+    with open(args.before, encoding="utf-8") as f:
+        before = json.load(f)
+    with open(args.after, encoding="utf-8") as f:
+        after = json.load(f)
+
+    print(f"{before.get('commit')} -> {after.get('commit')}")
+    print(f"{'scenario':<16}" + "".join(f"{m:>28}" for m in METRICS))
+    for name in sorted(set(before["scenarios"]) | set(after["scenarios"])):
+        old, new = before["scenarios"].get(name, {}), after["scenarios"].get(name, {})
+        cells = [f"{old.get(m)} -> {new.get(m)} ({delta(old.get(m), new.get(m))})" for m in METRICS]
+        print(f"{name:<16}" + "".join(f"{c:>28}" for c in cells))
+    print(f"{'peak_rss_mb':<16}{before.get('peak_rss_mb')} -> {after.get('peak_rss_mb')} "
+          f"({delta(before.get('peak_rss_mb'), after.get('peak_rss_mb'))})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Benchmark corpus: output_data.json, scaled up synthetically.
+
+Synthetic offers are copies of the real ones with a numbered title, a
+varied description, jittered coordinates and shifted dates, so the filter
+selectivity and text lengths stay close to the real data.
+"""
+import json
+import os
+import random
+import uuid
+from datetime import date, timedelta
+from typing import Any, Dict, Iterator, List
+
+from geo import payload_coordinates
+from opportunities import validate_payload
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "output_data.json")
+
+
+def load_records(path: str = DATA_PATH) -> List[Dict[str, Any]]:
+    """Records from the export that the API would accept (online offers have no lat/lon)."""
+    with open(path, encoding="utf-8") as f:
+        records = json.load(f)
+    return [r for r in records if not validate_payload(r)]
+
+
+def offline_city(geocoder, record: Dict[str, Any]) -> str:
+    """The city stored for `record` with GEOCODER=offline ("" without coordinates)."""
+    point = payload_coordinates(record)
+    if point is None:
+        return ""
+    return geocoder.lookup(round(point[0], 5), round(point[1], 5)) or "Unknown"
+
+
+def _jitter(value, delta: float):
+    return None if value is None else float(value) + delta
+
+
+def _shift(day: str, days: int) -> str:
+    try:
+        return (date.fromisoformat(day) + timedelta(days=days)).isoformat()
+    except ValueError:
+        return day
+
+
+def scaled(records: List[Dict[str, Any]], count: int, seed: int = 0) -> Iterator[Dict[str, Any]]:
+    """`count` offers: the originals first, then numbered synthetic variants."""
+    rnd = random.Random(seed)
+    for i in range(count):
+        base = records[i % len(records)]
+        if i < len(records):
+            yield dict(base)
+            continue
+        shift = rnd.randrange(-120, 120)
+        yield {
+            **base,
+            "uuid": str(uuid.UUID(int=rnd.getrandbits(128))),
+            "title": f"{base['title']} #{i}",
+            "description": f"{base['description']}\n\n(Edycja {i}, {rnd.choice(records)['title']})",
+            "lat": _jitter(base["lat"], rnd.uniform(-0.05, 0.05)),
+            "lon": _jitter(base["lon"], rnd.uniform(-0.05, 0.05)),
+            "start_date": _shift(base["start_date"], shift),
+            "end_date": _shift(base["end_date"], shift),
+        }
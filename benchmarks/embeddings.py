@@ -0,0 +1,148 @@
+"""Recall@25 vs. memory/latency of the embedding storage profiles.
+
+Embeds the bundled offers (output_data.json descriptions) and the queries
+(benchmark phrases plus every offer title) once at full size, then derives
+each profile from those vectors: the first `dim` values re-normalized
+(what `output_dimensionality=dim` returns) and, optionally, int8 or
+binary codes for the candidate search with exact re-ranking (see
+quantization.py). Recall@25 is measured against exact search on the
+full-size vectors.
+
+    python -m benchmarks.embeddings [--fake] [--records 217] [--dims 3072,1536,768,256]
+        [--rerank-factor 4] [--output report.json]
+
+Without `--fake` the vectors come from Gemini through the embedding cache
+(GOOGLE_GENAI_KEY, EMBEDDING_CACHE_PATH), so re-runs cost no API calls.
+`--fake` uses the hash-seeded vectors of `benchmarks.fakes`; they have no
+semantic structure, so use it to check the script and the timings, not
+the recall. `--records` above the bundled count pads the corpus with
+near-duplicates of the real vectors (base + noise), to see the trends at
+a larger scale.
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+from typing import Callable, List
+
+import numpy as np
+from dotenv import load_dotenv
+
+from benchmarks.corpus import load_records
+from benchmarks.fakes import fake_vector
+from benchmarks.run import TEXT_QUERIES, git_commit
+from embedding_cache import cache_from_env
+from quantization import QUANTIZATIONS, normalize_rows, truncate
+from vector_index import LocalVectorIndex
+
+EMBEDDING_MODEL = "gemini-embedding-001"
+FULL_DIM = 3072
+K = 25
+EMBED_BATCH = 100
+
+
+def gemini_embedder() -> Callable[[List[str]], List[List[float]]]:
+    from google import genai
+
+    client = genai.Client(api_key=os.getenv("GOOGLE_GENAI_KEY"))
+    cache = cache_from_env()
+
+    def embed_remote(texts: List[str]) -> List[List[float]]:
+        result = client.models.embed_content(model=EMBEDDING_MODEL, contents=texts)
+        return [e.values for e in result.embeddings]
+
+    def embed(texts: List[str]) -> List[List[float]]:
+        vectors = []
+        for start in range(0, len(texts), EMBED_BATCH):
+            vectors.extend(cache.get_or_compute_many(EMBEDDING_MODEL, texts[start:start + EMBED_BATCH], embed_remote))
+        return vectors
+
+    return embed
+
+
+def fake_embedder() -> Callable[[List[str]], List[List[float]]]:
+    return lambda texts: [fake_vector(text, FULL_DIM) for text in texts]
+
+
+def padded(vectors: np.ndarray, count: int, seed: int = 0) -> np.ndarray:
+    """`count` rows: the real vectors, then noisy copies of them."""
+    if count <= len(vectors):
+        return vectors[:count]
+    rng = np.random.default_rng(seed)
+    base = vectors[rng.integers(0, len(vectors), count - len(vectors))]
+    noise = rng.standard_normal(base.shape).astype(np.float32) * (0.5 / np.sqrt(vectors.shape[1]))
+    return np.vstack([vectors, normalize_rows(base + noise)])
+
+
+def build(vectors: np.ndarray, quantization: str, rerank_factor: int) -> LocalVectorIndex:
+    index = LocalVectorIndex(quantization=quantization, rerank_factor=rerank_factor)
+    ids = [str(i) for i in range(len(vectors))]
+    index.add(ids, vectors, [""] * len(ids), [{} for _ in ids])
+    return index
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fake", action="store_true", help="hash-seeded vectors instead of Gemini")
+    parser.add_argument("--records", type=int, help="corpus size (default: the bundled offers)")
+    parser.add_argument("--dims", default="3072,1536,768,256")
+    parser.add_argument("--rerank-factor", type=int, default=4)
+    parser.add_argument("--output", help="write the JSON report here as well as to stdout")
+    args = parser.parse_args()
+    load_dotenv()
+
+    records = load_records()
+    queries = TEXT_QUERIES + [r["title"] for r in records]
+    embed = fake_embedder() if args.fake else gemini_embedder()
+    started = time.perf_counter()
+    corpus = normalize_rows(np.asarray(embed([r["description"] for r in records]), dtype=np.float32))
+    query_vectors = normalize_rows(np.asarray(embed(queries), dtype=np.float32))
+    embed_s = time.perf_counter() - started
+    corpus = padded(corpus, args.records or len(corpus))
+
+    exact = build(corpus, "none", 1)
+    truth = [set(exact.query([q], K)["ids"][0]) for q in query_vectors]
+
+    profiles = []
+    for dim in (int(d) for d in args.dims.split(",")):
+        stored, asked = truncate(corpus, dim), truncate(query_vectors, dim)
+        for quantization in QUANTIZATIONS:
+            index = build(stored, quantization, args.rerank_factor)
+            recalls, timings = [], []
+            for query, expected in zip(asked, truth):
+                started = time.perf_counter()
+                found = index.query([query], K)["ids"][0]
+                timings.append((time.perf_counter() - started) * 1000)
+                recalls.append(len(expected.intersection(found)) / len(expected))
+            nbytes = index.nbytes
+            profiles.append({
+                "dim": dim,
+                "quantization": quantization,
+                f"recall@{K}": round(statistics.mean(recalls), 4),
+                "bytes_per_vector": round((nbytes["codes"] or nbytes["vectors"]) / len(corpus), 1),
+                "vectors_mb": round(nbytes["vectors"] / 2**20, 3),
+                "codes_mb": round(nbytes["codes"] / 2**20, 3),
+                "query_ms_p50": round(statistics.median(timings), 3),
+                "query_ms_p95": round(float(np.percentile(timings, 95)), 3),
+            })
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "embeddings": "fake" if args.fake else EMBEDDING_MODEL,
+        "records": len(corpus),
+        "queries": len(queries),
+        "embed_s": round(embed_s, 1),
+        "rerank_factor": args.rerank_factor,
+        "profiles": profiles,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""In-process stand-ins for Chroma Cloud, Gemini and Nominatim.
+
+`install()` must run before `mock` is imported: it swaps
+`chromadb.CloudClient` for an ephemeral in-memory client, `genai.Client`
+for a client returning deterministic hash-seeded vectors, and routes
+requests to `FAKE_NOMINATIM_URL` to a canned reverse-geocoding answer.
+Every call sleeps for the latency configured in `LATENCY` (seconds), which
+can be changed at any time (e.g. zeroed while seeding). Faults for the
+resilience scenarios: `TAIL[service] = (p, seconds)` makes a fraction p of
+the calls take `seconds` instead, and `FAILING[service] = True` makes every
+call raise ConnectionError (after its latency).
+"""
+import hashlib
+import random
+import time
+import types
+from typing import List
+
+import numpy as np
+
+FAKE_NOMINATIM_URL = "http://nominatim.fake/reverse"
+LATENCY = {"connect": 0.0, "chroma": 0.0, "gemini": 0.0, "nominatim": 0.0}
+CALLS = {"connect": 0, "chroma": 0, "gemini": 0, "nominatim": 0}
+TAIL = {"connect": None, "chroma": None, "gemini": None, "nominatim": None}
+FAILING = {"connect": False, "chroma": False, "gemini": False, "nominatim": False}
+DIM = 768
+
+# Collection calls that are a network round trip against Chroma Cloud
+_CHROMA_CALLS = {"add", "upsert", "update", "delete", "get", "query", "count", "peek"}
+
+
+_tail_rnd = random.Random(0)
+
+
+def _latency(service: str) -> float:
+    CALLS[service] += 1
+    tail = TAIL[service]
+    if tail and _tail_rnd.random() < tail[0]:
+        return tail[1]
+    return LATENCY[service]
+
+
+def _fail(service: str) -> None:
+    if FAILING[service]:
+        raise ConnectionError(f"fake {service} is down")
+
+
+def _wait(service: str) -> None:
+    latency = _latency(service)
+    if latency:
+        time.sleep(latency)
+    _fail(service)
+
+
+def fake_vector(text: str, dim: int = None) -> List[float]:
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    return np.random.default_rng(seed).standard_normal(dim or DIM).astype(np.float32).tolist()
+
+
+# ----------------- Chroma -----------------
+class SlowCollection:
+    """Proxy adding `LATENCY["chroma"]` to every round-trip call of a real collection."""
+
+    def __init__(self, collection):
+        self._collection = collection
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if name not in _CHROMA_CALLS:
+            return attr
+
+        def call(*args, **kwargs):
+            _wait("chroma")
+            return attr(*args, **kwargs)
+
+        return call
+
+
+class FakeCloudClient:
+    def __init__(self, **kwargs):
+        import chromadb
+
+        _wait("connect")  # Cloud client handshake (tenant/database checks)
+        self._client = chromadb.EphemeralClient()
+
+    def get_or_create_collection(self, name: str, **kwargs):
+        return SlowCollection(self._client.get_or_create_collection(name=name, **kwargs))
+
+
+# ----------------- Gemini -----------------
+def _embed_response(contents, config=None):
+    texts = contents if isinstance(contents, list) else [contents]
+    # Like Matryoshka outputs: a smaller size is a prefix of the full vector
+    dim = (config or {}).get("output_dimensionality")
+    return types.SimpleNamespace(embeddings=[types.SimpleNamespace(values=fake_vector(t)[:dim]) for t in texts])
+
+
+class _Models:
+    def embed_content(self, model: str, contents, config=None):
+        _wait("gemini")
+        return _embed_response(contents, config)
+
+
+class _AsyncModels:
+    async def embed_content(self, model: str, contents, config=None):
+        import asyncio
+
+        await asyncio.sleep(_latency("gemini"))
+        _fail("gemini")
+        return _embed_response(contents, config)
+
+
+class FakeGenaiClient:
+    def __init__(self, **kwargs):
+        self.models = _Models()
+        self.aio = types.SimpleNamespace(models=_AsyncModels())
+
+
+# ----------------- Nominatim -----------------
+class _FakeResponse:
+    status_code = 200
+
+    def __init__(self, payload):
+        self._payload = payload
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._payload
+
+
+def install(dim: int = DIM) -> None:
+    """Patch the client libraries; call before importing mock."""
+    global DIM
+    DIM = dim
+
+    import chromadb
+    import requests
+    from google import genai
+
+    chromadb.CloudClient = FakeCloudClient
+    genai.Client = FakeGenaiClient
+
+    real_get = requests.get
+
+    def get(url, *args, **kwargs):
+        if not str(url).startswith(FAKE_NOMINATIM_URL):
+            return real_get(url, *args, **kwargs)
+        _wait("nominatim")
+        return _FakeResponse({"address": {"city": "Warszawa"}})
+
+    requests.get = get
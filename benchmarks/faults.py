@@ -0,0 +1,149 @@
+"""Fault scenarios for the upstream deadlines, hedging and circuit breakers.
+
+    python -m benchmarks.faults [--offers 2000] [--requests 200] [--concurrency 8]
+        [--chroma-ms 20] [--gemini-ms 80] [--tail-p 0.05] [--tail-ms 1000]
+        [--hedge-ms 150] [--chroma-timeout-ms 200] [--deadline-ms 1000]
+        [--output report.json]
+
+Drives semantic `/query` requests against a fake-backed mock.py while the
+fakes misbehave (see fakes.TAIL / fakes.FAILING):
+
+  gemini_tail_unhedged / gemini_tail_hedged
+                  - a fraction tail-p of embedding calls takes tail-ms;
+                    hedging off vs on (EMBED_HEDGE_MS = hedge-ms)
+  chroma_slow     - every Chroma call takes 3x the Chroma timeout
+  chroma_down     - every Chroma call fails
+  gemini_down     - every embedding call fails
+
+Reported per scenario: status codes, responses by `mode` / degraded,
+p50/p95/p99 and the upstream calls made, plus the upstream counters
+(timeouts, breaker state, hedges) at the end. Once a breaker opens the
+upstream call count must stop growing and latency drop to the local path.
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+from benchmarks import corpus, fakes
+from benchmarks.run import TEXT_QUERIES, git_commit, percentiles_ms, seed_store
+
+
+def drive(mock, app, total: int, concurrency: int) -> Dict[str, Any]:
+    headers = {"x-api-key": mock.API_KEY}
+    local = threading.local()
+    latencies: List[float] = []
+    outcomes: Counter = Counter()
+    lock = threading.Lock()
+    calls_before = dict(fakes.CALLS)
+
+    def one(i: int) -> None:
+        if not hasattr(local, "client"):
+            local.client = app.test_client()
+        # A distinct text per request: no embedding single-flight between them
+        text = f"{TEXT_QUERIES[i % len(TEXT_QUERIES)]} {i}"
+        started = time.perf_counter()
+        response = local.client.get("/query", query_string={"text": text, "mode": "semantic"}, headers=headers)
+        body = response.get_json(silent=True) or {}
+        elapsed = time.perf_counter() - started
+        outcome = f"{response.status_code} {body.get('mode', '-')}{' degraded' if body.get('degraded') else ''}"
+        with lock:
+            latencies.append(elapsed)
+            outcomes[outcome] += 1
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(total)))
+    return {
+        "outcomes": dict(outcomes),
+        **percentiles_ms(latencies),
+        "upstream_calls": {k: fakes.CALLS[k] - calls_before[k] for k in ("chroma", "gemini")},
+        "upstreams": {name: upstream.stats() for name, upstream in mock.services.upstreams.items()},
+    }
+
+
+def reset(mock, latency: Dict[str, float]) -> None:
+    """Healthy fakes, closed breakers, zeroed counters."""
+    from resilience import CircuitBreaker
+
+    fakes.LATENCY.update(latency)
+    fakes.TAIL.update({service: None for service in fakes.TAIL})
+    fakes.FAILING.update({service: False for service in fakes.FAILING})
+    for upstream in mock.services.upstreams.values():
+        upstream.breaker = CircuitBreaker(upstream.breaker.failures, upstream.breaker.reset_s)
+        upstream.calls = upstream.timeouts = upstream.rejected = upstream.hedges = upstream.hedge_wins = 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--offers", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--chroma-ms", type=float, default=20.0)
+    parser.add_argument("--gemini-ms", type=float, default=80.0)
+    parser.add_argument("--tail-p", type=float, default=0.05)
+    parser.add_argument("--tail-ms", type=float, default=1000.0)
+    parser.add_argument("--hedge-ms", type=float, default=150.0)
+    parser.add_argument("--chroma-timeout-ms", type=float, default=200.0)
+    parser.add_argument("--deadline-ms", type=float, default=1000.0)
+    parser.add_argument("--output", help="write the JSON report here as well as to stdout")
+    args = parser.parse_args()
+
+    os.environ.update({
+        "API_KEY": "benchmark",
+        "GOOGLE_GENAI_KEY": "fake",
+        "WARM_UP": "0",
+        "SEARCH_BACKEND": "chroma",
+        "EMBEDDING_CACHE_SIZE": "0",
+        "QUERY_CACHE_SIZE": "0",
+        "EMBED_HEDGE_MS": str(args.hedge_ms),
+        "GEMINI_TIMEOUT_MS": str(args.deadline_ms),
+        "REQUEST_DEADLINE_MS": str(args.deadline_ms),
+        "BREAKER_RESET_MS": "600000",  # stays open for the rest of a scenario
+    })
+    for var in ("EMBEDDING_CACHE_PATH", "QUERY_CACHE_PATH", "VECTOR_INDEX_PATH", "INGEST_QUEUE_PATH"):
+        os.environ.pop(var, None)
+
+    fakes.install()
+    import mock
+
+    mock.limiter.enabled = False
+    app = mock.create_app()
+    seed_store(mock, list(corpus.scaled(corpus.load_records(), args.offers)))
+    # Seeding writes large batches; the short timeout is for the scenarios
+    mock.services.upstreams["chroma"].timeout_s = args.chroma_timeout_ms / 1000
+    mock.services.search_backend.lexical  # in memory, so Chroma outages degrade to lexical
+    healthy = {"chroma": args.chroma_ms / 1000, "gemini": args.gemini_ms / 1000}
+    gemini = mock.services.upstreams["gemini"]
+    tail = (args.tail_p, args.tail_ms / 1000)
+
+    results = {}
+    for name in ("gemini_tail_unhedged", "gemini_tail_hedged", "chroma_slow", "chroma_down", "gemini_down"):
+        reset(mock, healthy)
+        gemini.hedge_after_s = args.hedge_ms / 1000 if name == "gemini_tail_hedged" else None
+        if name.startswith("gemini_tail"):
+            fakes.TAIL["gemini"] = tail
+        elif name == "chroma_slow":
+            fakes.LATENCY["chroma"] = 3 * args.chroma_timeout_ms / 1000
+        else:
+            fakes.FAILING[name.split("_")[0]] = True
+        results[name] = drive(mock, app, args.requests, args.concurrency)
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "config": vars(args),
+        "scenarios": results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
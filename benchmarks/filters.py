@@ -0,0 +1,91 @@
+"""Benchmark /query filter evaluation: per-row `matches_where` vs columnar masks.
+
+Builds the metadata of `--records` offers from the benchmark corpus
+(output_data.json scaled up, see benchmarks.corpus; cities from the
+offline geocoder), then times a set of typical filter combinations both
+ways and checks that they select the same rows. Geo filters are also
+timed through the grid index (only the rows of the overlapping cells are
+masked).
+
+    python -m benchmarks.filters [--records 100000] [--repeat 5]
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from benchmarks import corpus
+from benchmarks.run import git_commit
+from columnar import MetadataColumns
+from geo import GridIndex, bbox_from_where
+from offline_geocoder import ReverseGeocoder
+from opportunities import ALLOWED_FORM, build_metadata
+from query_filters import compile_where, matches_where
+
+QUERIES = {
+    "tag": {"tags": "Zdrowie"},
+    "dates": {"start_date_from": "2025-03-01", "end_date_to": "2025-09-30"},
+    "combined": {"tags": "Zdrowie", "form": ALLOWED_FORM[2], "start_date_from": "2025-06-01"},
+    "radius": {"lat": "52.23", "lon": "21.01", "radius_km": "5"},
+    "radius_tag": {"lat": "54.35", "lon": "18.65", "radius_km": "10", "tags": "Zdrowie"},
+}
+
+
+def corpus_metadata(count: int) -> list:
+    geocoder = ReverseGeocoder.from_csv()
+    return [
+        build_metadata(r, corpus.offline_city(geocoder, r))
+        for r in corpus.scaled(corpus.load_records(), count)
+    ]
+
+
+def best_ms(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return round(min(timings), 3)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    metadatas = corpus_metadata(args.records)
+
+    started = time.perf_counter()
+    columns = MetadataColumns.from_metadatas(metadatas)
+    grid = GridIndex.from_metadatas(metadatas)
+    build_ms = (time.perf_counter() - started) * 1000
+
+    def grid_rows(where, bbox):
+        candidates = grid.rows_in_bbox(bbox)
+        return candidates[columns.mask(where, metadatas, candidates)]
+
+    report = {"commit": git_commit(), "records": args.records, "columns_build_ms": round(build_ms, 1), "queries": {}}
+    for name, query_args in QUERIES.items():
+        where = compile_where(query_args)
+        rows = np.flatnonzero(columns.mask(where, metadatas))
+        expected = [i for i, m in enumerate(metadatas) if matches_where(m, where)]
+        if rows.tolist() != expected:
+            raise AssertionError(f"{name}: columnar and per-row filters disagree")
+        report["queries"][name] = {
+            "matches": len(expected),
+            "per_row_ms": best_ms(lambda: [m for m in metadatas if matches_where(m, where)], args.repeat),
+            "columnar_ms": best_ms(lambda: np.flatnonzero(columns.mask(where, metadatas)), args.repeat),
+        }
+        bbox = bbox_from_where(where)
+        if bbox is not None:
+            if grid_rows(where, bbox).tolist() != expected:
+                raise AssertionError(f"{name}: grid and per-row filters disagree")
+            report["queries"][name]["grid_ms"] = best_ms(lambda: grid_rows(where, bbox), args.repeat)
+
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
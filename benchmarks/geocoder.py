@@ -0,0 +1,94 @@
+"""Benchmark the offline reverse geocoder on the coordinates of the benchmark corpus.
+
+Reports index build time, per-lookup latency with a cold and a warm LRU,
+and the resolved city distribution. With --nominatim it also asks
+Nominatim (1 request/s, per its usage policy) and reports the agreement.
+
+    python -m benchmarks.geocoder [--data output_data.json] [--records N] [--nominatim]
+
+`--records` above the bundled count adds the jittered synthetic offers of
+benchmarks.corpus, so most lookups miss the LRU.
+"""
+import argparse
+import json
+import statistics
+import time
+from collections import Counter
+
+import requests
+
+from benchmarks import corpus
+from benchmarks.run import git_commit
+from offline_geocoder import ReverseGeocoder
+
+
+def nominatim_city(lat: float, lon: float) -> str:
+    resp = requests.get(
+        "https://nominatim.openstreetmap.org/reverse",
+        params={"lat": lat, "lon": lon, "format": "json", "zoom": 10},
+        headers={"User-Agent": "FlaskApp"},
+        timeout=10,
+    )
+    resp.raise_for_status()
+    address = resp.json().get("address", {})
+    return address.get("city") or address.get("town") or "Unknown"
+
+
+def timed_lookups(geocoder: ReverseGeocoder, coords) -> list:
+    timings = []
+    for lat, lon in coords:
+        started = time.perf_counter()
+        geocoder.lookup(lat, lon)
+        timings.append((time.perf_counter() - started) * 1e6)
+    return timings
+
+
+def summary_us(timings: list) -> dict:
+    q = statistics.quantiles(timings, n=100)
+    return {"mean": round(statistics.fmean(timings), 2), "p50": round(q[49], 2), "p99": round(q[98], 2)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data", default=corpus.DATA_PATH)
+    parser.add_argument("--records", type=int, help="corpus size (default: the bundled offers)")
+    parser.add_argument("--nominatim", action="store_true", help="compare against Nominatim")
+    args = parser.parse_args()
+
+    records = corpus.load_records(args.data)
+    records = list(corpus.scaled(records, args.records or len(records)))
+    coords = [(round(r["lat"], 5), round(r["lon"], 5)) for r in records if r["lat"] is not None]
+
+    started = time.perf_counter()
+    geocoder = ReverseGeocoder.from_csv()
+    build_ms = (time.perf_counter() - started) * 1000
+
+    cold = timed_lookups(geocoder, coords)
+    geocoder.lookup.cache_clear()
+    cold = [*cold, *timed_lookups(geocoder, coords)]
+    warm = timed_lookups(geocoder, coords)
+    cities = Counter(geocoder.lookup(lat, lon) or "Unknown" for lat, lon in coords)
+
+    report = {
+        "commit": git_commit(),
+        "coordinates": len(coords),
+        "places_indexed": len(geocoder.names),
+        "build_ms": round(build_ms, 1),
+        "cold_lookup_us": summary_us(cold),
+        "warm_lookup_us": summary_us(warm),
+        "top_cities": cities.most_common(15),
+    }
+
+    if args.nominatim:
+        agree = 0
+        for lat, lon in coords:
+            if nominatim_city(lat, lon) == (geocoder.lookup(lat, lon) or "Unknown"):
+                agree += 1
+            time.sleep(1)
+        report["nominatim_agreement"] = round(agree / len(coords), 3)
+
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
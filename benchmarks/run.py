@@ -0,0 +1,217 @@
+"""Seed a fake-backed mock.py and benchmark /add_opportunity and /query.
+
+    python -m benchmarks.run [--offers 10000] [--requests 200] [--concurrency 8]
+        [--chroma-ms 20] [--gemini-ms 80] [--nominatim-ms 0] [--dim 768]
+        [--search-backend chroma] [--ingest-queue] [--output report.json]
+
+Embedding and query caches are off by default so every request pays the
+(fake) upstream latency; pass --keep-caches to measure with them.
+With --ingest-queue, /add_opportunity only enqueues (202, see
+ingest_queue.py); the report adds how long the workers took to drain it.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List
+
+from benchmarks import corpus, fakes
+
+SEED_BATCH = 1000
+TEXT_QUERIES = [
+    "pomoc dzieciom w szpitalu", "hospicjum", "sprzątanie lasu", "schronisko dla zwierząt",
+    "korepetycje dla młodzieży", "wsparcie seniorów", "festiwal kultury", "rowerowa masa krytyczna",
+    "zbiórka żywności", "edukacja ekologiczna",
+]
+
+
+# ----------------- Setup -----------------
+def seed_store(mock, records: List[Dict[str, Any]]) -> None:
+    """Write the corpus straight through the search backend, in large batches."""
+    for start in range(0, len(records), SEED_BATCH):
+        batch = records[start:start + SEED_BATCH]
+        mock.services.search_backend.add(
+            ids=[r["uuid"] for r in batch],
+            embeddings=[fakes.fake_vector(r["description"]) for r in batch],
+            documents=[r["description"] for r in batch],
+            metadatas=[mock.build_record_metadata(r) for r in batch],
+        )
+
+
+def scenarios(mock, records: List[Dict[str, Any]]) -> Dict[str, Callable[[Any, random.Random], Any]]:
+    """name -> request(client, rnd); every /query mode plus adds."""
+    headers = {"x-api-key": mock.API_KEY}
+    located = [r for r in records if r["lat"] is not None]
+    tags = sorted({t for r in records for t in r["tags"]})
+    cities = sorted({m["Lokalizacja"] for m in mock.services.collection.get(limit=500, include=["metadatas"])["metadatas"]})
+
+    def query(params):
+        return lambda client, rnd: client.get("/query", query_string=params(rnd), headers=headers)
+
+    def near(record):
+        return {"lat": record["lat"], "lon": record["lon"], "radius_km": "10", "sort": "distance"}
+
+    def add(client, rnd):
+        payload = {k: v for k, v in rnd.choice(records).items() if k != "uuid"}
+        return client.post("/add_opportunity", json=payload, headers=headers)
+
+    return {
+        "query_text": query(lambda rnd: {"text": rnd.choice(TEXT_QUERIES), "mode": "semantic"}),
+        "query_lexical": query(lambda rnd: {"text": rnd.choice(TEXT_QUERIES), "mode": "lexical"}),
+        "query_hybrid": query(lambda rnd: {"text": rnd.choice(TEXT_QUERIES), "mode": "hybrid"}),
+        "query_filter": query(lambda rnd: {"tags": rnd.choice(tags)}),
+        "query_location": query(lambda rnd: {"location": rnd.choice(cities)}),
+        "query_dates": query(lambda rnd: {"start_date_from": "2025-10-01", "end_date_to": "2025-12-31"}),
+        "query_radius": query(lambda rnd: near(rnd.choice(located))),
+        "query_combined": query(lambda rnd: {
+            "text": rnd.choice(TEXT_QUERIES), "tags": rnd.choice(tags), "start_date_from": "2025-09-01",
+        }),
+        "add": add,
+    }
+
+
+# ----------------- Driver -----------------
+def percentiles_ms(latencies: List[float]) -> Dict[str, float]:
+    if len(latencies) < 2:
+        value = round(latencies[0] * 1000, 2) if latencies else None
+        return {"p50_ms": value, "p95_ms": value, "p99_ms": value}
+    q = statistics.quantiles(latencies, n=100)
+    return {f"p{p}_ms": round(q[p - 1] * 1000, 2) for p in (50, 95, 99)}
+
+
+def drive(app, request: Callable, total: int, concurrency: int, seed: int = 0) -> Dict[str, Any]:
+    local = threading.local()
+    latencies: List[float] = []
+    errors = 0
+    lock = threading.Lock()
+
+    def one(i: int) -> None:
+        nonlocal errors
+        if not hasattr(local, "client"):
+            local.client = app.test_client()
+        started = time.perf_counter()
+        response = request(local.client, random.Random(seed * 100003 + i))
+        response.get_data()
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            if response.status_code not in (200, 202):
+                errors += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(total)))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": total,
+        "errors": errors,
+        "throughput_rps": round(total / elapsed, 1),
+        **percentiles_ms(latencies),
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--offers", type=int, default=10_000)
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--chroma-ms", type=float, default=20.0)
+    parser.add_argument("--gemini-ms", type=float, default=80.0)
+    parser.add_argument("--nominatim-ms", type=float, default=0.0)
+    parser.add_argument("--dim", type=int, default=fakes.DIM)
+    parser.add_argument("--search-backend", default="chroma", choices=["chroma", "local"])
+    parser.add_argument("--geocoder", default="offline", choices=["offline", "hybrid", "nominatim"])
+    parser.add_argument("--scenario", action="append", help="run only these scenarios (repeatable)")
+    parser.add_argument("--keep-caches", action="store_true")
+    parser.add_argument("--ingest-queue", action="store_true", help="queued adds (202 + background workers)")
+    parser.add_argument("--output", help="write the JSON report here as well as to stdout")
+    args = parser.parse_args()
+
+    os.environ.update({
+        "API_KEY": "benchmark",
+        "GOOGLE_GENAI_KEY": "fake",
+        "NOMINATIM_URL": fakes.FAKE_NOMINATIM_URL,
+        "GEOCODER": args.geocoder,
+        "SEARCH_BACKEND": args.search_backend,
+        "WARM_UP": "0",  # the store is seeded after import; indexes are built on first use
+    })
+    if not args.keep_caches:
+        os.environ.update({"EMBEDDING_CACHE_SIZE": "0", "QUERY_CACHE_SIZE": "0"})
+        for var in ("EMBEDDING_CACHE_PATH", "QUERY_CACHE_PATH"):
+            os.environ.pop(var, None)
+    os.environ.pop("VECTOR_INDEX_PATH", None)
+    os.environ.pop("INGEST_QUEUE_PATH", None)
+    if args.ingest_queue:
+        os.environ["INGEST_QUEUE_PATH"] = os.path.join(tempfile.mkdtemp(), "ingest_queue.db")
+
+    fakes.install(dim=args.dim)
+    import mock
+
+    mock.limiter.enabled = False
+    app = mock.create_app()
+    records = list(corpus.scaled(corpus.load_records(), args.offers))
+    started = time.perf_counter()
+    seed_store(mock, records)
+    seed_s = time.perf_counter() - started
+    if args.search_backend == "local":
+        # The local index was built from the empty collection before seeding
+        mock.services.search_backend.index.sync_from_collection(mock.services.collection)
+
+    fakes.LATENCY.update({
+        "chroma": args.chroma_ms / 1000, "gemini": args.gemini_ms / 1000, "nominatim": args.nominatim_ms / 1000,
+    })
+    results = {}
+    for name, request in scenarios(mock, records).items():
+        if args.scenario and name not in args.scenario:
+            continue
+        results[name] = drive(app, request, args.requests, args.concurrency)
+        if name == "add" and mock.ingest_queue is not None:
+            started = time.perf_counter()
+            while mock.ingest_queue.stats()["queued"] or mock.ingest_queue.stats()["running"]:
+                time.sleep(0.05)
+            results[name]["drain_s"] = round(time.perf_counter() - started, 2)
+            results[name]["jobs"] = mock.ingest_queue.stats()
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "config": vars(args),
+        "seed_s": round(seed_s, 2),
+        "scenarios": results,
+        "upstream_calls": dict(fakes.CALLS),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
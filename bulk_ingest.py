@@ -0,0 +1,222 @@
+"""Bulk loading of opportunities (JSON array or NDJSON).
+
+Records are streamed from the input, validated, and processed in chunks:
+descriptions go to the embedder in batches (several batches in flight at
+once) and each chunk is written with a single `collection.add`. Records
+carrying a `uuid` (as in `output_data.json`) keep it as their id, and ids
+already in the collection are skipped, so re-running a load is a no-op.
+
+CLI:
+    python bulk_ingest.py output_data.json [--embed-batch-size 50]
+        [--write-batch-size 250] [--concurrency 4]
+"""
+import json
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, IO, Iterable, Iterator, List, Optional
+
+from resilience import is_transient
+
+DEFAULT_EMBED_BATCH_SIZE = 50
+DEFAULT_WRITE_BATCH_SIZE = 250
+DEFAULT_CONCURRENCY = 4
+
+
+# ----------------- Input -----------------
+def iter_records(stream: IO, chunk_size: int = 1 << 16) -> Iterator[Any]:
+    """
+    Yield records from a text stream holding either a JSON array or NDJSON,
+    without reading the whole input into memory.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    eof = False
+
+    def fill() -> bool:
+        nonlocal buffer, eof
+        if eof:
+            return False
+        chunk = stream.read(chunk_size)
+        if isinstance(chunk, bytes):
+            chunk = chunk.decode("utf-8")
+        if not chunk:
+            eof = True
+            return False
+        buffer += chunk
+        return True
+
+    # Skip leading whitespace / BOM to see which format we have
+    while True:
+        buffer = buffer.lstrip("\ufeff \t\r\n")
+        if buffer or not fill():
+            break
+    if not buffer:
+        return
+
+    in_array = buffer[0] == "["
+    if in_array:
+        buffer = buffer[1:]
+
+    while True:
+        buffer = buffer.lstrip(" \t\r\n,")
+        if in_array and buffer.startswith("]"):
+            return
+        if not buffer:
+            if fill():
+                continue
+            return
+        try:
+            record, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            if fill():
+                continue
+            raise
+        buffer = buffer[end:]
+        yield record
+
+
+def batched(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    batch: List[Any] = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# ----------------- Ingestion -----------------
+def ingest(
+    records: Iterable[Any],
+    backend,
+    validate: Callable[[Dict[str, Any]], Dict[str, str]],
+    build_metadata: Callable[[Dict[str, Any]], Dict[str, Any]],
+    embed_batch: Callable[[List[str]], List[List[float]]],
+    enrich: Optional[Callable[[List[Dict[str, Any]], List[Dict[str, Any]]], None]] = None,
+    embed_batch_size: int = DEFAULT_EMBED_BATCH_SIZE,
+    write_batch_size: int = DEFAULT_WRITE_BATCH_SIZE,
+    concurrency: int = DEFAULT_CONCURRENCY,
+) -> Dict[str, Any]:
+    """
+    Load `records` into `backend` (a search_backend backend). Returns a report
+    with inserted/skipped counts, per-record errors and throughput. Each error
+    says whether it is `retryable` (an upstream outage, see
+    resilience.is_transient) or will fail again (e.g. validation).
+    `enrich(records, metadatas)` may add fields to each chunk's metadata in place
+    just before it is written (used for photo matching).
+    """
+    started = time.perf_counter()
+    report: Dict[str, Any] = {"received": 0, "inserted": 0, "skipped": 0, "errors": []}
+    seen: set = set()
+
+    def fail(index: int, record_id: Any, message: str, error: Optional[Exception] = None) -> None:
+        retryable = error is not None and is_transient(error)
+        report["errors"].append({"index": index, "id": record_id, "error": message, "retryable": retryable})
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        for chunk in batched(enumerate(records), write_batch_size):
+            report["received"] += len(chunk)
+
+            # Validate and drop duplicates (within the run and already stored)
+            candidates = []
+            for index, data in chunk:
+                if not isinstance(data, dict):
+                    fail(index, None, "Record must be a JSON object")
+                    continue
+                record_id = str(data.get("uuid") or uuid.uuid4())
+                validation = validate(data)
+                if validation:
+                    fail(index, record_id, validation["error"])
+                    continue
+                if record_id in seen:
+                    report["skipped"] += 1
+                    continue
+                seen.add(record_id)
+                candidates.append((index, record_id, data))
+
+            try:
+                existing = backend.existing_ids([record_id for _, record_id, _ in candidates])
+            except Exception as e:
+                # Writing without the check could store records twice: fail this chunk, go on
+                for index, record_id, _ in candidates:
+                    fail(index, record_id, f"Duplicate check failed: {e}", e)
+                continue
+            report["skipped"] += len(existing)
+
+            # Build metadata
+            pending = []
+            for index, record_id, data in candidates:
+                if record_id in existing:
+                    continue
+                try:
+                    pending.append((index, record_id, data, build_metadata(data)))
+                except Exception as e:
+                    fail(index, record_id, str(e), e)
+
+            # Embed in parallel batches
+            batches = list(batched(pending, embed_batch_size))
+            futures = [
+                pool.submit(embed_batch, [data["description"] for _, _, data, _ in batch])
+                for batch in batches
+            ]
+            rows = []
+            for batch, future in zip(batches, futures):
+                try:
+                    embeddings = future.result()
+                except Exception as e:
+                    for index, record_id, _, _ in batch:
+                        fail(index, record_id, f"Embedding failed: {e}", e)
+                    continue
+                rows.extend(zip(batch, embeddings))
+
+            if enrich and rows:
+                enrich([data for (_, _, data, _), _ in rows], [metadata for (_, _, _, metadata), _ in rows])
+
+            # One write per chunk
+            if rows:
+                try:
+                    backend.add(
+                        ids=[record_id for (_, record_id, _, _), _ in rows],
+                        embeddings=[embedding for _, embedding in rows],
+                        documents=[data["description"] for (_, _, data, _), _ in rows],
+                        metadatas=[metadata for (_, _, _, metadata), _ in rows],
+                    )
+                    report["inserted"] += len(rows)
+                except Exception as e:
+                    for (index, record_id, _, _), _ in rows:
+                        fail(index, record_id, f"Write failed: {e}", e)
+
+    elapsed = time.perf_counter() - started
+    report["elapsed_s"] = round(elapsed, 3)
+    report["records_per_s"] = round(report["received"] / elapsed, 1) if elapsed > 0 else None
+    return report
+
+
+# ----------------- CLI -----------------
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Bulk-load opportunities into the Chroma collection.")
+    parser.add_argument("path", help="JSON array or NDJSON file")
+    parser.add_argument("--embed-batch-size", type=int, default=DEFAULT_EMBED_BATCH_SIZE)
+    parser.add_argument("--write-batch-size", type=int, default=DEFAULT_WRITE_BATCH_SIZE)
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    args = parser.parse_args()
+
+    import mock
+
+    with open(args.path, encoding="utf-8") as f:
+        result = mock.ingest_records(
+            iter_records(f),
+            embed_batch_size=args.embed_batch_size,
+            write_batch_size=args.write_batch_size,
+            concurrency=args.concurrency,
+        )
+    for error in result["errors"]:
+        print(f"record {error['index']} ({error['id']}): {error['error']}")
+    print(
+        f"received={result['received']} inserted={result['inserted']} skipped={result['skipped']} "
+        f"errors={len(result['errors'])} in {result['elapsed_s']}s ({result['records_per_s']} records/s)"
+    )
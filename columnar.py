@@ -0,0 +1,146 @@
+"""Columnar copy of the filter fields, for evaluating `where` with NumPy.
+
+`LocalVectorIndex` used to run `matches_where` on every metadata dict for
+every filtered request. `MetadataColumns` keeps the derived filter fields
+(see query_filters.py) as arrays, maintained on every add:
+
+    start_day / end_day      - float64 epoch days, NaN when missing
+    lat / lon                - float64 coordinates, NaN when missing
+    location_key             - int32 codes into a per-index vocabulary
+    tag: / form: / workload: - one uint64 bitmask per family, one bit per value
+
+so a compiled `where` becomes a handful of vectorized comparisons. Clauses
+on any other key are still evaluated row by row with `matches_where`. A
+mask can also be computed for a subset of rows only (e.g. the candidates
+of a bounding box from geo.GridIndex).
+"""
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from query_filters import FLAG_FILTERS, matches_where
+
+NUMERIC_FIELDS = ("start_day", "end_day", "lat", "lon")
+MAX_FLAG_VALUES = 64
+
+_COMPARE = {
+    "$eq": np.equal,
+    "$ne": np.not_equal,
+    "$gt": np.greater,
+    "$gte": np.greater_equal,
+    "$lt": np.less,
+    "$lte": np.less_equal,
+}
+
+
+class MetadataColumns:
+    def __init__(self):
+        self._size = 0
+        self.numeric = {field: np.zeros(0, dtype=np.float64) for field in NUMERIC_FIELDS}
+        self.location_codes = np.zeros(0, dtype=np.int32)
+        self.locations: Dict[str, int] = {}
+        self.flag_bits = {prefix: np.zeros(0, dtype=np.uint64) for prefix in FLAG_FILTERS.values()}
+        self.flag_values: Dict[str, Dict[str, int]] = {prefix: {} for prefix in FLAG_FILTERS.values()}
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _reserve(self, size: int) -> None:
+        capacity = len(self.location_codes)
+        if size <= capacity:
+            return
+        new_capacity = max(size, capacity * 2, 64)
+
+        def grow(array, fill):
+            grown = np.full(new_capacity, fill, dtype=array.dtype)
+            grown[:capacity] = array
+            return grown
+
+        self.numeric = {field: grow(column, np.nan) for field, column in self.numeric.items()}
+        self.location_codes = grow(self.location_codes, -1)
+        self.flag_bits = {prefix: grow(bits, 0) for prefix, bits in self.flag_bits.items()}
+
+    def _flag_bit(self, prefix: str, value: str) -> Optional[int]:
+        values = self.flag_values[prefix]
+        if value not in values:
+            if len(values) >= MAX_FLAG_VALUES:
+                return None
+            values[value] = len(values)
+        return values[value]
+
+    # ----------------- Writes -----------------
+    def set(self, row: int, metadata: Dict[str, Any]) -> None:
+        """Write (or overwrite) one row; rows must be filled in order."""
+        self._reserve(row + 1)
+        self._size = max(self._size, row + 1)
+        for field in NUMERIC_FIELDS:
+            value = metadata.get(field)
+            self.numeric[field][row] = value if isinstance(value, (int, float)) else np.nan
+        location = metadata.get("location_key")
+        self.location_codes[row] = self.locations.setdefault(location, len(self.locations)) if location else -1
+        bits = dict.fromkeys(self.flag_bits, 0)
+        for key, value in metadata.items():
+            prefix, sep, flag = key.partition(":")
+            prefix += sep
+            if value is True and prefix in bits:
+                bit = self._flag_bit(prefix, flag)
+                if bit is not None:
+                    bits[prefix] |= 1 << bit
+        for prefix, mask in bits.items():
+            self.flag_bits[prefix][row] = mask
+
+    # ----------------- Predicates -----------------
+    def mask(self, where: Optional[Dict[str, Any]], metadatas: List[Dict[str, Any]],
+             rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Boolean mask for a Chroma `where` expression, over all rows or just `rows`."""
+        size = self._size if rows is None else len(rows)
+        result = np.ones(size, dtype=bool)
+        for key, cond in (where or {}).items():
+            if key == "$and":
+                for clause in cond:
+                    result &= self.mask(clause, metadatas, rows)
+            elif key == "$or":
+                any_of = np.zeros(size, dtype=bool)
+                for clause in cond:
+                    any_of |= self.mask(clause, metadatas, rows)
+                result &= any_of
+            else:
+                result &= self._field_mask(key, cond, metadatas, rows)
+        return result
+
+    def _column(self, column: np.ndarray, rows: Optional[np.ndarray]) -> np.ndarray:
+        return column[:self._size] if rows is None else column[rows]
+
+    def _field_mask(self, key: str, cond: Any, metadatas: List[Dict[str, Any]],
+                    rows: Optional[np.ndarray] = None) -> np.ndarray:
+        size = self._size if rows is None else len(rows)
+        if key in self.numeric and isinstance(cond, dict) and set(cond) <= set(_COMPARE):
+            column = self._column(self.numeric[key], rows)
+            result = np.ones(size, dtype=bool)
+            for op, operand in cond.items():
+                if op == "$ne":
+                    result &= np.isnan(column) | (column != operand)
+                else:
+                    result &= _COMPARE[op](column, operand)
+            return result
+        if key == "location_key" and isinstance(cond, str):
+            return self._column(self.location_codes, rows) == self.locations.get(cond, -2)
+        prefix, sep, flag = key.partition(":")
+        prefix += sep
+        if cond is True and prefix in self.flag_bits and flag in self.flag_values[prefix]:
+            bit = np.uint64(1 << self.flag_values[prefix][flag])
+            return (self._column(self.flag_bits[prefix], rows) & bit) != 0
+        if cond is True and prefix in self.flag_bits and len(self.flag_values[prefix]) < MAX_FLAG_VALUES:
+            # Every value seen so far has a bit, so an unknown one matches nothing
+            return np.zeros(size, dtype=bool)
+        clause = {key: cond}
+        candidates = metadatas[:size] if rows is None else (metadatas[i] for i in rows)
+        return np.fromiter((matches_where(m, clause) for m in candidates), dtype=bool, count=size)
+
+    @classmethod
+    def from_metadatas(cls, metadatas: List[Dict[str, Any]]) -> "MetadataColumns":
+        columns = cls()
+        columns._reserve(len(metadatas))
+        for row, metadata in enumerate(metadatas):
+            columns.set(row, metadata)
+        return columns
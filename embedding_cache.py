@@ -0,0 +1,203 @@
+"""Content-addressed cache for text embeddings.
+
+Embeddings are keyed by (model, hash of normalized text), so repeated
+queries and re-added descriptions skip the Gemini round trip. The
+in-process tier is an LRU with optional TTL; an optional SQLite file
+keeps vectors across restarts and can be shared by several workers.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+
+# ----------------- Keys -----------------
+def normalize_text(text: str) -> str:
+    """NFC-normalize and collapse whitespace so trivially different inputs share a key."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def cache_key(model: str, text: str) -> str:
+    digest = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+    return f"{model}:{digest}"
+
+
+# ----------------- Persistent tier -----------------
+class SQLiteEmbeddingStore:
+    """Stores vectors as packed float32 blobs in a single SQLite table."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY, model TEXT NOT NULL, vector BLOB NOT NULL, created REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str, max_age: Optional[float] = None) -> Optional[list[float]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT vector, created FROM embeddings WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        if max_age is not None and time.time() - row[1] > max_age:
+            return None
+        return array("f", row[0]).tolist()
+
+    def set(self, key: str, model: str, vector: list[float]) -> None:
+        blob = array("f", vector).tobytes()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO embeddings (key, model, vector, created) VALUES (?, ?, ?, ?)",
+                (key, model, blob, time.time()),
+            )
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+
+# ----------------- Cache -----------------
+class EmbeddingCache:
+    """Two-tier (memory LRU + optional persistent store) embedding cache."""
+
+    def __init__(
+        self,
+        max_entries: int = 2048,
+        ttl_seconds: Optional[float] = None,
+        store: Optional[SQLiteEmbeddingStore] = None,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.store = store
+        self._entries: "OrderedDict[str, tuple[float, list[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _get_memory(self, key: str) -> Optional[list[float]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, vector = entry
+            if self.ttl_seconds is not None and time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return vector
+
+    def _put_memory(self, key: str, vector: list[float]) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, model: str, text: str) -> Optional[list[float]]:
+        key = cache_key(model, text)
+        vector = self._get_memory(key)
+        if vector is not None:
+            with self._lock:
+                self.hits += 1
+            return vector
+        if self.store is not None:
+            vector = self.store.get(key, max_age=self.ttl_seconds)
+            if vector is not None:
+                self._put_memory(key, vector)
+                with self._lock:
+                    self.disk_hits += 1
+                return vector
+        return None
+
+    def put(self, model: str, text: str, vector: list[float]) -> None:
+        key = cache_key(model, text)
+        vector = list(vector)
+        self._put_memory(key, vector)
+        if self.store is not None:
+            self.store.set(key, model, vector)
+
+    def get_or_compute(self, model: str, text: str, compute: Callable[[str], list[float]]) -> list[float]:
+        vector = self.get(model, text)
+        if vector is not None:
+            return vector
+        with self._lock:
+            self.misses += 1
+        vector = list(compute(text))
+        self.put(model, text, vector)
+        return vector
+
+    async def get_or_compute_async(self, model: str, text: str, compute) -> list[float]:
+        """Same as get_or_compute, for a coroutine `compute` (asyncio app)."""
+        vector = self.get(model, text)
+        if vector is not None:
+            return vector
+        with self._lock:
+            self.misses += 1
+        vector = list(await compute(text))
+        self.put(model, text, vector)
+        return vector
+
+    def get_or_compute_many(
+        self, model: str, texts: List[str], compute_many: Callable[[List[str]], List[list[float]]]
+    ) -> List[list[float]]:
+        """Batched variant: only the cache misses are sent to `compute_many`, in one call."""
+        vectors: List[Optional[list[float]]] = [self.get(model, text) for text in texts]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            with self._lock:
+                self.misses += len(missing)
+            computed = compute_many([texts[i] for i in missing])
+            for i, vector in zip(missing, computed):
+                vectors[i] = list(vector)
+                self.put(model, texts[i], vectors[i])
+        return vectors
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.disk_hits = self.misses = 0
+        if self.store is not None:
+            self.store.clear()
+
+
+def cache_from_env() -> EmbeddingCache:
+    """
+    EMBEDDING_CACHE_SIZE  - max in-memory entries (default 2048, 0 disables the memory tier)
+    EMBEDDING_CACHE_TTL   - seconds before an entry is recomputed (default: never)
+    EMBEDDING_CACHE_PATH  - SQLite file for the persistent tier (default: memory only)
+    """
+    ttl = os.getenv("EMBEDDING_CACHE_TTL")
+    path = os.getenv("EMBEDDING_CACHE_PATH")
+    return EmbeddingCache(
+        max_entries=int(os.getenv("EMBEDDING_CACHE_SIZE", "2048")),
+        ttl_seconds=float(ttl) if ttl else None,
+        store=SQLiteEmbeddingStore(path) if path else None,
+    )
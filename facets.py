@@ -0,0 +1,130 @@
+"""Facet counts for /facets, from per-value bitmaps.
+
+The filter UI shows, for the current selection, how many offers carry each
+tag, form, workload and city. `FacetIndex` keeps one bitmap per value
+(ALLOWED_TAGS, ALLOWED_FORM, ALLOWED_WORKLOAD and every city seen), bit r
+set when row r has that value, maintained on every add from the derived
+`tag:` / `form:` / `workload:` / `location_key` fields (query_filters.py),
+so the comma-joined display strings are never re-split.
+
+A request compiles the same filter args as /query into a `where`, turns it
+into a selection bitmap (columnar masks, see columnar.py, plus the title /
+location substring and exact radius residuals on the selected rows) and
+gets every count at once: AND of the selection with the stacked value
+bitmaps, then popcount per row.
+"""
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from columnar import MetadataColumns
+from geo import distance_from, parse_geo
+from opportunities import PICKLISTS
+from paging import iter_collection
+from quantization import popcount_rows
+from query_filters import FLAG_FILTERS, SUBSTRING_FILTERS, compile_where, residual_matches
+
+# facet (query arg) -> picklist; the values are the `<prefix><value>` flags
+FACETS = PICKLISTS
+LOCATION_FACET = "location"
+
+
+def pack_mask(mask: np.ndarray, words: int) -> np.ndarray:
+    """Boolean row mask as a bitmap of `words` uint64 words (bit r of the bitmap = row r)."""
+    packed = np.zeros(words * 8, dtype=np.uint8)
+    bits = np.packbits(mask, bitorder="little")
+    packed[:len(bits)] = bits
+    return packed.view("<u8")
+
+
+class FacetIndex:
+    def __init__(self):
+        self.ids: List[str] = []
+        self.metadatas: List[Dict[str, Any]] = []
+        self._rows: Dict[str, int] = {}
+        self.columns = MetadataColumns()
+        self.labels: List[Tuple[str, str]] = []  # bitmap -> (facet, value shown to clients)
+        self._bitmaps: Dict[Tuple[str, str], int] = {}  # (facet, metadata key) -> bitmap
+        self.bitmaps = np.zeros((0, 0), dtype=np.uint64)
+        self._flags = [
+            (FLAG_FILTERS[facet] + value, self._bitmap(facet, FLAG_FILTERS[facet] + value, value))
+            for facet, values in FACETS.items() for value in values
+        ]
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _bitmap(self, facet: str, key: str, label: str) -> int:
+        index = self._bitmaps.get((facet, key))
+        if index is None:
+            index = self._bitmaps[(facet, key)] = len(self.labels)
+            self.labels.append((facet, label))
+            self.bitmaps = np.vstack([self.bitmaps, np.zeros((1, self.bitmaps.shape[1]), dtype=np.uint64)])
+        return index
+
+    def _reserve(self, rows: int) -> None:
+        words = (rows + 63) // 64
+        capacity = self.bitmaps.shape[1]
+        if words > capacity:
+            grown = np.zeros((len(self.bitmaps), max(words, 2 * capacity, 16)), dtype=np.uint64)
+            grown[:, :capacity] = self.bitmaps
+            self.bitmaps = grown
+
+    def _values(self, metadata: Dict[str, Any]) -> List[int]:
+        bitmaps = [index for key, index in self._flags if metadata.get(key) is True]
+        location = metadata.get("location_key")
+        if location:
+            bitmaps.append(self._bitmap(LOCATION_FACET, location, str(metadata.get("Lokalizacja") or location)))
+        return bitmaps
+
+    # ----------------- Writes -----------------
+    def add(self, ids: List[str], metadatas: List[Dict[str, Any]]) -> None:
+        """Insert or replace rows."""
+        with self._lock:
+            self._reserve(len(self.ids) + len(ids))
+            for record_id, metadata in zip(ids, metadatas):
+                row = self._rows.get(record_id)
+                if row is None:
+                    row = self._rows[record_id] = len(self.ids)
+                    self.ids.append(record_id)
+                    self.metadatas.append(metadata)
+                else:
+                    self.metadatas[row] = metadata
+                word, bit = row >> 6, np.uint64(1) << np.uint64(row & 63)
+                self.bitmaps[:, word] &= ~bit
+                for index in self._values(metadata):
+                    self.bitmaps[index, word] |= bit
+                self.columns.set(row, metadata)
+
+    def sync_from_collection(self, collection, batch_size: int = 500) -> None:
+        """Page every record's metadata out of a Chroma collection."""
+        for batch in iter_collection(collection, ["metadatas"], batch_size):
+            self.add(batch["ids"], batch["metadatas"])
+
+    # ----------------- Reads -----------------
+    def _selection(self, query_args: Dict[str, Optional[str]]) -> np.ndarray:
+        mask = self.columns.mask(compile_where(query_args), self.metadatas)
+        geo, _ = parse_geo(query_args)
+        if any(query_args.get(arg) for arg in SUBSTRING_FILTERS) or (geo and geo["radius_km"] is not None):
+            for row in np.flatnonzero(mask):
+                metadata = self.metadatas[row]
+                mask[row] = residual_matches(metadata, query_args) and distance_from(metadata, geo)[0]
+        return pack_mask(mask, self.bitmaps.shape[1])
+
+    def counts(self, query_args: Dict[str, Optional[str]]) -> Dict[str, Any]:
+        """
+        {"total": matching offers, "facets": {facet: {value: count}}} for the
+        /query filter args. Picklist values are listed even at 0, cities only
+        when they match.
+        """
+        with self._lock:
+            selection = self._selection(query_args)
+            counts = popcount_rows(self.bitmaps & selection)
+            total = int(popcount_rows(selection[None, :])[0])
+        facets: Dict[str, Dict[str, int]] = {facet: {} for facet in [*FACETS, LOCATION_FACET]}
+        for (facet, label), count in zip(self.labels, counts.tolist()):
+            if facet != LOCATION_FACET or count:
+                facets[facet][label] = facets[facet].get(label, 0) + count
+        return {"total": total, "facets": facets}
@@ -0,0 +1,267 @@
+"""Radius and bounding-box search on offer coordinates.
+
+Offers keep their `lat`/`lon` in the metadata. /query accepts
+
+    lat, lon, radius_km   - offers within radius_km of the point
+    bbox                  - min_lon,min_lat,max_lon,max_lat (GeoJSON order)
+    sort=distance         - nearest first (needs lat/lon)
+
+and, when lat/lon are given, reports each result's `distance_km`.
+
+Either shape is compiled into a lat/lon range in the `where` clause, so
+Chroma (or the local index) only returns offers inside the bounding box.
+The exact great-circle radius check is done on those candidates. The
+local index also keeps a `GridIndex` (fixed CELL_DEG cells -> rows), so a
+bounding box only looks at the rows of the cells it overlaps instead of
+every row.
+
+Records added before coordinates were stored can be backfilled from the
+original payloads (matched by id, e.g. the `uuid` of `output_data.json`):
+
+    python geo.py output_data.json
+"""
+import math
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEG_LAT = 111.2
+MAX_RADIUS_KM = 1000.0
+CELL_DEG = 0.1
+GEO_ARGS = ["lat", "lon", "radius_km", "bbox", "sort"]
+SORT_ORDERS = ["relevance", "distance"]
+
+BBox = Tuple[float, float, float, float]  # min_lat, min_lon, max_lat, max_lon
+
+
+# ----------------- Distances -----------------
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi, d_lambda = phi2 - phi1, math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def radius_bbox(lat: float, lon: float, radius_km: float) -> BBox:
+    """Smallest lat/lon box containing the circle (clamped at the poles)."""
+    d_lat = radius_km / KM_PER_DEG_LAT
+    cos_lat = math.cos(math.radians(lat))
+    d_lon = 180.0 if cos_lat < 1e-6 else min(180.0, radius_km / (KM_PER_DEG_LAT * cos_lat))
+    return max(-90.0, lat - d_lat), lon - d_lon, min(90.0, lat + d_lat), lon + d_lon
+
+
+def payload_coordinates(data: Dict[str, Any]) -> Optional[Tuple[float, float]]:
+    """
+    (lat, lon) of an add payload, None for an offer without a place (both
+    null, as most online offers are). ValueError for anything else.
+    """
+    lat, lon = data.get("lat"), data.get("lon")
+    if lat is None and lon is None:
+        return None
+    if isinstance(lat, bool) or isinstance(lon, bool):
+        raise ValueError("lat and lon must be numbers, or both null")
+    try:
+        lat, lon = float(lat), float(lon)
+    except (TypeError, ValueError):
+        raise ValueError("lat and lon must be numbers, or both null") from None
+    if not (-90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0):
+        raise ValueError("lat must be within -90..90 and lon within -180..180")
+    return lat, lon
+
+
+def coordinates(metadata: Dict[str, Any]) -> Optional[Tuple[float, float]]:
+    lat, lon = metadata.get("lat"), metadata.get("lon")
+    if isinstance(lat, (int, float)) and isinstance(lon, (int, float)):
+        return float(lat), float(lon)
+    return None
+
+
+# ----------------- Query args -----------------
+def parse_geo(args: Dict[str, Optional[str]]) -> Tuple[Optional[Dict[str, Any]], Dict[str, Any]]:
+    """
+    lat / lon / radius_km / bbox / sort as (geo, error); geo is None when
+    no geo arg was given, else {"center", "radius_km", "bbox", "sort"}.
+    """
+    if not any(args.get(arg) for arg in GEO_ARGS):
+        return None, {}
+    geo: Dict[str, Any] = {"center": None, "radius_km": None, "bbox": None, "sort": args.get("sort") or "relevance"}
+    try:
+        if args.get("lat") or args.get("lon"):
+            lat, lon = float(args.get("lat") or "nan"), float(args.get("lon") or "nan")
+            if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+                return None, {"error": "lat and lon are both required (lat -90..90, lon -180..180)"}
+            geo["center"] = (lat, lon)
+        if args.get("radius_km"):
+            radius = float(args["radius_km"])
+            if geo["center"] is None:
+                return None, {"error": "radius_km requires lat and lon"}
+            if not 0 < radius <= MAX_RADIUS_KM:
+                return None, {"error": f"radius_km must be between 0 and {MAX_RADIUS_KM:g}"}
+            geo["radius_km"] = radius
+            geo["bbox"] = radius_bbox(*geo["center"], radius)
+        if args.get("bbox"):
+            min_lon, min_lat, max_lon, max_lat = (float(v) for v in args["bbox"].split(","))
+            if not (-90 <= min_lat <= max_lat <= 90 and -180 <= min_lon <= max_lon <= 180):
+                return None, {"error": "bbox must be min_lon,min_lat,max_lon,max_lat"}
+            box = (min_lat, min_lon, max_lat, max_lon)
+            geo["bbox"] = box if geo["bbox"] is None else intersect(geo["bbox"], box)
+    except ValueError:
+        return None, {"error": "lat, lon, radius_km and bbox must be numbers (bbox: min_lon,min_lat,max_lon,max_lat)"}
+    if geo["sort"] not in SORT_ORDERS:
+        return None, {"error": "Invalid sort", "allowed": SORT_ORDERS}
+    if geo["sort"] == "distance" and geo["center"] is None:
+        return None, {"error": "sort=distance requires lat and lon"}
+    return geo, {}
+
+
+def intersect(a: BBox, b: BBox) -> BBox:
+    # An empty intersection is an inverted box, which matches nothing
+    return max(a[0], b[0]), max(a[1], b[1]), min(a[2], b[2]), min(a[3], b[3])
+
+
+def geo_clauses(geo: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """`where` clauses for the bounding box (the store can evaluate ranges, not circles)."""
+    if not geo or geo["bbox"] is None:
+        return []
+    min_lat, min_lon, max_lat, max_lon = geo["bbox"]
+    return [
+        {"lat": {"$gte": min_lat}}, {"lat": {"$lte": max_lat}},
+        {"lon": {"$gte": min_lon}}, {"lon": {"$lte": max_lon}},
+    ]
+
+
+def bbox_from_where(where: Optional[Dict[str, Any]]) -> Optional[BBox]:
+    """The lat/lon box ANDed into a compiled `where`, if it has one."""
+    if not where:
+        return None
+    clauses = where["$and"] if "$and" in where else [where]
+    bounds = {"lat": [-90.0, 90.0], "lon": [-180.0, 180.0]}
+    found = False
+    for clause in clauses:
+        for field, cond in clause.items():
+            if field in bounds and isinstance(cond, dict):
+                for op, value in cond.items():
+                    if op in ("$gte", "$gt"):
+                        bounds[field][0] = max(bounds[field][0], value)
+                        found = True
+                    elif op in ("$lte", "$lt"):
+                        bounds[field][1] = min(bounds[field][1], value)
+                        found = True
+    if not found:
+        return None
+    return bounds["lat"][0], bounds["lon"][0], bounds["lat"][1], bounds["lon"][1]
+
+
+def distance_from(metadata: Dict[str, Any], geo: Optional[Dict[str, Any]]) -> Tuple[bool, Optional[float]]:
+    """(matches the exact radius, distance to the center in km or None)."""
+    if not geo or geo["center"] is None:
+        return True, None
+    point = coordinates(metadata)
+    if point is None:
+        return geo["radius_km"] is None, None
+    distance = haversine_km(*geo["center"], *point)
+    return geo["radius_km"] is None or distance <= geo["radius_km"], distance
+
+
+def sort_by_distance(docs: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Nearest first; offers without coordinates last."""
+    return sorted(docs, key=lambda doc: (doc.get("distance_km") is None, doc.get("distance_km") or 0.0))
+
+
+# ----------------- Grid index -----------------
+class GridIndex:
+    """Rows bucketed by CELL_DEG x CELL_DEG lat/lon cell."""
+
+    def __init__(self, cell_deg: float = CELL_DEG):
+        self.cell_deg = cell_deg
+        self._cells: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+        self._arrays: Dict[Tuple[int, int], np.ndarray] = {}  # per-cell rows as arrays, rebuilt lazily
+        self._row_cells: Dict[int, Tuple[int, int]] = {}
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg)
+
+    def set(self, row: int, metadata: Dict[str, Any]) -> None:
+        """Index (or re-index) one row from its metadata; rows without coordinates are dropped."""
+        old = self._row_cells.pop(row, None)
+        if old is not None:
+            self._cells[old].remove(row)
+            self._arrays.pop(old, None)
+        point = coordinates(metadata)
+        if point is not None:
+            cell = self._cell(*point)
+            self._cells[cell].append(row)
+            self._arrays.pop(cell, None)
+            self._row_cells[row] = cell
+
+    def _rows(self, cell: Tuple[int, int]) -> np.ndarray:
+        rows = self._arrays.get(cell)
+        if rows is None:
+            rows = self._arrays[cell] = np.asarray(self._cells[cell], dtype=np.int64)
+        return rows
+
+    def rows_in_bbox(self, bbox: BBox) -> np.ndarray:
+        """Sorted rows of every cell the box overlaps (a superset; check the bounds exactly)."""
+        min_lat, min_lon, max_lat, max_lon = bbox
+        if min_lat > max_lat or min_lon > max_lon:
+            return np.zeros(0, dtype=np.int64)
+        (lat0, lon0), (lat1, lon1) = self._cell(min_lat, min_lon), self._cell(max_lat, max_lon)
+        if (lat1 - lat0 + 1) * (lon1 - lon0 + 1) > len(self._cells):
+            # Large box: walk the occupied cells instead of every cell in range
+            cells = [cell for cell in self._cells if lat0 <= cell[0] <= lat1 and lon0 <= cell[1] <= lon1]
+        else:
+            cells = [(lat, lon) for lat in range(lat0, lat1 + 1) for lon in range(lon0, lon1 + 1)
+                     if self._cells.get((lat, lon))]
+        if not cells:
+            return np.zeros(0, dtype=np.int64)
+        return np.sort(np.concatenate([self._rows(cell) for cell in cells]))
+
+    @classmethod
+    def from_metadatas(cls, metadatas: List[Dict[str, Any]]) -> "GridIndex":
+        grid = cls()
+        for row, metadata in enumerate(metadatas):
+            grid.set(row, metadata)
+        return grid
+
+
+# ----------------- Backfill -----------------
+def backfill_coordinates(collection, records: Iterable[Dict[str, Any]], batch_size: int = 200) -> int:
+    """Copy lat/lon from the original payloads onto stored records (matched by id)."""
+    points = {str(r["uuid"]): payload_coordinates(r) for r in records if r.get("uuid")}
+    points = {record_id: point for record_id, point in points.items() if point is not None}
+    ids = list(points)
+    updated = 0
+    for start in range(0, len(ids), batch_size):
+        batch = collection.get(ids=ids[start:start + batch_size], include=["metadatas"])
+        changed_ids, metadatas = [], []
+        for record_id, metadata in zip(batch["ids"], batch["metadatas"]):
+            lat, lon = points[record_id]
+            if (metadata or {}).get("lat") != lat or metadata.get("lon") != lon:
+                changed_ids.append(record_id)
+                metadatas.append({**(metadata or {}), "lat": lat, "lon": lon})
+        if changed_ids:
+            collection.update(ids=changed_ids, metadatas=metadatas)
+            updated += len(changed_ids)
+    return updated
+
+
+if __name__ == "__main__":
+    import json
+    import os
+    import sys
+
+    import chromadb
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    client = chromadb.CloudClient(
+        api_key=os.getenv("CHROMA_API_KEY"),
+        tenant=os.getenv("CHROMA_TENANT"),
+        database=os.getenv("CHROMA_DATABASE")
+    )
+    with open(sys.argv[1] if len(sys.argv) > 1 else "output_data.json", encoding="utf-8") as f:
+        records = json.load(f)
+    count = backfill_coordinates(client.get_or_create_collection(name="Ogloszenia"), records)
+    print(f"Backfilled coordinates on {count} records")
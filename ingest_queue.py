@@ -0,0 +1,282 @@
+"""Durable queue for /add_opportunity.
+
+With INGEST_QUEUE_PATH set, /add_opportunity only validates the payload,
+stores it as a job in a SQLite file and answers 202 with the job id; its
+latency no longer depends on the geocoder, Gemini or Chroma. Background
+workers claim queued jobs in micro-batches (one embedding call and one
+write per batch, through bulk_ingest.ingest) and retry upstream failures
+(see resilience.is_transient) with exponential backoff; any other error,
+such as an invalid payload, fails the job at once. `GET /jobs/<id>`
+reports the job status:
+
+    queued   - waiting (also between retries)
+    running  - claimed by a worker; put back if its lease runs out (crashed worker)
+    done     - stored under `record_id`
+    failed   - not retryable, or gave up after INGEST_MAX_ATTEMPTS; `error` holds the last error
+
+The record id is chosen when the job is enqueued and used as the Chroma id,
+so a batch retried after a write that did go through is skipped, not
+stored twice. Several processes may share one queue file.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from metrics import stage
+from resilience import is_transient
+
+logger = logging.getLogger(__name__)
+
+JOB_STATUSES = ["queued", "running", "done", "failed"]
+PURGE_INTERVAL_S = 600.0
+
+
+class SQLiteJobQueue:
+    """Jobs table in one SQLite file; claims are atomic across threads and processes."""
+
+    def __init__(self, path: str, lease_seconds: float = 300.0):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY, record_id TEXT NOT NULL, payload TEXT NOT NULL, status TEXT NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0, run_after REAL NOT NULL, error TEXT,"
+            " created REAL NOT NULL, updated REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, run_after)")
+        self.wakeup = threading.Event()
+
+    def enqueue(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        now = time.time()
+        job = {"job_id": str(uuid.uuid4()), "record_id": str(uuid.uuid4()), "status": "queued"}
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, record_id, payload, status, run_after, created, updated)"
+                " VALUES (?, ?, ?, 'queued', ?, ?, ?)",
+                (job["job_id"], job["record_id"], json.dumps(payload, ensure_ascii=False), now, now, now),
+            )
+        self.wakeup.set()
+        return job
+
+    def claim(self, limit: int) -> List[Dict[str, Any]]:
+        """Up to `limit` due jobs, marked running (ready ones first, then expired leases)."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    "SELECT id, record_id, payload, attempts FROM jobs"
+                    " WHERE status IN ('queued', 'running') AND run_after <= ?"
+                    " ORDER BY status = 'running', run_after LIMIT ?",
+                    (now, limit),
+                ).fetchall()
+                self._conn.executemany(
+                    "UPDATE jobs SET status = 'running', attempts = attempts + 1, run_after = ?, updated = ?"
+                    " WHERE id = ?",
+                    [(now + self.lease_seconds, now, row[0]) for row in rows],
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return [
+            {"job_id": job_id, "record_id": record_id, "payload": json.loads(payload), "attempts": attempts + 1}
+            for job_id, record_id, payload, attempts in rows
+        ]
+
+    def complete(self, job_ids: List[str]) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE jobs SET status = 'done', error = NULL, updated = ? WHERE id = ?",
+                [(now, job_id) for job_id in job_ids],
+            )
+
+    def retry(self, job_id: str, error: str, delay: Optional[float]) -> None:
+        """Back to queued after `delay` seconds, or failed for good when `delay` is None."""
+        now = time.time()
+        with self._lock:
+            if delay is None:
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'failed', error = ?, updated = ? WHERE id = ?", (error, now, job_id)
+                )
+            else:
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'queued', error = ?, run_after = ?, updated = ? WHERE id = ?",
+                    (error, now + delay, now, job_id),
+                )
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT record_id, status, attempts, error, created, updated FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        record_id, status, attempts, error, created, updated = row
+        job = {"job_id": job_id, "status": status, "attempts": attempts, "created": created, "updated": updated}
+        if status == "done":
+            job["record_id"] = record_id
+        if error:
+            job["error"] = error
+        return job
+
+    def purge(self, max_age: float) -> int:
+        """Delete done/failed jobs last updated more than `max_age` seconds ago."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM jobs WHERE status IN ('done', 'failed') AND updated < ?", (time.time() - max_age,)
+            )
+        return cursor.rowcount
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            counts = dict(self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        return {status: counts.get(status, 0) for status in JOB_STATUSES}
+
+
+class IngestWorkers:
+    """
+    Daemon threads draining a `SQLiteJobQueue`.
+
+    `process(jobs)` stores a batch and returns {job_id: (error, retryable)}
+    for the jobs that failed (empty when all were stored). An exception fails
+    the whole batch. Retryable failures are retried after
+    backoff_s * 2**(attempt-1) seconds (capped at max_backoff_s) until
+    max_attempts; the others are marked failed right away.
+    """
+
+    def __init__(
+        self,
+        queue: SQLiteJobQueue,
+        process: Callable[[List[Dict[str, Any]]], Dict[str, Tuple[str, bool]]],
+        workers: int = 2,
+        batch_size: int = 32,
+        linger_s: float = 0.02,
+        max_attempts: int = 5,
+        backoff_s: float = 2.0,
+        max_backoff_s: float = 300.0,
+        poll_s: float = 1.0,
+        retention_s: float = 7 * 86400.0,
+    ):
+        self.queue = queue
+        self.process = process
+        self.workers = workers
+        self.batch_size = batch_size
+        self.linger_s = linger_s
+        self.max_attempts = max_attempts
+        self.backoff_s = backoff_s
+        self.max_backoff_s = max_backoff_s
+        self.poll_s = poll_s
+        self.retention_s = retention_s
+        self._threads: List[threading.Thread] = []
+        self._start_lock = threading.Lock()
+        self._last_purge = 0.0
+
+    def start(self) -> bool:
+        with self._start_lock:
+            if self._threads:
+                return False
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, daemon=True, name=f"ingest-worker-{i}")
+                thread.start()
+                self._threads.append(thread)
+        return True
+
+    def _delay(self, attempts: int) -> Optional[float]:
+        if attempts >= self.max_attempts:
+            return None
+        return min(self.max_backoff_s, self.backoff_s * 2 ** (attempts - 1))
+
+    def run_once(self) -> int:
+        """Claim and process one batch; returns the number of jobs claimed."""
+        jobs = self.queue.claim(self.batch_size)
+        if not jobs:
+            return 0
+        try:
+            errors = self.process(jobs)
+        except Exception as e:
+            logger.exception("Ingest batch failed")
+            errors = {job["job_id"]: (f"{type(e).__name__}: {e}", is_transient(e)) for job in jobs}
+        self.queue.complete([job["job_id"] for job in jobs if job["job_id"] not in errors])
+        for job in jobs:
+            if job["job_id"] in errors:
+                error, retryable = errors[job["job_id"]]
+                self.queue.retry(job["job_id"], error, self._delay(job["attempts"]) if retryable else None)
+        return len(jobs)
+
+    def _run(self) -> None:
+        while True:
+            try:
+                if self.run_once():
+                    continue
+                if time.time() - self._last_purge > PURGE_INTERVAL_S:
+                    self._last_purge = time.time()
+                    self.queue.purge(self.retention_s)
+            except Exception:
+                logger.exception("Ingest worker error")
+            # Idle: sleep until a job is enqueued in this process (or poll for other
+            # processes' jobs and retries coming due), then let a burst gather
+            if self.queue.wakeup.wait(self.poll_s):
+                self.queue.wakeup.clear()
+                time.sleep(self.linger_s)
+
+
+def job_processor(ingest_records: Callable[..., Dict[str, Any]],
+                  on_inserted: Callable[[], None]) -> Callable[[List[Dict[str, Any]]], Dict[str, Tuple[str, bool]]]:
+    """
+    The workers' `process` for an app: stores a batch of jobs with
+    `ingest_records` (one embedding call, one write) and returns
+    {job_id: (error, retryable)}.
+    """
+    def process(jobs: List[Dict[str, Any]]) -> Dict[str, Tuple[str, bool]]:
+        records = [{**job["payload"], "uuid": job["record_id"]} for job in jobs]
+        with stage("ingest"):
+            report = ingest_records(records, embed_batch_size=len(records), write_batch_size=len(records), concurrency=1)
+        if report["inserted"]:
+            on_inserted()
+        return {jobs[error["index"]]["job_id"]: (error["error"], error["retryable"]) for error in report["errors"]}
+
+    return process
+
+
+def queue_from_env() -> Optional[SQLiteJobQueue]:
+    """
+    INGEST_QUEUE_PATH   - SQLite file for queued adds; /add_opportunity answers 202
+                          with a job id (default: off, adds are synchronous)
+    INGEST_LEASE_S      - seconds before a job claimed by a dead worker is retried (default 300)
+    """
+    path = os.getenv("INGEST_QUEUE_PATH")
+    if not path:
+        return None
+    return SQLiteJobQueue(path, lease_seconds=float(os.getenv("INGEST_LEASE_S", "300")))
+
+
+def workers_from_env(queue: SQLiteJobQueue,
+                     process: Callable[[List[Dict[str, Any]]], Dict[str, Tuple[str, bool]]]) -> IngestWorkers:
+    """
+    INGEST_WORKERS       - worker threads per process (default 2)
+    INGEST_BATCH_SIZE    - jobs per batch, i.e. per embedding call and write (default 32)
+    INGEST_LINGER_MS     - wait after a wake-up so a burst lands in one batch (default 20)
+    INGEST_MAX_ATTEMPTS  - tries before a job is marked failed (default 5)
+    INGEST_BACKOFF_S     - first retry delay, doubled on every attempt (default 2, capped at 300)
+    INGEST_RETENTION_S   - how long done/failed jobs stay queryable (default 7 days)
+    """
+    return IngestWorkers(
+        queue,
+        process,
+        workers=int(os.getenv("INGEST_WORKERS", "2")),
+        batch_size=int(os.getenv("INGEST_BATCH_SIZE", "32")),
+        linger_s=float(os.getenv("INGEST_LINGER_MS", "20")) / 1000,
+        max_attempts=int(os.getenv("INGEST_MAX_ATTEMPTS", "5")),
+        backoff_s=float(os.getenv("INGEST_BACKOFF_S", "2")),
+        retention_s=float(os.getenv("INGEST_RETENTION_S", str(7 * 86400))),
+    )
@@ -0,0 +1,138 @@
+"""BM25 inverted index over offer titles, organisers and descriptions.
+
+Embeddings blur exact terms ("sanepid", "hospicjum", organiser names), so
+/query can also rank lexically, or fuse both rankings. The index lives in
+memory, is filled from the Chroma collection on first use and is updated
+on every add, so lexical queries never leave the process.
+
+Tokens are NFC-normalized, lower-cased and folded to ASCII (ą -> a, ł -> l),
+common Polish stop words are dropped and a light suffix stripper maps most
+inflected forms onto one stem ("hospicjum", "hospicjach" -> "hospicj").
+Title and organiser tokens count twice.
+"""
+import heapq
+import math
+import re
+import threading
+import unicodedata
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from paging import iter_collection
+from query_filters import matches_where
+
+K1 = 1.2
+B = 0.75
+FIELD_WEIGHTS = {"Nazwa": 2, "Nazwa organizatora": 2}
+
+_FOLD = str.maketrans("ąćęłńóśźż", "acelnoszz")
+_TOKEN = re.compile(r"[a-z0-9]+")
+STOP_WORDS = frozenset(
+    "a aby ale albo bo by czy dla do i ich jak jako jest juz lub na nad nie o od oraz po pod przez "
+    "przy sa sie ta tak te tego to tu w we z za ze".split()
+)
+# Longest first; only stripped when at least MIN_STEM characters remain
+SUFFIXES = sorted(
+    "owie ami ach ego emu iej ich ych ymi imi owi owa owe ow om em ie ia iu ej ym im um a e i o u y".split(),
+    key=len, reverse=True,
+)
+MIN_STEM = 4
+
+
+def stem(token: str) -> str:
+    for suffix in SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= MIN_STEM:
+            return token[:-len(suffix)]
+    return token
+
+
+def fold(text: str) -> str:
+    """NFC-normalized, lower-cased, Polish letters folded to ASCII ("Łódź" -> "lodz")."""
+    return unicodedata.normalize("NFC", text or "").lower().translate(_FOLD)
+
+
+def tokenize(text: str) -> List[str]:
+    return [stem(t) for t in _TOKEN.findall(fold(text)) if t not in STOP_WORDS]
+
+
+class LexicalIndex:
+    def __init__(self):
+        self.ids: List[str] = []
+        self.documents: List[str] = []
+        self.metadatas: List[Dict[str, Any]] = []
+        self._rows: Dict[str, int] = {}
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._lengths: List[int] = []
+        self._total_length = 0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _terms(self, document: str, metadata: Dict[str, Any]) -> Counter:
+        terms = Counter(tokenize(document))
+        for field, weight in FIELD_WEIGHTS.items():
+            for token in tokenize(str(metadata.get(field) or "")):
+                terms[token] += weight
+        return terms
+
+    # ----------------- Writes -----------------
+    def add(self, ids: List[str], documents: List[str], metadatas: List[Dict[str, Any]]) -> None:
+        """Insert or replace rows; unchanged rows are skipped."""
+        with self._lock:
+            for record_id, document, metadata in zip(ids, documents, metadatas):
+                row = self._rows.get(record_id)
+                if row is not None and self.documents[row] == document and self.metadatas[row] == metadata:
+                    continue
+                terms = self._terms(document, metadata)
+                if row is None:
+                    row = len(self.ids)
+                    self._rows[record_id] = row
+                    self.ids.append(record_id)
+                    self.documents.append(document)
+                    self.metadatas.append(metadata)
+                    self._lengths.append(0)
+                else:
+                    for token in self._terms(self.documents[row], self.metadatas[row]):
+                        self._postings[token].pop(row, None)
+                    self.documents[row] = document
+                    self.metadatas[row] = metadata
+                for token, tf in terms.items():
+                    self._postings.setdefault(token, {})[row] = tf
+                length = sum(terms.values())
+                self._total_length += length - self._lengths[row]
+                self._lengths[row] = length
+
+    # ----------------- Reads -----------------
+    def query(self, text: str, n_results: int = 25,
+              where: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """BM25 top-k in the nested shape of `Collection.query`, with `scores` instead of `distances`."""
+        with self._lock:
+            count = len(self.ids)
+            avg_length = self._total_length / count if count else 0.0
+            scores: Dict[int, float] = {}
+            for token in set(tokenize(text)):
+                postings = self._postings.get(token)
+                if not postings:
+                    continue
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for row, tf in postings.items():
+                    norm = K1 * (1 - B + B * self._lengths[row] / avg_length)
+                    scores[row] = scores.get(row, 0.0) + idf * tf * (K1 + 1) / (tf + norm)
+            candidates = (
+                (score, row) for row, score in scores.items()
+                if not where or matches_where(self.metadatas[row], where)
+            )
+            top = heapq.nlargest(n_results, candidates)
+            return {
+                "ids": [[self.ids[row] for _, row in top]],
+                "documents": [[self.documents[row] for _, row in top]],
+                "metadatas": [[self.metadatas[row] for _, row in top]],
+                "scores": [[round(score, 4) for score, _ in top]],
+            }
+
+    # ----------------- Sync -----------------
+    def sync_from_collection(self, collection, batch_size: int = 500) -> None:
+        """Page every record (documents and metadata only) out of a Chroma collection."""
+        for batch in iter_collection(collection, ["documents", "metadatas"], batch_size):
+            self.add(batch["ids"], batch["documents"], batch["metadatas"])
@@ -0,0 +1,200 @@
+"""Load test: blocking Flask app (mock.py) vs asyncio app (async_app.py).
+
+Nominatim and Gemini are replaced by a local stub HTTP server that answers
+after a configurable delay, and Chroma by an in-process ephemeral client,
+so the comparison measures only how well each stack overlaps upstream I/O.
+Both apps get one worker (one thread / one event loop) and the same number
+of concurrent clients.
+
+    python loadtest_async.py [--requests 200] [--concurrency 20] [--delay-ms 100]
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import socket
+import statistics
+import threading
+import time
+
+from aiohttp import ClientSession, web
+
+DIM = 64
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def fake_vector(text: str) -> list[float]:
+    rnd = random.Random(hashlib.sha256(text.encode("utf-8")).digest())
+    return [rnd.uniform(-1, 1) for _ in range(DIM)]
+
+
+# ----------------- Stub upstreams -----------------
+def start_stub_server(port: int, delay: float) -> None:
+    async def reverse(request):
+        await asyncio.sleep(delay)
+        return web.json_response({"address": {"city": "Warszawa"}})
+
+    async def embed(request):
+        await asyncio.sleep(delay)
+        body = await request.json()
+        texts = [r["content"]["parts"][0]["text"] for r in body.get("requests", [])]
+        return web.json_response({"embeddings": [{"values": fake_vector(t)} for t in texts]})
+
+    stub = web.Application()
+    stub.router.add_get("/reverse", reverse)
+    stub.router.add_post("/{version}/models/{model}:batchEmbedContents", embed)
+
+    def run():
+        loop = asyncio.new_event_loop()
+        runner = web.AppRunner(stub, access_log=None)
+        loop.run_until_complete(runner.setup())
+        loop.run_until_complete(web.TCPSite(runner, "127.0.0.1", port).start())
+        loop.run_forever()
+
+    threading.Thread(target=run, daemon=True).start()
+
+
+# ----------------- App servers -----------------
+def start_sync_app(port: int) -> None:
+    from werkzeug.serving import make_server
+    import mock
+
+    mock.limiter.enabled = False
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = make_server("127.0.0.1", port, mock.create_app(), threaded=False)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+
+def start_async_app(port: int) -> None:
+    from hypercorn.asyncio import serve
+    from hypercorn.config import Config
+    import async_app
+
+    async_app.app.config["QUART_RATE_LIMITER_ENABLED"] = False
+    config = Config()
+    config.bind = [f"127.0.0.1:{port}"]
+    config.accesslog = None
+    config.errorlog = None
+
+    async def run():
+        # A shutdown trigger keeps hypercorn from installing signal handlers (not allowed off the main thread)
+        await serve(async_app.app, config, shutdown_trigger=asyncio.Event().wait)
+
+    threading.Thread(target=lambda: asyncio.run(run()), daemon=True).start()
+
+
+def wait_for_port(port: int, timeout: float = 10.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket() as s:
+            if s.connect_ex(("127.0.0.1", port)) == 0:
+                return
+        time.sleep(0.05)
+    raise RuntimeError(f"Port {port} did not open")
+
+
+# ----------------- Driver -----------------
+def payload(i: int, run: str) -> dict:
+    return {
+        "title": f"Oferta {run} {i}",
+        "description": f"Opis oferty {run} numer {i}",
+        "tags": ["Zdrowie"],
+        "thumbnail": "https://example.com/a.jpg",
+        "lat": 52.2297,
+        "lon": 21.0122,
+        "start_date": "2025-10-01",
+        "end_date": "2025-12-31",
+        "workload": ["Mini - Zaangażowanie do 1 godziny tygodniowo"],
+        "form": ["Zostań aktywistą online"],
+        "organizer": "Fundacja",
+    }
+
+
+async def drive(base_url: str, total: int, concurrency: int, run: str) -> dict:
+    headers = {"x-api-key": os.environ["API_KEY"]}
+    latencies = {"add": [], "query": []}
+    errors = 0
+    counter = iter(range(total))
+
+    async def client(session):
+        nonlocal errors
+        for i in counter:
+            kind = "add" if i % 2 == 0 else "query"
+            started = time.perf_counter()
+            if kind == "add":
+                resp = await session.post(f"{base_url}/add_opportunity", json=payload(i, run), headers=headers)
+            else:
+                resp = await session.get(f"{base_url}/query", params={"text": f"zapytanie {run} {i}"}, headers=headers)
+            await resp.read()
+            latencies[kind].append(time.perf_counter() - started)
+            if resp.status != 200:
+                errors += 1
+
+    started = time.perf_counter()
+    async with ClientSession() as session:
+        await asyncio.gather(*(client(session) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    def pct(values, q):
+        return round(statistics.quantiles(values, n=100)[q - 1] * 1000, 1) if len(values) > 1 else None
+
+    return {
+        "requests": total,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(total / elapsed, 1),
+        **{f"{kind}_p{q}_ms": pct(values, q) for kind, values in latencies.items() for q in (50, 95)},
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--delay-ms", type=float, default=100.0)
+    args = parser.parse_args()
+
+    stub_port, sync_port, async_port = free_port(), free_port(), free_port()
+    os.environ.update({
+        "NOMINATIM_URL": f"http://127.0.0.1:{stub_port}/reverse",
+        "GEMINI_BASE_URL": f"http://127.0.0.1:{stub_port}/",
+        "GEOCODER": "nominatim",
+        "GOOGLE_GENAI_KEY": "stub",
+        "API_KEY": "loadtest",
+        "EMBEDDING_CACHE_SIZE": "0",
+        "SEARCH_BACKEND": "chroma",
+    })
+    os.environ.pop("EMBEDDING_CACHE_PATH", None)
+
+    # No local Chroma Cloud stub exists; both apps share one in-process ephemeral client
+    import chromadb
+    ephemeral = chromadb.EphemeralClient()
+    chromadb.CloudClient = lambda **kwargs: ephemeral
+
+    start_stub_server(stub_port, args.delay_ms / 1000)
+    start_sync_app(sync_port)
+    start_async_app(async_port)
+    for port in (stub_port, sync_port, async_port):
+        wait_for_port(port)
+
+    results = {
+        "config": vars(args),
+        "sync_flask": asyncio.run(drive(f"http://127.0.0.1:{sync_port}", args.requests, args.concurrency, "sync")),
+        "async_quart": asyncio.run(drive(f"http://127.0.0.1:{async_port}", args.requests, args.concurrency, "async")),
+    }
+    results["speedup"] = round(
+        results["async_quart"]["throughput_rps"] / results["sync_flask"]["throughput_rps"], 2
+    )
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""Per-stage request timing: Prometheus metrics and Server-Timing headers.
+
+Code wraps each stage of a request in `with stage("embed"):`. Durations
+go into a per-stage histogram and onto the current request's timing list,
+which the app turns into a `Server-Timing` header. Whole requests are
+counted and timed by endpoint, method and status. `render()` returns
+everything in the Prometheus text format for a `/metrics` endpoint.
+
+The timing list lives in a context variable, so it follows the request in
+both the threaded Flask app and the asyncio app (including work moved to
+`asyncio.to_thread`). Metrics are per process; scrape each worker.
+
+Optionally a sampling profiler (Flask app only, it samples the request
+thread) dumps the collapsed stacks of requests slower than a threshold:
+
+PROFILE_SLOW_MS      - profile requests slower than this (default: off)
+PROFILE_INTERVAL_MS  - sampling interval (default 5)
+PROFILE_DIR          - where `.folded` stack files go (default ./profiles)
+"""
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("stage_timings", default=None)
+
+
+# ----------------- Metric types -----------------
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{str(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class CounterMetric:
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name, self.help, self.labels = name, help_text, labels
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for values, total in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labels, values)} {total}")
+        return lines
+
+
+class HistogramMetric:
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = (), buckets=BUCKETS):
+        self.name, self.help, self.labels, self.buckets = name, help_text, labels, buckets
+        self._series: Dict[Tuple[str, ...], List[float]] = {}  # bucket counts..., sum, count
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str) -> None:
+        with self._lock:
+            series = self._series.setdefault(label_values, [0.0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for values, series in sorted(self._series.items()):
+                for bound, count in [*zip(self.buckets, series), ("+Inf", series[-1])]:
+                    bucket_labels = _labels(self.labels, values, f'le="{bound}"')
+                    lines.append(f"{self.name}_bucket{bucket_labels} {count:g}")
+                lines.append(f"{self.name}_sum{_labels(self.labels, values)} {series[-2]}")
+                lines.append(f"{self.name}_count{_labels(self.labels, values)} {series[-1]:g}")
+        return lines
+
+
+REQUESTS = CounterMetric("http_requests_total", "HTTP requests", ("endpoint", "method", "status"))
+REQUEST_SECONDS = HistogramMetric("http_request_duration_seconds", "Request latency", ("endpoint", "method"))
+STAGE_SECONDS = HistogramMetric("request_stage_duration_seconds", "Time spent per request stage", ("stage",))
+_gauges: List[Tuple[str, str, Callable[[], Dict[str, float]]]] = []
+
+
+def register_gauges(prefix: str, help_text: str, collect: Callable[[], Dict[str, float]]) -> None:
+    """Export `collect()`'s numeric values as `<prefix>_<key>` gauges at scrape time."""
+    _gauges.append((prefix, help_text, collect))
+
+
+def render() -> str:
+    lines = [*REQUESTS.render(), *REQUEST_SECONDS.render(), *STAGE_SECONDS.render()]
+    for prefix, help_text, collect in _gauges:
+        for key, value in collect().items():
+            name = f"{prefix}_{key}"
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {value}"]
+    return "\n".join(lines) + "\n"
+
+
+# ----------------- Request timing -----------------
+def start_request() -> None:
+    _timings.set([])
+
+
+@contextmanager
+def stage(name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, name)
+        timings = _timings.get()
+        if timings is not None:
+            timings.append((name, elapsed))
+
+
+def server_timing(total: Optional[float] = None) -> str:
+    """`Server-Timing` header value for the current request (stages in call order)."""
+    parts = [f"{name};dur={elapsed * 1000:.1f}" for name, elapsed in _timings.get() or ()]
+    if total is not None:
+        parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+def finish_request(endpoint: str, method: str, status: int, elapsed: float) -> None:
+    REQUESTS.inc(endpoint, method, str(status))
+    REQUEST_SECONDS.observe(elapsed, endpoint, method)
+
+
+# ----------------- Slow-request profiler -----------------
+class SlowRequestProfiler:
+    """Samples the stacks of in-flight request threads; keeps those of slow requests."""
+
+    def __init__(self, threshold_s: float, interval_s: float = 0.005, out_dir: str = "profiles"):
+        self.threshold_s = threshold_s
+        self.interval_s = interval_s
+        self.out_dir = out_dir
+        self._samples: Dict[int, Counter] = {}
+        self._lock = threading.Lock()
+        threading.Thread(target=self._run, daemon=True, name="slow-request-profiler").start()
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.interval_s)
+            with self._lock:
+                active = dict(self._samples)
+            if not active:
+                continue
+            frames = sys._current_frames()
+            for thread_id, counter in active.items():
+                frame = frames.get(thread_id)
+                stack = []
+                while frame is not None:
+                    stack.append(f"{frame.f_code.co_name} ({os.path.basename(frame.f_code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                if stack:
+                    counter[";".join(reversed(stack))] += 1
+
+    def begin(self) -> None:
+        with self._lock:
+            self._samples[threading.get_ident()] = Counter()
+
+    def end(self, label: str, elapsed: float) -> Optional[str]:
+        """Stop sampling this thread; returns the `.folded` file written, if the request was slow."""
+        with self._lock:
+            samples = self._samples.pop(threading.get_ident(), None)
+        if not samples or elapsed < self.threshold_s:
+            return None
+        os.makedirs(self.out_dir, exist_ok=True)
+        path = os.path.join(self.out_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{label}-{int(elapsed * 1000)}ms.folded")
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in samples.most_common():
+                f.write(f"{stack} {count}\n")
+        logger.warning("Slow request %s took %.0f ms, stacks in %s", label, elapsed * 1000, path)
+        return path
+
+
+def profiler_from_env() -> Optional[SlowRequestProfiler]:
+    threshold = os.getenv("PROFILE_SLOW_MS")
+    if not threshold:
+        return None
+    return SlowRequestProfiler(
+        threshold_s=float(threshold) / 1000,
+        interval_s=float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000,
+        out_dir=os.getenv("PROFILE_DIR", "profiles"),
+    )
@@ -1,45 +1,95 @@
-from flask import Flask, request, jsonify
+from flask import Blueprint, Flask, Response, g, request, jsonify, stream_with_context
 from dotenv import load_dotenv
-from datetime import datetime
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
-import chromadb
-from chromadb.api.models.Collection import Collection
-from google import genai
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+import io
 import os
+import time
 import uuid
 import requests
 
+import metrics
+from bulk_ingest import ingest, iter_records
+from embedding_cache import cache_from_env, cache_key as embedding_key
+from ingest_queue import job_processor, queue_from_env, workers_from_env
+from metrics import stage
+from geo import payload_coordinates
+from offline_geocoder import geocoder_from_env
+from photo_matcher import attach_photos as match_photos
+from opportunities import (
+    build_metadata, bulk_body, cache_query, cached_query, degrade, ndjson_lines, needs_embedding,
+    parse_bulk_options, parse_filter_args, parse_n, parse_query, query_body, select_docs, validate_payload,
+)
+from quantization import normalize_vector
+from resilience import UpstreamUnavailable, request_deadline_from_env, start_deadline
+from query_cache import query_cache_from_env
+from services import Services, register_gauges
+from similar import DEFAULT_N as SIMILAR_N
+from suggest import DEFAULT_N as SUGGEST_N, TOP_K as SUGGEST_TOP_K
+from singleflight import SingleFlight
+
 # ----------------- Load environment -----------------
 load_dotenv()
 
 # ----------------- Flask setup -----------------
-app = Flask(__name__)
-app.config["JSON_AS_ASCII"] = False  # allow Polish chars
-
-# Security headers middleware
-@app.after_request
+# Endpoints live on a blueprint; create_app() (bottom of the file) builds the app.
+# Importing this module creates no app and starts no threads.
+api = Blueprint("api", __name__)
+
+# Per-stage timing (see metrics.py)
+profiler = metrics.profiler_from_env()
+# Budget shared by all upstream calls of a request (see resilience.py)
+REQUEST_DEADLINE = request_deadline_from_env()
+
+@api.before_app_request
+def start_timing():
+    g.started = time.perf_counter()
+    metrics.start_request()
+    start_deadline(REQUEST_DEADLINE)
+    if profiler:
+        profiler.begin()
+
+# Security headers middleware (also emits Server-Timing and request metrics)
+@api.after_app_request
 def apply_security_headers(response):
     response.headers["X-Content-Type-Options"] = "nosniff"
     response.headers["X-Frame-Options"] = "DENY"
     response.headers["X-XSS-Protection"] = "1; mode=block"
     response.headers["Content-Security-Policy"] = "default-src 'self'"
+    if "started" in g:
+        elapsed = time.perf_counter() - g.started
+        response.headers["Server-Timing"] = metrics.server_timing(total=elapsed)
+        metrics.finish_request(request.endpoint or "unmatched", request.method, response.status_code, elapsed)
+        if profiler:
+            profiler.end(request.endpoint or "unmatched", elapsed)
     return response
 
 # Rate limiter (prevent abuse)
-limiter = Limiter(get_remote_address, app=app, default_limits=["60 per minute"])
+limiter = Limiter(get_remote_address, default_limits=["60 per minute"])
 
 # ----------------- Initialize clients -----------------
-chroma_client = chromadb.CloudClient(
-    api_key=os.getenv("CHROMA_API_KEY"),
-    tenant=os.getenv("CHROMA_TENANT"),
-    database=os.getenv("CHROMA_DATABASE")
-)
-gemini_client = genai.Client(api_key=os.getenv("GOOGLE_GENAI_KEY"))
-
-COLLECTION_NAME = "Ogloszenia"
-collection: Collection = chroma_client.get_or_create_collection(name=COLLECTION_NAME)
+# Chroma/Gemini clients, collection and search backend are created on first use (see services.py)
+services = Services()
+embedding_cache = cache_from_env()
+query_cache = query_cache_from_env()
+geocoder = geocoder_from_env()
+# Queued adds (see ingest_queue.py); None keeps /add_opportunity synchronous
+ingest_queue = queue_from_env()
+# Concurrent identical calls share one upstream round trip (see singleflight.py)
+embed_flight, search_flight, geocode_flight = SingleFlight(), SingleFlight(), SingleFlight()
+register_gauges(lambda: services, embedding_cache, query_cache, geocoder,
+                {"embed": embed_flight, "search": search_flight, "geocode": geocode_flight}, ingest_queue)
+
+EMBEDDING_MODEL = "gemini-embedding-001"
+# Matryoshka truncation (e.g. 768); the collection must be embedded at the same size
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM") or 0) or None
+EMBEDDING_CONFIG = {"output_dimensionality": EMBEDDING_DIM} if EMBEDDING_DIM else None
+# Cache namespace: vectors of different sizes must not be mixed
+EMBEDDING_KEY = f"{EMBEDDING_MODEL}@{EMBEDDING_DIM}" if EMBEDDING_DIM else EMBEDDING_MODEL
+NOMINATIM_URL = os.getenv("NOMINATIM_URL", "https://nominatim.openstreetmap.org/reverse")
+GEOCODER = os.getenv("GEOCODER", "offline")  # offline | hybrid (offline, then Nominatim) | nominatim
+QUERY_MODE = os.getenv("QUERY_MODE", "semantic")  # default ranking for text=: semantic | lexical | hybrid
 
 # ----------------- API Key Auth -----------------
 API_KEY = os.getenv("API_KEY") or "super-secret-key"
@@ -49,81 +99,100 @@ def require_api_key():
     if not key or key != API_KEY:
         return jsonify({"error": "Unauthorized"}), 401
 
-# ----------------- Allowed values -----------------
-ALLOWED_TAGS = [
-    "Rynek mieszkaniowy", "Zieleń i klimat", "Jakość powietrza", "Potrzeby kierowców",
-    "Potrzeby rowerzystów", "Potrzeby pieszych", "Komunikacja miejska", "Edukcja",
-    "Zdrowie", "Oferta społeczno-kulturalna miasta", "Zwierzęta", "Seniorzy i seniorki",
-    "Transparentność działań urzędów", "Usługi komunalne (np. woda, śmieci)"
-]
-ALLOWED_WORKLOAD = [
-    "Mini - Zaangażowanie do 1 godziny tygodniowo",
-    "Lekkie - Zaangażowanie 1-4 godziny tygodniowo",
-    "Umiarkowane - Zaangażowanie 4-8 godzin tygodniowo",
-    "Pełne - Zaangażowanie ponad 8 godzin tygodniowo"
-]
-ALLOWED_FORM = [
-    "Zostań aktywistą online", "Dbaj o potrzeby dzielnicy", "Weź udział w akcjach bezpośrednich",
-    "Spotkaj się z mieszkańcami", "Zaangażuj się w obywatelską kontrolę",
-    "Wesprzyj pogotowie obywatelskie"
-]
-
 # ----------------- Helpers -----------------
-def parse_date(date_str: str):
-    for fmt in ("%Y-%m-%d", "%d:%m:%Y"):
-        try:
-            return datetime.strptime(date_str, fmt)
-        except Exception:
-            continue
-    return None
-
-def matches_filter(value: str, query_value: str) -> bool:
-    return query_value.lower() in str(value).lower()
+def _embedding_values(result) -> list[list[float]]:
+    vectors = [e.values for e in result.embeddings]
+    # Only the full-size output comes normalized
+    return [normalize_vector(v) for v in vectors] if EMBEDDING_DIM else vectors
+
+def _embed_remote(text: str) -> list[float]:
+    # Hedged: a second call goes out if the first is slow (EMBED_HEDGE_MS)
+    result = services.upstreams["gemini"].call(
+        lambda: services.gemini_client.models.embed_content(
+            model=EMBEDDING_MODEL,
+            contents=text,
+            config=EMBEDDING_CONFIG
+        ),
+        hedge=True
+    )
+    return _embedding_values(result)[0]
+
+def _embed_remote_batch(texts: list[str]) -> list[list[float]]:
+    result = services.upstreams["gemini"].call(
+        lambda: services.gemini_client.models.embed_content(
+            model=EMBEDDING_MODEL,
+            contents=texts,
+            config=EMBEDDING_CONFIG
+        )
+    )
+    return _embedding_values(result)
 
 def generate_embedding(text: str) -> list[float]:
-    result = gemini_client.models.embed_content(
-        model="gemini-embedding-001",
-        contents=text
-    )
-    return result.embeddings[0].values
-
-def validate_payload(data: Dict[str, Any]) -> Dict[str, str]:
-    required_fields = [
-        "title", "description", "tags", "thumbnail",
-        "lon", "lat", "start_date", "end_date", "workload", "form", "organizer"
-    ]
-    missing = [f for f in required_fields if f not in data]
-    if missing:
-        return {"error": f"Missing fields: {', '.join(missing)}"}
-
-    # Validate allowed lists
-    for field, allowed in [
-        ("tags", ALLOWED_TAGS),
-        ("workload", ALLOWED_WORKLOAD),
-        ("form", ALLOWED_FORM)
-    ]:
-        if not isinstance(data[field], list):
-            return {"error": f"{field} must be a list."}
-        invalid = [v for v in data[field] if v not in allowed]
-        if invalid:
-            return {"error": f"Invalid values in {field}: {', '.join(invalid)}"}
-
-    return {}
+    with stage("embed"):
+        return embed_flight.do(
+            embedding_key(EMBEDDING_KEY, text),
+            lambda: embedding_cache.get_or_compute(EMBEDDING_KEY, text, _embed_remote)
+        )
 
-def get_city_from_coords(lat: float, lon: float) -> str:
+def generate_embeddings(texts: list[str]) -> list[list[float]]:
+    with stage("embed"):
+        return embedding_cache.get_or_compute_many(EMBEDDING_KEY, texts, _embed_remote_batch)
+
+def _nominatim_city(lat: float, lon: float) -> str:
     """Use OpenStreetMap Nominatim to get city from coordinates."""
-    url = "https://nominatim.openstreetmap.org/reverse"
     params = {"lat": lat, "lon": lon, "format": "json", "zoom": 10}
-    try:
-        resp = requests.get(url, params=params, headers={"User-Agent": "FlaskApp"})
+    upstream = services.upstreams["nominatim"]
+
+    def fetch():
+        resp = requests.get(NOMINATIM_URL, params=params, headers={"User-Agent": "FlaskApp"}, timeout=upstream.timeout_s)
         resp.raise_for_status()
-        data = resp.json()
+        return resp.json()
+
+    try:
+        data = upstream.call(fetch)
         return data.get("address", {}).get("city") or data.get("address", {}).get("town") or "Unknown"
     except Exception:
         return "Unknown"
 
+def _nominatim_city_shared(lat: float, lon: float) -> str:
+    """Concurrent lookups of the same point share one Nominatim request."""
+    return geocode_flight.do((round(lat, 5), round(lon, 5)), lambda: _nominatim_city(lat, lon))
+
+def get_city_from_coords(lat: float, lon: float) -> str:
+    """Resolve city from the bundled gazetteer; Nominatim only when GEOCODER asks for it."""
+    with stage("geocode"):
+        if GEOCODER == "nominatim":
+            return _nominatim_city_shared(lat, lon)
+        city = geocoder.lookup(round(lat, 5), round(lon, 5))
+        if city is None and GEOCODER == "hybrid":
+            return _nominatim_city_shared(lat, lon)
+        return city or "Unknown"
+
+def build_record_metadata(data: Dict[str, Any]) -> Dict[str, Any]:
+    # Determine city from lat/lon (offers without a place have none)
+    point = payload_coordinates(data)
+    city = get_city_from_coords(*point) if point else ""
+    return build_metadata(data, city)
+
+def attach_photos(records: list[Dict[str, Any]], metadatas: list[Dict[str, Any]]) -> None:
+    match_photos(services.photo_matcher, records, metadatas, generate_embeddings)
+
+def ingest_records(records, **options) -> Dict[str, Any]:
+    return ingest(
+        records,
+        backend=services.search_backend,
+        validate=validate_payload,
+        build_metadata=build_record_metadata,
+        embed_batch=generate_embeddings,
+        enrich=attach_photos,
+        **options
+    )
+
+process_jobs = job_processor(ingest_records, query_cache.bump)
+ingest_workers = workers_from_env(ingest_queue, process_jobs) if ingest_queue is not None else None
+
 # ----------------- Endpoint: Add -----------------
-@app.route("/add_opportunity", methods=["POST"])
+@api.route("/add_opportunity", methods=["POST"])
 @limiter.limit("10/minute")
 def add_opportunity():
     auth = require_api_key()
@@ -134,123 +203,233 @@ def add_opportunity():
     if validation:
         return jsonify(validation), 400
 
-    record_id = str(uuid.uuid4())
+    if ingest_queue is not None:
+        with stage("enqueue"):
+            job = ingest_queue.enqueue(data)
+        return jsonify(job), 202, {"Location": f"/jobs/{job['job_id']}"}
 
-    # Determine city from lat/lon
-    city = get_city_from_coords(float(data["lat"]), float(data["lon"]))
-
-    metadata = {
-        "Nazwa": data["title"],
-        "Tags": ", ".join(data["tags"]),
-        "Thumbnail": data["thumbnail"],
-        "Lokalizacja": city,
-        "Data rozpoczęcia": data["start_date"],
-        "Data zakończenia": data["end_date"],
-        "Wymagania nakładu pracy": ", ".join(data["workload"]),
-        "Preferowana forma działalności": ", ".join(data["form"]),
-        "Nazwa organizatora": data["organizer"]
-    }
+    record_id = str(uuid.uuid4())
+    metadata = build_record_metadata(data)
 
     try:
         embedding = generate_embedding(data["description"])
-        collection.add(
-            documents=[data["description"]],
-            metadatas=[metadata],
-            ids=[record_id],
-            embeddings=[embedding]
-        )
+        attach_photos([data], [metadata])
+        with stage("store"):
+            services.search_backend.add(
+                documents=[data["description"]],
+                metadatas=[metadata],
+                ids=[record_id],
+                embeddings=[embedding]
+            )
+        query_cache.bump()
         return jsonify({"status": "success", "record_id": record_id}), 200
+    except UpstreamUnavailable as e:
+        return jsonify({"status": "error", "message": str(e)}), 503
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+# ----------------- Endpoint: Bulk add -----------------
+@api.route("/add_opportunities/bulk", methods=["POST"])
+@limiter.limit("2/minute")
+def add_opportunities_bulk():
+    """
+    Body: JSON array of add payloads, or NDJSON (one payload per line).
+    Query args: embed_batch_size, write_batch_size, concurrency.
+    """
+    auth = require_api_key()
+    if auth: return auth
+
+    # A load takes as long as it takes: no request budget, only per-call timeouts
+    start_deadline(None)
+
+    options, error = parse_bulk_options(request.args)
+    if error:
+        return jsonify(error), 400
+
+    try:
+        stream = io.TextIOWrapper(request.stream, encoding="utf-8")
+        with stage("ingest"):
+            report = ingest_records(iter_records(stream), **options)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": f"Malformed input: {e}"}), 400
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
+    if report["inserted"]:
+        query_cache.bump()
+    return jsonify(bulk_body(report)), 200
+
 # ----------------- Endpoint: Query -----------------
-@app.route("/query", methods=["GET"])
+@api.route("/query", methods=["GET"])
 @limiter.limit("30/minute")
 def query_opportunities():
+    """
+    Query args: text, mode, filters (see query_filters.FILTER_ARGS),
+    geo (lat, lon, radius_km, bbox, sort=distance; see geo.py),
+    n_results (text mode), limit, offset, fields, format (json | ndjson).
+    With Gemini or Chroma unavailable, text queries degrade to the lexical
+    index if it is in memory, else to filter-only results ("degraded" in the body).
+    """
+    auth = require_api_key()
+    if auth: return auth
+
+    # Serialized responses, invalidated by every write (see query_cache.py)
+    slot, cached = cached_query(query_cache, request.args)
+    if cached is not None:
+        return Response(cached[0], mimetype=cached[1], headers={"X-Cache": "HIT"})
+
+    query, error = parse_query(request.args, QUERY_MODE)
+    if error:
+        return jsonify(error), 400
+
+    try:
+        search_backend = services.search_backend
+        embedding = None
+        if needs_embedding(query):
+            try:
+                embedding = generate_embedding(query["text"])
+            except Exception as e:
+                degrade(query, search_backend, e)
+        docs = select_docs(query, search_backend, embedding, search_flight,
+                           embedding_key(EMBEDDING_KEY, query["text"] or ""))
+
+        if query["page"]["format"] == "ndjson":
+            return Response(stream_with_context(ndjson_lines(docs, query["page"])), mimetype="application/x-ndjson")
+
+        body = query_body(query, docs)
+        with stage("serialize"):
+            response = jsonify(body)
+        if cache_query(query_cache, slot, query, response.get_data(), response.mimetype):
+            response.headers["X-Cache"] = "MISS"
+        return response, 200
+
+    except UpstreamUnavailable as e:
+        return jsonify({"error": str(e)}), 503
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# ----------------- Endpoint: Facets -----------------
+@api.route("/facets", methods=["GET"])
+def facet_counts():
+    """
+    Query args: the /query filters (see query_filters.FILTER_ARGS). Offers per
+    tag, form, workload and city within that selection (see facets.py).
+    """
     auth = require_api_key()
     if auth: return auth
 
-    text_query = request.args.get("text")
-    filters = {
-        "Nazwa": request.args.get("title"),
-        "Lokalizacja": request.args.get("location"),
-        "Tags": request.args.get("tags"),
-        "Preferowana forma działalności": request.args.get("form"),
-        "Wymagania nakładu pracy": request.args.get("workload"),
-    }
-
-    # Validate filters
-    if filters["Wymagania nakładu pracy"] and filters["Wymagania nakładu pracy"] not in ALLOWED_WORKLOAD:
-        return jsonify({"error": "Invalid workload", "allowed": ALLOWED_WORKLOAD}), 400
-    if filters["Preferowana forma działalności"] and filters["Preferowana forma działalności"] not in ALLOWED_FORM:
-        return jsonify({"error": "Invalid form", "allowed": ALLOWED_FORM}), 400
-    if filters["Tags"] and filters["Tags"] not in ALLOWED_TAGS:
-        return jsonify({"error": "Invalid tags", "allowed": ALLOWED_TAGS}), 400
-
-    # Date filters
-    start_date_from = parse_date(request.args.get("start_date_from", ""))
-    start_date_to = parse_date(request.args.get("start_date_to", ""))
-    end_date_from = parse_date(request.args.get("end_date_from", ""))
-    end_date_to = parse_date(request.args.get("end_date_to", ""))
+    query_args, error = parse_filter_args(request.args)
+    if error:
+        return jsonify(error), 400
+    try:
+        with stage("facets"):
+            body = services.search_backend.facets.counts(query_args)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    return jsonify(body), 200
+
+# ----------------- Endpoint: Similar -----------------
+@api.route("/opportunities/<record_id>/similar", methods=["GET"])
+def similar_opportunities(record_id):
+    """Query args: n (default 10, at most SIMILAR_K). Served from the precomputed graph (similar.py)."""
+    auth = require_api_key()
+    if auth: return auth
 
+    n, error = parse_n(request.args, SIMILAR_N)
+    if error:
+        return jsonify(error), 400
     try:
-        # If semantic query
-        if text_query:
-            embedding = generate_embedding(text_query)
-            results = collection.query(query_embeddings=[embedding], n_results=25)
-            docs = [
-                {
-                    "id": results["ids"][0][i],
-                    "document": results["documents"][0][i],
-                    "metadata": results["metadatas"][0][i],
-                    "distance": results["distances"][0][i],
-                }
-                for i in range(len(results["ids"][0]))
-            ]
-        else:
-            results = collection.get()
-            docs = [
-                {
-                    "id": results["ids"][i],
-                    "document": results["documents"][i],
-                    "metadata": results["metadatas"][i],
-                }
-                for i in range(len(results["ids"]))
-            ]
-
-        matched = []
-        for doc in docs:
-            meta = doc["metadata"]
-            ok = True
-            for field, value in filters.items():
-                if value and (field not in meta or not matches_filter(meta[field], value)):
-                    ok = False
-                    break
-            if not ok:
-                continue
-
-            # Date range filters
-            meta_start = parse_date(meta.get("Data rozpoczęcia", ""))
-            meta_end = parse_date(meta.get("Data zakończenia", ""))
-            if start_date_from and (not meta_start or meta_start < start_date_from):
-                continue
-            if start_date_to and (not meta_start or meta_start > start_date_to):
-                continue
-            if end_date_from and (not meta_end or meta_end < end_date_from):
-                continue
-            if end_date_to and (not meta_end or meta_end > end_date_to):
-                continue
-
-            matched.append(doc)
-
-        return jsonify({
-            "count": len(matched),
-            "results": matched
-        }), 200
+        with stage("similar"):
+            graph = services.search_backend.similar
+            results = graph.similar(record_id, min(n, graph.k))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    if results is None:
+        return jsonify({"error": "Unknown opportunity"}), 404
+    return jsonify({"id": record_id, "count": len(results), "results": results}), 200
+
+# ----------------- Endpoint: Suggest -----------------
+@api.route("/suggest", methods=["GET"])
+@limiter.limit("600/minute")
+def suggest_values():
+    """
+    Query args: q (prefix typed so far), n (default 8, at most 20). Most
+    popular titles, organisers and cities with a word starting with q,
+    Polish letters folded (see suggest.py).
+    """
+    auth = require_api_key()
+    if auth: return auth
 
+    q = request.args.get("q", "")
+    n, error = parse_n(request.args, SUGGEST_N, SUGGEST_TOP_K)
+    if error:
+        return jsonify(error), 400
+    try:
+        with stage("suggest"):
+            suggestions = services.search_backend.suggest.suggest(q, n)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+    return jsonify({"q": q, "suggestions": suggestions}), 200
+
+# ----------------- Endpoint: Jobs -----------------
+@api.route("/jobs/<job_id>", methods=["GET"])
+@limiter.limit("120/minute")  # clients poll this
+def job_status(job_id):
+    """Status of a queued /add_opportunity (see ingest_queue.py)."""
+    auth = require_api_key()
+    if auth: return auth
+
+    job = ingest_queue.get(job_id) if ingest_queue is not None else None
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(job), 200
+
+# ----------------- Endpoint: Metrics -----------------
+@api.route("/metrics", methods=["GET"])
+@limiter.exempt
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+# ----------------- Endpoint: Health -----------------
+@api.route("/healthz", methods=["GET"])
+@limiter.exempt
+def healthz():
+    """Liveness: the process is up (never touches Chroma or Gemini)."""
+    return jsonify({"status": "ok"}), 200
+
+@api.route("/readyz", methods=["GET"])
+@limiter.exempt
+def readyz():
+    """Readiness: 200 once clients are connected and indexes primed, 503 until then."""
+    ready, body = services.readiness()
+    return jsonify(body), 200 if ready else 503
+
+# ----------------- App factory -----------------
+def create_app(config: Optional[Dict[str, Any]] = None) -> Flask:
+    """
+    Build the API app (/add_opportunity, /add_opportunities/bulk, /query, /facets,
+    /suggest, /opportunities/<id>/similar, /jobs/<id>, /metrics, /healthz, /readyz).
+    `config` is merged into `app.config` and overrides the client settings
+    read from the environment (see services.py), e.g.
+    {"CHROMA_DATABASE": "...", "WARM_UP": "0"}. Clients are shared per process.
+    Starts the warm-up thread and the ingest workers, so call it once per
+    process: from the WSGI server (`gunicorn "mock:create_app()"`) or below.
+    """
+    global services
+    if config:
+        services = Services(config)
+    app = Flask(__name__)
+    app.config["JSON_AS_ASCII"] = False  # allow Polish chars
+    app.config.update(config or {})
+    limiter.init_app(app)
+    app.register_blueprint(api)
+    app.extensions["services"] = services
+    if services.setting("WARM_UP", "1") != "0":
+        services.start_warm_up()
+    if ingest_workers is not None:
+        ingest_workers.start()
+    return app
 
 # ----------------- Run -----------------
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5001, debug=False)
+    create_app().run(host="0.0.0.0", port=5001, debug=False)
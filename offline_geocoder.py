@@ -0,0 +1,116 @@
+"""Offline reverse geocoding of (lat, lon) to a Polish city name.
+
+The gazetteer is `data/pl_places.csv`: every Polish populated place with
+500+ inhabitants from the GeoNames cities500 extract (CC BY 4.0,
+https://www.geonames.org). Places are bucketed into a fixed lat/lon grid,
+so a lookup only looks at the handful of places in neighbouring cells.
+
+A point resolves to the most populous place whose approximate urban radius
+(grows with sqrt(population)) contains it, which maps city districts such
+as Mokotów to Warszawa. Otherwise the nearest place within `max_distance_km`
+wins, reported under its enclosing city if it lies inside one (districts on
+the edge of a city, e.g. Krakowiec-Górki Zachodnie -> Gdańsk). Beyond that
+the lookup returns None so the caller can fall back to a remote provider.
+"""
+import csv
+import math
+import os
+from collections import defaultdict
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "pl_places.csv")
+
+CELL_DEG = 0.25
+KM_PER_DEG_LAT = 110.57
+KM_PER_DEG_LON_EQUATOR = 111.32
+
+
+def urban_radius_km(population: int) -> float:
+    # ~15 km for Warszawa, ~10 km for Kraków, 1.5 km floor for small towns
+    return max(1.5, 0.012 * math.sqrt(population))
+
+
+class ReverseGeocoder:
+    def __init__(self, places: List[Tuple[str, float, float, int]],
+                 max_distance_km: float = 15.0, cache_size: int = 4096):
+        self.names = [p[0] for p in places]
+        self.lats = [p[1] for p in places]
+        self.lons = [p[2] for p in places]
+        self.populations = [p[3] for p in places]
+        self.radii = [urban_radius_km(p[3]) for p in places]
+        self.max_distance_km = max_distance_km
+        self._search_km = max(max_distance_km, max(self.radii, default=0.0))
+        self._grid: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+        for i, (lat, lon) in enumerate(zip(self.lats, self.lons)):
+            self._grid[self._cell(lat, lon)].append(i)
+        # Places inside a bigger place's urban radius are reported under that place
+        self.parents = [self._enclosing(lat, lon, i) for i, (lat, lon) in enumerate(zip(self.lats, self.lons))]
+        self.lookup = lru_cache(maxsize=cache_size)(self._lookup)
+
+    @classmethod
+    def from_csv(cls, path: str = DATA_PATH, **kwargs) -> "ReverseGeocoder":
+        with open(path, encoding="utf-8") as f:
+            places = [
+                (row["name"], float(row["lat"]), float(row["lon"]), int(row["population"]))
+                for row in csv.DictReader(f)
+            ]
+        return cls(places, **kwargs)
+
+    @staticmethod
+    def _cell(lat: float, lon: float) -> Tuple[int, int]:
+        return math.floor(lat / CELL_DEG), math.floor(lon / CELL_DEG)
+
+    def _candidates(self, lat: float, lon: float):
+        """Yield (place index, distance km) for places in the cells around a point."""
+        km_per_deg_lon = KM_PER_DEG_LON_EQUATOR * math.cos(math.radians(lat))
+        span_lat = math.ceil(self._search_km / KM_PER_DEG_LAT / CELL_DEG)
+        span_lon = math.ceil(self._search_km / max(km_per_deg_lon, 1e-6) / CELL_DEG)
+        cell_lat, cell_lon = self._cell(lat, lon)
+        for i_lat in range(cell_lat - span_lat, cell_lat + span_lat + 1):
+            for i_lon in range(cell_lon - span_lon, cell_lon + span_lon + 1):
+                for i in self._grid.get((i_lat, i_lon), ()):
+                    dy = (self.lats[i] - lat) * KM_PER_DEG_LAT
+                    dx = (self.lons[i] - lon) * km_per_deg_lon
+                    yield i, math.hypot(dx, dy)
+
+    def _enclosing(self, lat: float, lon: float, exclude: int = -1) -> Optional[int]:
+        """Most populous place whose urban radius contains the point."""
+        best, best_pop = None, -1
+        for i, km in self._candidates(lat, lon):
+            if i != exclude and km <= self.radii[i] and self.populations[i] > best_pop:
+                best, best_pop = i, self.populations[i]
+        if exclude >= 0 and best is not None and best_pop <= self.populations[exclude]:
+            return None
+        return best
+
+    def _lookup(self, lat: float, lon: float) -> Optional[str]:
+        """Wrapped in an LRU as `lookup(lat, lon)`."""
+        best_inside, best_inside_pop = None, -1
+        nearest, nearest_km = None, self.max_distance_km
+        for i, km in self._candidates(lat, lon):
+            if km <= self.radii[i] and self.populations[i] > best_inside_pop:
+                best_inside, best_inside_pop = i, self.populations[i]
+            if km <= nearest_km:
+                nearest, nearest_km = i, km
+        if best_inside is not None:
+            return self.names[best_inside]
+        if nearest is not None:
+            return self.names[self.parents[nearest] if self.parents[nearest] is not None else nearest]
+        return None
+
+    def cache_info(self):
+        return self.lookup.cache_info()
+
+
+def geocoder_from_env() -> ReverseGeocoder:
+    """
+    GEOCODER_DATA        - gazetteer CSV (default data/pl_places.csv)
+    GEOCODER_MAX_KM      - max distance to the nearest place (default 15)
+    GEOCODER_CACHE_SIZE  - LRU size for recent coordinates (default 4096)
+    """
+    return ReverseGeocoder.from_csv(
+        os.getenv("GEOCODER_DATA") or DATA_PATH,
+        max_distance_km=float(os.getenv("GEOCODER_MAX_KM", "15")),
+        cache_size=int(os.getenv("GEOCODER_CACHE_SIZE", "4096")),
+    )
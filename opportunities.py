@@ -0,0 +1,389 @@
+"""Opportunity (ogłoszenie) domain helpers shared by the Flask app (mock.py)
+and its asyncio variant (async_app.py): allowed picklist values, payload
+validation, metadata layout and the transport-independent parts of the
+endpoints (argument parsing, /query search, fusion, pagination and
+response cache glue). The apps only read the request, await or block on
+the upstream calls and write the response.
+"""
+import json
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from geo import distance_from, parse_geo, payload_coordinates, sort_by_distance
+from metrics import stage
+from query_cache import query_key
+from query_filters import (
+    FILTER_ARGS, SUBSTRING_FILTERS, compile_where, display_metadata, filter_fields, residual_matches,
+)
+from resilience import renew_deadline
+
+N_RESULTS = 25
+MAX_N_RESULTS = 200
+QUERY_MODES = ["semantic", "lexical", "hybrid"]
+RRF_K = 60
+RESULT_FIELDS = ["id", "document", "metadata", "distance", "score", "distance_km"]
+RESULT_FORMATS = ["json", "ndjson"]
+SCAN_PAGE_SIZE = 500
+BULK_LIMITS = {"embed_batch_size": 100, "write_batch_size": 1000, "concurrency": 8}
+
+# ----------------- Allowed values -----------------
+ALLOWED_TAGS = [
+    "Rynek mieszkaniowy", "Zieleń i klimat", "Jakość powietrza", "Potrzeby kierowców",
+    "Potrzeby rowerzystów", "Potrzeby pieszych", "Komunikacja miejska", "Edukcja",
+    "Zdrowie", "Oferta społeczno-kulturalna miasta", "Zwierzęta", "Seniorzy i seniorki",
+    "Transparentność działań urzędów", "Usługi komunalne (np. woda, śmieci)"
+]
+ALLOWED_WORKLOAD = [
+    "Mini - Zaangażowanie do 1 godziny tygodniowo",
+    "Lekkie - Zaangażowanie 1-4 godziny tygodniowo",
+    "Umiarkowane - Zaangażowanie 4-8 godzin tygodniowo",
+    "Pełne - Zaangażowanie ponad 8 godzin tygodniowo"
+]
+ALLOWED_FORM = [
+    "Zostań aktywistą online", "Dbaj o potrzeby dzielnicy", "Weź udział w akcjach bezpośrednich",
+    "Spotkaj się z mieszkańcami", "Zaangażuj się w obywatelską kontrolę",
+    "Wesprzyj pogotowie obywatelskie"
+]
+# query arg / payload field -> allowed values (also the tag:/form:/workload: flags, see query_filters.py)
+PICKLISTS = {"tags": ALLOWED_TAGS, "form": ALLOWED_FORM, "workload": ALLOWED_WORKLOAD}
+
+
+# ----------------- Add -----------------
+def validate_payload(data: Dict[str, Any]) -> Dict[str, str]:
+    required_fields = [
+        "title", "description", "tags", "thumbnail",
+        "lon", "lat", "start_date", "end_date", "workload", "form", "organizer"
+    ]
+    missing = [f for f in required_fields if f not in data]
+    if missing:
+        return {"error": f"Missing fields: {', '.join(missing)}"}
+
+    # Validate allowed lists
+    for field, allowed in [
+        ("tags", ALLOWED_TAGS),
+        ("workload", ALLOWED_WORKLOAD),
+        ("form", ALLOWED_FORM)
+    ]:
+        if not isinstance(data[field], list):
+            return {"error": f"{field} must be a list."}
+        invalid = [v for v in data[field] if v not in allowed]
+        if invalid:
+            return {"error": f"Invalid values in {field}: {', '.join(invalid)}"}
+
+    try:
+        payload_coordinates(data)
+    except ValueError as e:
+        return {"error": str(e)}
+
+    return {}
+
+
+def build_metadata(data: Dict[str, Any], city: str) -> Dict[str, Any]:
+    metadata = {
+        "Nazwa": data["title"],
+        "Tags": ", ".join(data["tags"]),
+        "Thumbnail": data["thumbnail"],
+        "Lokalizacja": city,
+        "Data rozpoczęcia": data["start_date"],
+        "Data zakończenia": data["end_date"],
+        "Wymagania nakładu pracy": ", ".join(data["workload"]),
+        "Preferowana forma działalności": ", ".join(data["form"]),
+        "Nazwa organizatora": data["organizer"],
+    }
+    # Offers without a place (online) are stored without coordinates
+    point = payload_coordinates(data)
+    if point is not None:
+        metadata["lat"], metadata["lon"] = point
+    metadata.update(filter_fields(metadata, PICKLISTS))
+    return metadata
+
+
+# ----------------- Query -----------------
+def validate_query_args(query_args: Dict[str, Optional[str]]) -> Dict[str, Any]:
+    if query_args["workload"] and query_args["workload"] not in ALLOWED_WORKLOAD:
+        return {"error": "Invalid workload", "allowed": ALLOWED_WORKLOAD}
+    if query_args["form"] and query_args["form"] not in ALLOWED_FORM:
+        return {"error": "Invalid form", "allowed": ALLOWED_FORM}
+    if query_args["tags"] and query_args["tags"] not in ALLOWED_TAGS:
+        return {"error": "Invalid tags", "allowed": ALLOWED_TAGS}
+    _, error = parse_geo(query_args)
+    return error
+
+
+def parse_page_args(args) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """limit / offset / n_results / fields / format from the query string, as (page, error)."""
+    page = {"limit": None, "offset": 0, "n_results": N_RESULTS, "fields": None, "format": "json"}
+    for arg, low, high in [("limit", 1, None), ("offset", 0, None), ("n_results", 1, MAX_N_RESULTS)]:
+        if not args.get(arg):
+            continue
+        try:
+            value = int(args[arg])
+        except ValueError:
+            return page, {"error": f"{arg} must be an integer"}
+        if value < low or (high is not None and value > high):
+            bounds = f"between {low} and {high}" if high is not None else f"at least {low}"
+            return page, {"error": f"{arg} must be {bounds}"}
+        page[arg] = value
+
+    if args.get("fields"):
+        fields = [f.strip() for f in args["fields"].split(",") if f.strip()]
+        invalid = [f for f in fields if f not in RESULT_FIELDS]
+        if invalid:
+            return page, {"error": f"Invalid fields: {', '.join(invalid)}", "allowed": RESULT_FIELDS}
+        page["fields"] = {"id", *fields}
+
+    if args.get("format"):
+        if args["format"] not in RESULT_FORMATS:
+            return page, {"error": "Invalid format", "allowed": RESULT_FORMATS}
+        page["format"] = args["format"]
+    return page, {}
+
+
+def semantic_n_results(query_args: Dict[str, Optional[str]], n_results: int = N_RESULTS) -> int:
+    # Over-fetch when the substring filters or the exact radius will still drop candidates after the store
+    if any(query_args[arg] for arg in SUBSTRING_FILTERS):
+        return n_results * 4
+    return n_results * 2 if query_args["radius_km"] else n_results
+
+
+def docs_from_query(results: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Vector results carry `distance`, lexical ones (`query_text`) carry `score`."""
+    ranking = "distance" if results.get("distances") else "score"
+    values = results.get("distances") or results["scores"]
+    return [
+        {
+            "id": results["ids"][0][i],
+            "document": results["documents"][0][i],
+            "metadata": results["metadatas"][0][i],
+            ranking: values[0][i],
+        }
+        for i in range(len(results["ids"][0]))
+    ]
+
+
+def fuse_rankings(*rankings: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Reciprocal rank fusion; each doc's `score` becomes its fused score."""
+    fused: Dict[str, Dict[str, Any]] = {}
+    scores: Dict[str, float] = {}
+    for docs in rankings:
+        for rank, doc in enumerate(docs):
+            fused[doc["id"]] = {**fused.get(doc["id"], {}), **doc}
+            scores[doc["id"]] = scores.get(doc["id"], 0.0) + 1.0 / (RRF_K + rank + 1)
+    ordered = sorted(fused, key=lambda doc_id: scores[doc_id], reverse=True)
+    return [{**fused[doc_id], "score": round(scores[doc_id], 6)} for doc_id in ordered]
+
+
+def docs_from_get(results: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [
+        {
+            "id": results["ids"][i],
+            "document": results["documents"][i],
+            "metadata": results["metadatas"][i],
+        }
+        for i in range(len(results["ids"]))
+    ]
+
+
+def finalize_docs(docs: List[Dict[str, Any]], query_args: Dict[str, Optional[str]],
+                  limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Apply the residual filters (title, location, exact radius), add `distance_km` when
+    lat/lon were given and strip derived metadata fields.
+    """
+    geo, _ = parse_geo(query_args)
+    matched = []
+    for doc in docs:
+        if not residual_matches(doc["metadata"], query_args):
+            continue
+        within, distance = distance_from(doc["metadata"], geo)
+        if not within:
+            continue
+        if geo and geo["center"] is not None:
+            doc["distance_km"] = None if distance is None else round(distance, 3)
+        doc["metadata"] = display_metadata(doc["metadata"])
+        matched.append(doc)
+        if limit is not None and len(matched) >= limit:
+            break
+    return matched
+
+
+def iter_matching_docs(get_page: Callable[..., Dict[str, Any]], query_args: Dict[str, Optional[str]],
+                       page_size: int = SCAN_PAGE_SIZE) -> Iterator[Dict[str, Any]]:
+    """Scan `get_page(limit=, offset=)` page by page, yielding finalized docs lazily."""
+    offset = 0
+    while True:
+        docs = docs_from_get(get_page(limit=page_size, offset=offset))
+        yield from finalize_docs(docs, query_args)
+        if len(docs) < page_size:
+            return
+        offset += page_size
+
+
+def paginate(docs: Iterable[Dict[str, Any]], page: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+    """The requested slice of `docs`, projected, and the offset of the next page (None on the last)."""
+    offset, limit = page["offset"], page["limit"]
+    window = list(islice(docs, offset, None if limit is None else offset + limit + 1))
+    next_offset = None
+    if limit is not None and len(window) > limit:
+        window, next_offset = window[:limit], offset + limit
+    return [project(doc, page["fields"]) for doc in window], next_offset
+
+
+def project(doc: Dict[str, Any], fields: Optional[set]) -> Dict[str, Any]:
+    return doc if fields is None else {k: v for k, v in doc.items() if k in fields}
+
+
+def ndjson_lines(docs: Iterable[Dict[str, Any]], page: Dict[str, Any]) -> Iterator[str]:
+    """One JSON document per line, for `format=ndjson` streaming."""
+    offset, limit = page["offset"], page["limit"]
+    for doc in islice(docs, offset, None if limit is None else offset + limit):
+        yield json.dumps(project(doc, page["fields"]), ensure_ascii=False) + "\n"
+
+
+# ----------------- Request handling -----------------
+def parse_n(args, default: int, high: Optional[int] = None) -> Tuple[int, Dict[str, Any]]:
+    """`n` from the query string, clamped to 1..high, as (n, error)."""
+    try:
+        n = int(args.get("n", default))
+    except ValueError:
+        return default, {"error": "n must be an integer"}
+    return max(1, n if high is None else min(n, high)), {}
+
+
+def parse_bulk_options(args) -> Tuple[Dict[str, int], Dict[str, Any]]:
+    """embed_batch_size / write_batch_size / concurrency, clamped to BULK_LIMITS, as (options, error)."""
+    options = {}
+    for arg, high in BULK_LIMITS.items():
+        if args.get(arg):
+            try:
+                options[arg] = max(1, min(int(args[arg]), high))
+            except ValueError:
+                return options, {"error": f"{arg} must be an integer"}
+    return options, {}
+
+
+def bulk_body(report: Dict[str, Any]) -> Dict[str, Any]:
+    return {"status": "success" if not report["errors"] else "partial", **report}
+
+
+def parse_filter_args(args) -> Tuple[Dict[str, Optional[str]], Dict[str, Any]]:
+    """The /query filters (query_filters.FILTER_ARGS), as (query_args, error)."""
+    query_args = {arg: args.get(arg) for arg in FILTER_ARGS}
+    return query_args, validate_query_args(query_args)
+
+
+def parse_query(args, default_mode: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Everything /query needs from its query string, as (query, error): text,
+    mode, filter args, page, the compiled `where` and how many candidates to
+    rank. `degraded` is filled in when an upstream fails mid-request.
+    """
+    mode = args.get("mode") or default_mode
+    if mode not in QUERY_MODES:
+        return {}, {"error": "Invalid mode", "allowed": QUERY_MODES}
+    page, error = parse_page_args(args)
+    query_args, filter_error = parse_filter_args(args)
+    if error or filter_error:
+        return {}, error or filter_error
+    return {
+        "text": args.get("text"),
+        "mode": mode,
+        "args": query_args,
+        "page": page,
+        # Tags/form/workload/dates/area are evaluated by the store; title and location substrings by Python
+        "where": compile_where(query_args),
+        "n_results": semantic_n_results(query_args, page["n_results"]),
+        "degraded": None,
+    }, {}
+
+
+def needs_embedding(query: Dict[str, Any]) -> bool:
+    return bool(query["text"]) and query["mode"] != "lexical"
+
+
+def degrade(query: Dict[str, Any], search_backend, error: Exception) -> None:
+    """
+    Gemini or Chroma down/late: rank with the in-memory lexical index, or just
+    apply the filters when building it would need Chroma.
+    """
+    query["degraded"] = f"{type(error).__name__}: {error}"
+    query["mode"] = "lexical" if search_backend.lexical_ready else "filter"
+
+
+def select_docs(query: Dict[str, Any], search_backend, embedding: Optional[List[float]],
+                search_flight, text_key: str) -> Iterable[Dict[str, Any]]:
+    """
+    Blocking part of /query once the text is embedded (`embedding` is None
+    when that was not needed or failed): semantic and/or lexical search and
+    fusion, or a lazy filtered scan, then the distance sort. Concurrent
+    identical searches share one store call through `search_flight`.
+    """
+    text, where, n_results = query["text"], query["where"], query["n_results"]
+    semantic, lexical = [], []
+    if text and embedding is not None:
+        try:
+            with stage("search"):
+                results = search_flight.do(
+                    (text_key, n_results, json.dumps(where, sort_keys=True)),
+                    lambda: search_backend.query(embedding, n_results=n_results, where=where),
+                )
+            semantic = docs_from_query(results)
+        except Exception as e:
+            degrade(query, search_backend, e)
+    if text and query["mode"] in ("lexical", "hybrid"):
+        with stage("lexical"):
+            lexical = docs_from_query(search_backend.query_text(text, n_results=n_results, where=where))
+
+    if text and query["mode"] != "filter":
+        with stage("rank"):
+            docs = fuse_rankings(semantic, lexical) if query["mode"] == "hybrid" else semantic or lexical
+            docs = finalize_docs(docs, query["args"], limit=query["page"]["n_results"])
+    else:
+        # Pulled from the store page by page, so limit/offset and streaming never load everything
+        docs = iter_matching_docs(lambda **kw: scan_page(search_backend, where, **kw), query["args"])
+    if query["args"]["sort"] == "distance":
+        # Needs every match; the radius/bbox keeps that to the candidates inside the box
+        with stage("sort"):
+            docs = sort_by_distance(docs)
+    return docs
+
+
+def scan_page(search_backend, where: Optional[Dict[str, Any]], **page) -> Dict[str, Any]:
+    """One page of a listing, with the whole request budget (an export may outlast one budget)."""
+    renew_deadline()
+    return search_backend.get(where=where, **page)
+
+
+def query_body(query: Dict[str, Any], docs: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """The JSON /query response for the requested page of `docs`."""
+    # Without ranking this is where the store is read and filtered
+    with stage("scan" if query["mode"] == "filter" or not query["text"] else "page"):
+        results, next_offset = paginate(docs, query["page"])
+    body = {"count": len(results), "results": results, "next_offset": next_offset}
+    if query["text"]:
+        body["mode"] = query["mode"]
+    if query["degraded"]:
+        body["degraded"] = query["degraded"]
+    return body
+
+
+def cached_query(query_cache, args) -> Tuple[Optional[Tuple[str, int]], Optional[Tuple[bytes, str]]]:
+    """
+    (slot, hit) for a /query: `hit` is a cached (body, mimetype), `slot` the
+    (key, generation) to store a fresh response under, None when the request
+    is not cacheable (cache off, or streamed).
+    """
+    if not query_cache.enabled or args.get("format") == "ndjson":
+        return None, None
+    slot = (query_key(args), query_cache.generation)
+    with stage("cache"):
+        return slot, query_cache.get(*slot)
+
+
+def cache_query(query_cache, slot: Optional[Tuple[str, int]], query: Dict[str, Any],
+                data: bytes, mimetype: str) -> bool:
+    """Store a fresh /query response; degraded answers are not cached."""
+    if slot is None or query["degraded"]:
+        return False
+    query_cache.put(*slot, data, mimetype)
+    return True
@@ -0,0 +1,20 @@
+"""Paging every record out of a Chroma collection.
+
+The in-memory indexes (vector, lexical, facets, suggest), the photo matcher
+and the filter-field backfill all read the whole collection at startup.
+`iter_collection` pages it with limit/offset so no caller holds one huge
+`get()` result. This module imports nothing from the app, so any of them
+(and services.py, which imports most of them) can use it.
+"""
+from typing import Any, Dict, Iterator, List
+
+
+def iter_collection(collection, include: List[str], batch_size: int = 500) -> Iterator[Dict[str, Any]]:
+    """Yield `collection.get(include=...)` results of up to `batch_size` records until none are left."""
+    offset = 0
+    while True:
+        batch = collection.get(include=include, limit=batch_size, offset=offset)
+        if not len(batch["ids"]):
+            return
+        yield batch
+        offset += len(batch["ids"])
@@ -0,0 +1,226 @@
+"""Match offers to stock photos from photos_with_ai_desc.csv.
+
+Offers carry a short English `thumbnail` description ("Volunteers playing
+with children in a hospital playroom"). Each Unsplash photo in the CSV has
+an AI caption. The captions are embedded once into a unit-normalized
+float32 matrix (`.npy`, opened memory-mapped, with a `.json` sidecar of
+URLs), so matching a batch of offers is one matrix product plus top-k.
+
+Photos are handed out at most once: a batch is assigned greedily from its
+best (offer, photo) pairs, and photos already used by stored offers are
+excluded.
+
+CLI:
+    python photo_matcher.py build [--csv photos_with_ai_desc.csv]
+    python photo_matcher.py rematch       # re-assign photos for every stored offer
+"""
+import csv
+import json
+import os
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from metrics import stage
+from paging import iter_collection
+from quantization import normalize_rows
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "photo_index.npy")
+CSV_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "photos_with_ai_desc.csv")
+TOP_K = 20
+QUERY_CHUNK = 1024
+EMBED_BATCH_SIZE = 100
+
+
+def is_url(thumbnail: str) -> bool:
+    return str(thumbnail).startswith(("http://", "https://"))
+
+
+class PhotoMatcher:
+    def __init__(self, urls: List[str], matrix: np.ndarray):
+        self.urls = urls
+        self.matrix = matrix
+        self._rows = {url: row for row, url in enumerate(urls)}
+        self._used = np.zeros(len(urls), dtype=bool)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.urls)
+
+    def mark_used(self, urls: Iterable[str]) -> None:
+        with self._lock:
+            for url in urls:
+                row = self._rows.get(url)
+                if row is not None:
+                    self._used[row] = True
+
+    def reset_used(self) -> None:
+        with self._lock:
+            self._used[:] = False
+
+    def _top_k(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(photo rows, scores) of each query's k best unused photos, chunked over queries."""
+        k = min(k, int((~self._used).sum()))
+        rows = np.zeros((len(queries), k), dtype=np.int64)
+        scores = np.zeros((len(queries), k), dtype=np.float32)
+        if k == 0:
+            return rows, scores
+        for start in range(0, len(queries), QUERY_CHUNK):
+            chunk = queries[start:start + QUERY_CHUNK] @ self.matrix.T
+            chunk[:, self._used] = -np.inf
+            top = np.argpartition(-chunk, k - 1, axis=1)[:, :k]
+            rows[start:start + len(chunk)] = top
+            scores[start:start + len(chunk)] = np.take_along_axis(chunk, top, axis=1)
+        return rows, scores
+
+    def assign(self, vectors: List[List[float]], top_k: int = TOP_K) -> List[Optional[Tuple[str, float]]]:
+        """
+        Best unused photo for each vector as (url, cosine score), or None when
+        no photos are left. Photos handed out are marked used.
+        """
+        queries = normalize_rows(np.asarray(vectors, dtype=np.float32))
+        result: List[Optional[Tuple[str, float]]] = [None] * len(queries)
+        with self._lock:
+            pending = np.arange(len(queries))
+            while len(pending):
+                rows, scores = self._top_k(queries[pending], top_k)
+                if rows.shape[1] == 0:
+                    break
+                # Greedy over all candidate pairs, best first
+                order = np.argsort(-scores, axis=None)
+                for flat in order:
+                    i, j = divmod(int(flat), rows.shape[1])
+                    query, photo = pending[i], rows[i, j]
+                    if result[query] is None and not self._used[photo]:
+                        self._used[photo] = True
+                        result[query] = (self.urls[photo], round(float(scores[i, j]), 4))
+                # Offers whose top-k all went to better matches try again
+                pending = np.array([q for q in pending if result[q] is None], dtype=np.int64)
+        return result
+
+    # ----------------- Build / load -----------------
+    @classmethod
+    def build(cls, captions: List[Tuple[str, str]], embed_batch,
+              batch_size: int = EMBED_BATCH_SIZE) -> "PhotoMatcher":
+        """Embed `(url, caption)` pairs with `embed_batch(texts) -> vectors`."""
+        vectors = []
+        for start in range(0, len(captions), batch_size):
+            vectors.extend(embed_batch([caption for _, caption in captions[start:start + batch_size]]))
+        matrix = normalize_rows(np.asarray(vectors, dtype=np.float32))
+        return cls([url for url, _ in captions], matrix)
+
+    def save(self, path: str) -> None:
+        """Write `<path>` (float32 matrix) and `<path>.json` (photo URLs)."""
+        np.save(path + ".tmp.npy", np.ascontiguousarray(self.matrix))
+        with open(path + ".json.tmp", "w", encoding="utf-8") as f:
+            json.dump({"urls": self.urls}, f)
+        os.replace(path + ".tmp.npy", path)
+        os.replace(path + ".json.tmp", path + ".json")
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "PhotoMatcher":
+        matrix = np.load(path, mmap_mode="r" if mmap else None)
+        with open(path + ".json", encoding="utf-8") as f:
+            urls = json.load(f)["urls"]
+        return cls(urls, matrix)
+
+
+def read_captions(path: str = CSV_PATH) -> List[Tuple[str, str]]:
+    with open(path, encoding="utf-8") as f:
+        return [
+            (row["photo_image_url"], row["ai_description"])
+            for row in csv.DictReader(f) if row.get("ai_description")
+        ]
+
+
+def used_photos(collection, batch_size: int = 500) -> List[str]:
+    """Photo URLs already assigned to stored offers."""
+    urls = []
+    for batch in iter_collection(collection, ["metadatas"], batch_size):
+        urls.extend(m["photo_url"] for m in batch["metadatas"] if m and m.get("photo_url"))
+    return urls
+
+
+def attach_photos(matcher: Optional[PhotoMatcher], records: List[Dict[str, Any]],
+                  metadatas: List[Dict[str, Any]], embed_batch) -> None:
+    """
+    Set `photo_url` / `photo_match_score` on the metadata of offers whose
+    thumbnail is a description. Blocking; best effort: offers are stored
+    without a photo if matching is off or fails.
+    """
+    if matcher is None:
+        return
+    pending = [(data, metadata) for data, metadata in zip(records, metadatas) if not is_url(data["thumbnail"])]
+    if not pending:
+        return
+    try:
+        vectors = embed_batch([data["thumbnail"] for data, _ in pending])
+    except Exception:
+        return
+    with stage("photo"):
+        matches = matcher.assign(vectors)
+    for (_, metadata), match in zip(pending, matches):
+        if match:
+            metadata["photo_url"], metadata["photo_match_score"] = match
+
+
+def rematch(collection, matcher: PhotoMatcher, embed_batch, batch_size: int = 500) -> int:
+    """Re-assign photos to every stored offer as one batch. Returns offers updated."""
+    ids, metadatas = [], []
+    for batch in iter_collection(collection, ["metadatas"], batch_size):
+        for record_id, metadata in zip(batch["ids"], batch["metadatas"]):
+            if metadata and metadata.get("Thumbnail") and not is_url(metadata["Thumbnail"]):
+                ids.append(record_id)
+                metadatas.append(metadata)
+    if not ids:
+        return 0
+
+    thumbnails = [metadata["Thumbnail"] for metadata in metadatas]
+    vectors = []
+    for start in range(0, len(thumbnails), EMBED_BATCH_SIZE):
+        vectors.extend(embed_batch(thumbnails[start:start + EMBED_BATCH_SIZE]))
+    matcher.reset_used()
+    updated_ids, updated = [], []
+    for record_id, metadata, match in zip(ids, metadatas, matcher.assign(vectors)):
+        if match:
+            updated_ids.append(record_id)
+            updated.append({**metadata, "photo_url": match[0], "photo_match_score": match[1]})
+    for start in range(0, len(updated_ids), batch_size):
+        collection.update(ids=updated_ids[start:start + batch_size], metadatas=updated[start:start + batch_size])
+    return len(updated_ids)
+
+
+def matcher_from_env() -> Optional[PhotoMatcher]:
+    """
+    PHOTO_INDEX_PATH  - caption matrix built by `python photo_matcher.py build`
+                        (default data/photo_index.npy); matching is off until it exists
+    """
+    path = os.getenv("PHOTO_INDEX_PATH") or DATA_PATH
+    return PhotoMatcher.load(path) if os.path.exists(path) else None
+
+
+# ----------------- CLI -----------------
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Build the photo index or re-match stored offers.")
+    parser.add_argument("command", choices=["build", "rematch"])
+    parser.add_argument("--csv", default=CSV_PATH)
+    parser.add_argument("--path", default=os.getenv("PHOTO_INDEX_PATH") or DATA_PATH)
+    args = parser.parse_args()
+
+    os.environ.setdefault("WARM_UP", "0")  # only the collection is needed here
+    import mock
+
+    started = time.perf_counter()
+    if args.command == "build":
+        captions = read_captions(args.csv)
+        # Straight to the API: 25k one-off captions would only churn the embedding cache
+        PhotoMatcher.build(captions, mock._embed_remote_batch).save(args.path)
+        print(f"Indexed {len(captions)} photos in {time.perf_counter() - started:.1f}s -> {args.path}")
+    else:
+        count = rematch(mock.services.collection, PhotoMatcher.load(args.path), mock.generate_embeddings)
+        mock.query_cache.bump()
+        print(f"Re-matched {count} offers in {time.perf_counter() - started:.1f}s")
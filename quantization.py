@@ -0,0 +1,134 @@
+"""Compact embedding storage: Matryoshka truncation and quantized codes.
+
+`gemini-embedding-001` is trained so that a prefix of its 3072-dim output
+is itself a usable embedding. `truncate()` keeps the first `dim` values and
+re-normalizes them, which is what asking the API for
+`output_dimensionality=dim` gives us, minus the traffic.
+
+`QuantizedCodes` keeps a compressed copy of unit vectors, used only to
+pick candidates. The exact full-precision vectors then re-rank those:
+
+    int8    - one signed byte per dimension plus a float32 scale per row (4x smaller)
+    binary  - one sign bit per dimension, packed into 64-bit words and
+              compared by Hamming distance (32x smaller)
+
+Scores are computed in chunks of about CHUNK_VALUES codes, so the float
+temporaries stay in cache however large the index is (with 4096-row
+chunks int8 scoring of 3072-dim rows was 3x slower than float32).
+"""
+from typing import Iterable, List, Optional
+
+import numpy as np
+
+QUANTIZATIONS = ["none", "int8", "binary"]
+CHUNK_VALUES = 2 ** 18
+
+# Set bits per byte value; for numpy < 2.0, which has no bitwise_count
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def popcount_rows(words: np.ndarray) -> np.ndarray:
+    """Set bits per row of a 2D uint64 array."""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(words).sum(axis=1, dtype=np.int32)
+    return _POPCOUNT[words.view(np.uint8)].sum(axis=1, dtype=np.int32)
+
+
+def _chunk_rows(width: int) -> int:
+    return max(64, CHUNK_VALUES // max(1, width))
+
+
+def pack_signs(vectors: np.ndarray) -> np.ndarray:
+    """Sign bits of each row as uint64 words (zero-padded to a whole word)."""
+    bits = np.packbits(vectors > 0, axis=-1)
+    pad = -bits.shape[-1] % 8
+    if pad:
+        bits = np.pad(bits, [(0, 0)] * (bits.ndim - 1) + [(0, pad)])
+    return np.ascontiguousarray(bits).view(np.uint64)
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def truncate(vectors: Iterable[Iterable[float]], dim: Optional[int]) -> np.ndarray:
+    """First `dim` dimensions of each vector, re-normalized (no-op when dim is None)."""
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if dim is None or dim >= matrix.shape[1]:
+        return matrix
+    return normalize_rows(matrix[:, :dim])
+
+
+def normalize_vector(vector: Iterable[float]) -> List[float]:
+    return normalize_rows(np.asarray([vector], dtype=np.float32))[0].tolist()
+
+
+class QuantizedCodes:
+    """Growable quantized copy of a unit-vector matrix, row-aligned with it."""
+
+    def __init__(self, kind: str, dim: int):
+        if kind not in ("int8", "binary"):
+            raise ValueError(f"Unknown quantization: {kind}")
+        self.kind = kind
+        self.dim = dim
+        width = dim if kind == "int8" else (dim + 63) // 64
+        self.codes = np.zeros((0, width), dtype=np.int8 if kind == "int8" else np.uint64)
+        self.scales = np.zeros(0, dtype=np.float32)
+        self.size = 0  # rows written; the arrays may hold spare capacity
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes per row times rows written."""
+        per_row = self.codes.itemsize * self.codes.shape[1] + (4 if self.kind == "int8" else 0)
+        return per_row * self.size
+
+    def _encode(self, vectors: np.ndarray):
+        if self.kind == "binary":
+            return pack_signs(vectors), None
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+
+    def set(self, start: int, vectors: np.ndarray) -> None:
+        """Write codes for rows start..start+len(vectors), growing as needed."""
+        end = start + len(vectors)
+        if end > len(self.codes):
+            capacity = max(end, 2 * len(self.codes), 64)
+            grown = np.zeros((capacity, self.codes.shape[1]), dtype=self.codes.dtype)
+            grown[:len(self.codes)] = self.codes
+            self.codes = grown
+            if self.kind == "int8":
+                scales = np.ones(capacity, dtype=np.float32)
+                scales[:len(self.scales)] = self.scales
+                self.scales = scales
+        codes, scales = self._encode(vectors)
+        self.codes[start:end] = codes
+        if scales is not None:
+            self.scales[start:end] = scales
+        self.size = max(self.size, end)
+
+    def scores(self, query: np.ndarray, size: int, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Approximate similarity of a unit `query` to rows [0, size) or to `rows` (higher is closer)."""
+        count = size if rows is None else len(rows)
+        out = np.empty(count, dtype=np.float32)
+        if self.kind == "binary":
+            query_bits = pack_signs(query)
+        step = _chunk_rows(self.codes.shape[1])
+        for start in range(0, count, step):
+            chunk = slice(start, min(start + step, count))
+            index = chunk if rows is None else rows[chunk]
+            if self.kind == "int8":
+                out[chunk] = (self.codes[index].astype(np.float32) @ query) * self.scales[index]
+            else:
+                out[chunk] = -popcount_rows(np.bitwise_xor(self.codes[index], query_bits))
+        return out
+
+    @classmethod
+    def build(cls, kind: str, matrix: np.ndarray) -> "QuantizedCodes":
+        codes = cls(kind, matrix.shape[1])
+        step = _chunk_rows(matrix.shape[1])
+        for start in range(0, len(matrix), step):
+            codes.set(start, np.asarray(matrix[start:start + step], dtype=np.float32))
+        return codes
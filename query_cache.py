@@ -0,0 +1,196 @@
+"""Response cache for /query.
+
+Entries are keyed by the canonicalized query string and hold the already
+serialized response body, so a hit touches neither Chroma nor Gemini. Every
+entry is tagged with the collection generation it was computed at; writes
+bump the generation, which makes all older entries stale at once.
+
+The in-process tier is an LRU with optional TTL. An optional SQLite file
+holds both the generation counter and the entries, so several gunicorn
+workers share one cache and a write in any worker invalidates it for all.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlencode
+
+
+# ----------------- Keys -----------------
+def query_key(args) -> str:
+    """Order-insensitive key for a request's query args (a MultiDict or plain dict)."""
+    items = args.items(multi=True) if hasattr(args, "getlist") else args.items()
+    canonical = urlencode(sorted((k, v) for k, v in items if v not in (None, "")))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+# ----------------- Shared tier -----------------
+class SQLiteQueryStore:
+    """Generation counter and serialized responses in one SQLite file."""
+
+    def __init__(self, path: str, max_entries: int = 4096):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS generation (id INTEGER PRIMARY KEY CHECK (id = 0), value INTEGER)")
+        self._conn.execute("INSERT OR IGNORE INTO generation (id, value) VALUES (0, 0)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, generation INTEGER NOT NULL, body BLOB NOT NULL,"
+            " mimetype TEXT NOT NULL, created REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def generation(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT value FROM generation WHERE id = 0").fetchone()[0]
+
+    def bump(self) -> int:
+        with self._lock:
+            self._conn.execute("UPDATE generation SET value = value + 1 WHERE id = 0")
+            value = self._conn.execute("SELECT value FROM generation WHERE id = 0").fetchone()[0]
+            self._conn.execute("DELETE FROM responses WHERE generation < ?", (value,))
+            self._conn.commit()
+            return value
+
+    def get(self, key: str, generation: int, max_age: Optional[float] = None) -> Optional[Tuple[bytes, str]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body, mimetype, created FROM responses WHERE key = ? AND generation = ?",
+                (key, generation),
+            ).fetchone()
+        if row is None or (max_age is not None and time.time() - row[2] > max_age):
+            return None
+        return row[0], row[1]
+
+    def set(self, key: str, generation: int, body: bytes, mimetype: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, generation, body, mimetype, created) VALUES (?, ?, ?, ?, ?)",
+                (key, generation, body, mimetype, time.time()),
+            )
+            self._conn.execute(
+                "DELETE FROM responses WHERE key NOT IN (SELECT key FROM responses ORDER BY created DESC LIMIT ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+
+# ----------------- Cache -----------------
+class QueryCache:
+    """Two-tier (memory LRU + optional shared SQLite store) response cache."""
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        ttl_seconds: Optional[float] = None,
+        store: Optional[SQLiteQueryStore] = None,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.store = store
+        self._generation = 0
+        self._entries: "OrderedDict[str, Tuple[float, int, bytes, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 or self.store is not None
+
+    @property
+    def generation(self) -> int:
+        return self.store.generation() if self.store is not None else self._generation
+
+    def bump(self) -> None:
+        """Invalidate every entry; call after each write to the collection."""
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+        if self.store is not None:
+            self.store.bump()
+
+    def get(self, key: str, generation: int) -> Optional[Tuple[bytes, str]]:
+        """(body, mimetype) cached for `key` at `generation`, if any."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, entry_generation, body, mimetype = entry
+                expired = self.ttl_seconds is not None and time.monotonic() - stored_at > self.ttl_seconds
+                if expired or entry_generation != generation:
+                    del self._entries[key]
+                else:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return body, mimetype
+        if self.store is not None:
+            cached = self.store.get(key, generation, max_age=self.ttl_seconds)
+            if cached is not None:
+                self._put_memory(key, generation, *cached)
+                with self._lock:
+                    self.shared_hits += 1
+                return cached
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def _put_memory(self, key: str, generation: int, body: bytes, mimetype: str) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), generation, body, mimetype)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def put(self, key: str, generation: int, body: bytes, mimetype: str = "application/json") -> None:
+        """Store a response computed at `generation` (read before the work started)."""
+        self._put_memory(key, generation, body, mimetype)
+        if self.store is not None:
+            self.store.set(key, generation, body, mimetype)
+
+    def stats(self) -> Dict[str, int]:
+        generation = self.generation
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "generation": generation,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.shared_hits = self.misses = 0
+        if self.store is not None:
+            self.store.clear()
+
+
+def query_cache_from_env() -> QueryCache:
+    """
+    QUERY_CACHE_SIZE  - max in-memory responses (default 256, 0 disables the memory tier)
+    QUERY_CACHE_TTL   - seconds a response may be served (default 300); bounds staleness
+                        from writes made by other workers when there is no shared store
+    QUERY_CACHE_PATH  - SQLite file shared by all workers (default: per-process only)
+    """
+    ttl = os.getenv("QUERY_CACHE_TTL", "300")
+    path = os.getenv("QUERY_CACHE_PATH")
+    return QueryCache(
+        max_entries=int(os.getenv("QUERY_CACHE_SIZE", "256")),
+        ttl_seconds=float(ttl) if ttl else None,
+        store=SQLiteQueryStore(path) if path else None,
+    )
@@ -0,0 +1,238 @@
+"""Compile /query filter args into Chroma `where` clauses.
+
+Filtering used to happen in Python after fetching either every record or
+the 25 nearest neighbours. To push it down into Chroma, every record also
+carries a few derived, filter-friendly metadata fields:
+
+    start_day / end_day      - dates as epoch days (sortable ints)
+    location_key             - lower-cased city name (the /facets city key)
+    tag:<tag>                - True for every tag on the offer
+    form:<form>              - True for every preferred form
+    workload:<workload>      - True for every workload option
+
+Title and location matching stay case-insensitive substring tests
+(Chroma has no substring operator for metadata) and are applied as a
+residual filter, so `location=warsz` still finds "Warszawa".
+Geo args (see geo.py) become a lat/lon range on the stored coordinates.
+
+Run `python query_filters.py` once to backfill these fields on records
+added before they existed.
+"""
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from geo import GEO_ARGS, geo_clauses, parse_geo
+from paging import iter_collection
+
+EPOCH = date(1970, 1, 1)
+
+# query arg -> (metadata flag prefix)
+FLAG_FILTERS = {
+    "tags": "tag:",
+    "form": "form:",
+    "workload": "workload:",
+}
+
+# query arg -> display metadata field holding its ", "-joined values
+FLAG_FIELDS = {
+    "tags": "Tags",
+    "form": "Preferowana forma działalności",
+    "workload": "Wymagania nakładu pracy",
+}
+
+# query arg -> (epoch-day field, operator)
+DATE_FILTERS = {
+    "start_date_from": ("start_day", "$gte"),
+    "start_date_to": ("start_day", "$lte"),
+    "end_date_from": ("end_day", "$gte"),
+    "end_date_to": ("end_day", "$lte"),
+}
+
+# query arg -> metadata field matched as a case-insensitive substring, after the store
+SUBSTRING_FILTERS = {
+    "title": "Nazwa",
+    "location": "Lokalizacja",
+}
+
+DERIVED_FIELDS = {"start_day", "end_day", "location_key"}
+
+# query args understood by compile_where / residual_matches
+FILTER_ARGS = ["title", "location", "tags", "form", "workload", *DATE_FILTERS, *GEO_ARGS]
+
+
+# ----------------- Derived fields -----------------
+def parse_date(date_str: str):
+    for fmt in ("%Y-%m-%d", "%d:%m:%Y"):
+        try:
+            return datetime.strptime(date_str, fmt)
+        except Exception:
+            continue
+    return None
+
+
+def epoch_day(date_str: str) -> Optional[int]:
+    parsed = parse_date(date_str or "")
+    return (parsed.date() - EPOCH).days if parsed else None
+
+
+def split_values(joined: str, allowed: Iterable[str] = ()) -> List[str]:
+    """
+    Values of a ", "-joined picklist field. Some allowed values contain a comma
+    ("Usługi komunalne (np. woda, śmieci)"), so adjacent pieces are kept
+    together when they spell an `allowed` value.
+    """
+    known = set(allowed)
+    pieces = [piece.strip() for piece in (joined or "").split(",")]
+    values = []
+    start = 0
+    while start < len(pieces):
+        # The longest run of pieces that is a known value, else a single piece
+        end = start + 1
+        for candidate in range(len(pieces), start + 1, -1):
+            if ", ".join(pieces[start:candidate]) in known:
+                end = candidate
+                break
+        value = ", ".join(pieces[start:end])
+        if value:
+            values.append(value)
+        start = end
+    return values
+
+
+def filter_fields(metadata: Dict[str, Any], picklists: Optional[Dict[str, List[str]]] = None) -> Dict[str, Any]:
+    """
+    Derived filter fields for a record, computed from its display metadata.
+    `picklists` (query arg -> allowed values) tells where the joined flag
+    fields may be split.
+    """
+    fields: Dict[str, Any] = {}
+    start = epoch_day(metadata.get("Data rozpoczęcia", ""))
+    end = epoch_day(metadata.get("Data zakończenia", ""))
+    if start is not None:
+        fields["start_day"] = start
+    if end is not None:
+        fields["end_day"] = end
+    if metadata.get("Lokalizacja"):
+        fields["location_key"] = str(metadata["Lokalizacja"]).lower()
+    for arg, field in FLAG_FIELDS.items():
+        for value in split_values(metadata.get(field), (picklists or {}).get(arg, ())):
+            fields[FLAG_FILTERS[arg] + value] = True
+    return fields
+
+
+def is_flag(key: str) -> bool:
+    return key.startswith(tuple(FLAG_FILTERS.values()))
+
+
+# ----------------- Compiler -----------------
+def compile_where(args: Dict[str, Optional[str]]) -> Optional[Dict[str, Any]]:
+    """Chroma `where` expression for the pushed-down filters, or None if there are none."""
+    clauses: List[Dict[str, Any]] = []
+    for arg, prefix in FLAG_FILTERS.items():
+        if args.get(arg):
+            clauses.append({prefix + args[arg]: True})
+    for arg, (field, op) in DATE_FILTERS.items():
+        day = epoch_day(args.get(arg) or "")
+        if day is not None:
+            clauses.append({field: {op: day}})
+    geo, _ = parse_geo(args)
+    clauses.extend(geo_clauses(geo))
+    if not clauses:
+        return None
+    if len(clauses) == 1:
+        return clauses[0]
+    return {"$and": clauses}
+
+
+def display_metadata(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """Metadata without the derived filter fields, as returned to API clients."""
+    return {
+        k: v for k, v in metadata.items()
+        if k not in DERIVED_FIELDS and not is_flag(k)
+    }
+
+
+def residual_matches(metadata: Dict[str, Any], args: Dict[str, Optional[str]]) -> bool:
+    """Filters Chroma can't evaluate (title and location substrings)."""
+    for arg, field in SUBSTRING_FILTERS.items():
+        value = args.get(arg)
+        if value and value.lower() not in str(metadata.get(field, "")).lower():
+            return False
+    return True
+
+
+# ----------------- Local evaluation -----------------
+_OPS = {
+    "$eq": lambda a, b: a == b,
+    "$ne": lambda a, b: a != b,
+    "$gt": lambda a, b: a is not None and a > b,
+    "$gte": lambda a, b: a is not None and a >= b,
+    "$lt": lambda a, b: a is not None and a < b,
+    "$lte": lambda a, b: a is not None and a <= b,
+    "$in": lambda a, b: a in b,
+    "$nin": lambda a, b: a not in b,
+}
+
+
+def matches_where(metadata: Dict[str, Any], where: Optional[Dict[str, Any]]) -> bool:
+    """Evaluate a Chroma `where` expression against one metadata dict."""
+    if not where:
+        return True
+    for key, cond in where.items():
+        if key == "$and":
+            if not all(matches_where(metadata, c) for c in cond):
+                return False
+        elif key == "$or":
+            if not any(matches_where(metadata, c) for c in cond):
+                return False
+        elif isinstance(cond, dict):
+            value = metadata.get(key)
+            for op, operand in cond.items():
+                if key not in metadata and op != "$ne" and op != "$nin":
+                    return False
+                if not _OPS[op](value, operand):
+                    return False
+        elif key not in metadata or metadata[key] != cond:
+            return False
+    return True
+
+
+# ----------------- Backfill -----------------
+def backfill_filter_fields(collection, picklists: Dict[str, List[str]], batch_size: int = 200) -> int:
+    """
+    Add derived filter fields to every record that lacks them, and drop flags
+    that no longer derive from its metadata (such as the halves of a value
+    split on its comma). Returns records updated.
+    """
+    updated = 0
+    for batch in iter_collection(collection, ["metadatas"], batch_size):
+        ids, metadatas = [], []
+        for record_id, metadata in zip(batch["ids"], batch["metadatas"]):
+            fields = filter_fields(metadata, picklists)
+            # Chroma deletes a metadata key updated to None
+            stale = {k: None for k in metadata if is_flag(k) and k not in fields}
+            if stale or any(metadata.get(k) != v for k, v in fields.items()):
+                ids.append(record_id)
+                metadatas.append({**metadata, **fields, **stale})
+        if ids:
+            collection.update(ids=ids, metadatas=metadatas)
+            updated += len(ids)
+    return updated
+
+
+if __name__ == "__main__":
+    import os
+
+    import chromadb
+    from dotenv import load_dotenv
+
+    from opportunities import PICKLISTS
+
+    load_dotenv()
+    client = chromadb.CloudClient(
+        api_key=os.getenv("CHROMA_API_KEY"),
+        tenant=os.getenv("CHROMA_TENANT"),
+        database=os.getenv("CHROMA_DATABASE")
+    )
+    count = backfill_filter_fields(client.get_or_create_collection(name="Ogloszenia"), PICKLISTS)
+    print(f"Backfilled filter fields on {count} records")
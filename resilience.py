@@ -0,0 +1,292 @@
+"""Deadlines, hedged calls and circuit breakers for upstream dependencies.
+
+Every request gets a deadline budget (REQUEST_DEADLINE_MS) when it starts.
+Each call to Gemini, Chroma or Nominatim goes through that dependency's
+`Upstream`, which
+
+  - caps the call at min(its own timeout, what is left of the budget) and
+    raises `DeadlineExceeded` when that passes (the SDKs have no deadline
+    of their own, so blocking calls run on a shared pool and are abandoned
+    when late; coroutines are cancelled). Writes are never abandoned: with
+    `deadline=False` the call runs in the caller's thread until it returns,
+    since a write given up on may still land and be retried into a duplicate
+  - optionally hedges: if no answer arrived after `hedge_after_s`, the same
+    call is sent once more and the first answer wins (used for embeddings,
+    which are idempotent and have a long tail)
+  - counts failures in a circuit breaker: after `failures` consecutive
+    errors the breaker opens and calls fail at once with `CircuitOpen` for
+    `reset_s`; then one probe call is let through (half-open) and its
+    outcome closes or re-opens the breaker
+
+Callers treat `UpstreamUnavailable` (either error) as "degrade or answer
+503", not as a 500. Bulk loads and queue workers run without a request
+budget (only the per-call timeouts apply). Listings scanned page by page
+(full `/query` results, NDJSON exports) renew the budget for every page:
+they may still be reading after the response has started.
+"""
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+UPSTREAMS = ("gemini", "chroma", "nominatim")
+BREAKER_STATES = {"closed": 0, "half_open": 1, "open": 2}
+
+_budget: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("budget", default=None)
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("deadline", default=None)
+# Blocking upstream calls run here so the caller can stop waiting for them
+_pool = ThreadPoolExecutor(max_workers=int(os.getenv("UPSTREAM_THREADS", "64")), thread_name_prefix="upstream")
+
+
+class UpstreamUnavailable(Exception):
+    """The dependency could not answer in time (or is known to be down)."""
+
+
+class DeadlineExceeded(UpstreamUnavailable):
+    pass
+
+
+class CircuitOpen(UpstreamUnavailable):
+    pass
+
+
+# Failures that may go away on retry: the dependency was down, late or overloaded
+TRANSIENT_ERRORS = (ConnectionError, TimeoutError, UpstreamUnavailable)
+TRANSIENT_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+def is_transient(error: BaseException) -> bool:
+    """True for an upstream outage (worth retrying), False for e.g. a bad payload."""
+    # SDK errors (Gemini's APIError) carry the HTTP status as `code`
+    return isinstance(error, TRANSIENT_ERRORS) or getattr(error, "code", None) in TRANSIENT_STATUS
+
+
+# ----------------- Deadline budget -----------------
+def start_deadline(seconds: Optional[float]) -> None:
+    """Give the current request (context) `seconds` for all of its upstream calls."""
+    _budget.set(seconds or None)
+    _deadline.set(time.monotonic() + seconds if seconds else None)
+
+
+def renew_deadline() -> None:
+    """Start the current budget over (once per page of a long listing)."""
+    start_deadline(_budget.get())
+
+
+def remaining() -> Optional[float]:
+    """Seconds left in the current budget, or None without one."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+# ----------------- Circuit breaker -----------------
+class CircuitBreaker:
+    def __init__(self, failures: int = 5, reset_s: float = 30.0):
+        self.failures = failures
+        self.reset_s = reset_s
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.opens = 0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def before(self) -> None:
+        """Raise `CircuitOpen` unless a call may go through now."""
+        with self._lock:
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_s:
+                self.state = "half_open"
+            if self.state == "open" or (self.state == "half_open" and self._probing):
+                raise CircuitOpen("circuit open")
+            if self.state == "half_open":
+                self._probing = True
+
+    def release(self) -> None:
+        """Give back a half-open probe slot that was not used."""
+        with self._lock:
+            self._probing = False
+
+    def success(self) -> None:
+        with self._lock:
+            self.state, self.consecutive_failures, self._probing = "closed", 0, False
+
+    def failure(self) -> None:
+        with self._lock:
+            self.consecutive_failures += 1
+            self._probing = False
+            if self.state == "half_open" or self.consecutive_failures >= self.failures:
+                if self.state != "open":
+                    self.opens += 1
+                self.state, self.opened_at = "open", time.monotonic()
+
+
+# ----------------- Upstream -----------------
+class Upstream:
+    def __init__(self, name: str, timeout_s: float, hedge_after_s: Optional[float] = None,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.name = name
+        self.timeout_s = timeout_s
+        self.hedge_after_s = hedge_after_s
+        self.breaker = breaker or CircuitBreaker()
+        self.calls = self.timeouts = self.rejected = self.hedges = self.hedge_wins = 0
+
+    def _timeout(self) -> float:
+        left = remaining()
+        timeout = self.timeout_s if left is None else min(self.timeout_s, left)
+        if timeout <= 0:
+            raise DeadlineExceeded(f"{self.name}: request deadline exceeded")
+        return timeout
+
+    def _admit(self) -> float:
+        try:
+            self.breaker.before()
+        except CircuitOpen:
+            self.rejected += 1
+            raise CircuitOpen(f"{self.name}: circuit open") from None
+        try:
+            return self._timeout()
+        except DeadlineExceeded:
+            self.breaker.release()  # nothing was sent
+            raise
+
+    def _failed(self, error: BaseException, timeout: float) -> None:
+        if isinstance(error, DeadlineExceeded):
+            self.timeouts += 1
+            if timeout < self.timeout_s:
+                # Cut short by the request's budget, not slow by its own measure
+                self.breaker.release()
+                return
+        self.breaker.failure()
+
+    def call(self, fn: Callable[[], Any], hedge: bool = False, deadline: bool = True) -> Any:
+        """
+        Run a blocking call under the deadline and breaker (hedged if asked and
+        configured). `deadline=False` (writes): refused once the budget is spent,
+        but once sent it is waited for, however long it takes.
+        """
+        timeout = self._admit()
+        self.calls += 1
+        hedge_after = self.hedge_after_s if hedge else None
+        try:
+            result = self._run(fn, timeout, hedge_after) if deadline else fn()
+        except Exception as e:
+            self._failed(e, timeout)
+            raise
+        self.breaker.success()
+        return result
+
+    def _run(self, fn: Callable[[], Any], timeout: float, hedge_after: Optional[float]) -> Any:
+        ends = time.monotonic() + timeout
+        first = _pool.submit(contextvars.copy_context().run, fn)
+        pending = {first}
+        if hedge_after is not None and hedge_after < timeout:
+            done, _ = wait(pending, timeout=hedge_after)
+            if not done:
+                self.hedges += 1
+                pending.add(_pool.submit(contextvars.copy_context().run, fn))
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, ends - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                if future.exception() is None:
+                    if future is not first:
+                        self.hedge_wins += 1
+                    return future.result()
+                error = future.exception()
+        if error is not None and not pending:
+            raise error
+        raise DeadlineExceeded(f"{self.name}: no answer within {timeout * 1000:.0f} ms")
+
+    async def call_async(self, fn: Callable[[], Awaitable[Any]], hedge: bool = False) -> Any:
+        """Coroutine variant of `call()`; late attempts are cancelled."""
+        timeout = self._admit()
+        self.calls += 1
+        hedge_after = self.hedge_after_s if hedge else None
+        try:
+            result = await self._run_async(fn, timeout, hedge_after)
+        except Exception as e:
+            self._failed(e, timeout)
+            raise
+        self.breaker.success()
+        return result
+
+    async def _run_async(self, fn: Callable[[], Awaitable[Any]], timeout: float,
+                         hedge_after: Optional[float]) -> Any:
+        loop = asyncio.get_running_loop()
+        ends = loop.time() + timeout
+        first = asyncio.ensure_future(fn())
+        pending = {first}
+        try:
+            if hedge_after is not None and hedge_after < timeout:
+                done, _ = await asyncio.wait(pending, timeout=hedge_after)
+                if not done:
+                    self.hedges += 1
+                    pending.add(asyncio.ensure_future(fn()))
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, timeout=max(0.0, ends - loop.time()), return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    break
+                for task in done:
+                    if task.exception() is None:
+                        if task is not first:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            if error is not None and not pending:
+                raise error
+            raise DeadlineExceeded(f"{self.name}: no answer within {timeout * 1000:.0f} ms")
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "breaker_state": BREAKER_STATES[self.breaker.state],
+            "breaker_opens": self.breaker.opens,
+            "calls": self.calls,
+            "timeouts": self.timeouts,
+            "rejected": self.rejected,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+        }
+
+
+def _ms(name: str, default: str) -> Optional[float]:
+    value = float(os.getenv(name, default))
+    return value / 1000 if value > 0 else None
+
+
+def request_deadline_from_env() -> Optional[float]:
+    """REQUEST_DEADLINE_MS - budget for all upstream calls of one request (default 10000, 0 = none)"""
+    return _ms("REQUEST_DEADLINE_MS", "10000")
+
+
+def upstreams_from_env() -> Dict[str, Upstream]:
+    """
+    GEMINI_TIMEOUT_MS / CHROMA_TIMEOUT_MS / NOMINATIM_TIMEOUT_MS
+                          - cap per call (default 5000 / 5000 / 3000)
+    EMBED_HEDGE_MS        - re-send an embedding call unanswered after this long
+                            (default 500, 0 = no hedging)
+    BREAKER_FAILURES      - consecutive failures that open a breaker (default 5)
+    BREAKER_RESET_MS      - how long it stays open before a probe (default 30000)
+    """
+    defaults = {"gemini": "5000", "chroma": "5000", "nominatim": "3000"}
+    failures = int(os.getenv("BREAKER_FAILURES", "5"))
+    reset_s = float(os.getenv("BREAKER_RESET_MS", "30000")) / 1000
+    return {
+        name: Upstream(
+            name,
+            timeout_s=_ms(f"{name.upper()}_TIMEOUT_MS", defaults[name]) or 3600.0,
+            hedge_after_s=_ms("EMBED_HEDGE_MS", "500") if name == "gemini" else None,
+            breaker=CircuitBreaker(failures, reset_s),
+        )
+        for name in UPSTREAMS
+    }
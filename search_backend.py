@@ -0,0 +1,268 @@
+"""Search backends used by the /query and /add_opportunity endpoints.
+
+Both backends expose the same calls (`add`, `query`, `query_text`, `get`) and
+return results shaped like Chroma's, so the endpoints don't care which one is
+used. `query_text` ranks with an in-process BM25 index (lexical_index.py),
+built on first use and updated by every `add` made through this worker.
+`similar` is the precomputed nearest-neighbour table behind
+/opportunities/<id>/similar (similar.py), `facets` the bitmap index
+behind /facets (facets.py) and `suggest` the prefix index behind /suggest
+(suggest.py), all maintained the same way.
+Chroma stays the source of truth: the local backend writes through to the
+collection and mirrors each add into its in-memory index.
+Request-path Chroma round trips go through the `guard` (the "chroma"
+`resilience.Upstream`: deadline and circuit breaker) when one is given.
+
+SEARCH_BACKEND         - "chroma" (default) or "local"
+VECTOR_INDEX_PATH      - optional `.npy` snapshot for the local index
+VECTOR_INDEX_REFRESH   - seconds between background resyncs from Chroma
+                         (picks up adds made by other workers; default off)
+VECTOR_QUANTIZATION    - "none" (default), "int8" or "binary": candidate search on
+                         quantized codes, re-ranked exactly (see quantization.py)
+VECTOR_RERANK_FACTOR   - candidates re-ranked per requested result (default 4)
+"""
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Set
+
+from facets import FacetIndex
+from lexical_index import LexicalIndex
+from resilience import Upstream
+from similar import KnnGraph, similar_k_from_env
+from suggest import SuggestIndex
+from vector_index import LocalVectorIndex
+
+if TYPE_CHECKING:  # the chromadb import is slow; apps create the client lazily (services.py)
+    from chromadb.api.models.Collection import Collection
+
+
+class ChromaSearchBackend:
+    """Every call is a Chroma round trip."""
+
+    def __init__(self, collection: "Collection", guard: Optional[Upstream] = None):
+        self.collection = collection
+        self.guard = guard
+        self._lexical: Optional[LexicalIndex] = None
+        self._lexical_lock = threading.Lock()
+        self._similar: Optional[KnnGraph] = None
+        self._similar_lock = threading.Lock()
+        self._facets: Optional[FacetIndex] = None
+        self._facets_lock = threading.Lock()
+        self._suggest: Optional[SuggestIndex] = None
+        self._suggest_lock = threading.Lock()
+
+    def _chroma(self, call: Callable[[], Any], write: bool = False) -> Any:
+        # A write that timed out may still land, so writes are waited for (see resilience.py)
+        return self.guard.call(call, deadline=not write) if self.guard is not None else call()
+
+    @property
+    def lexical_ready(self) -> bool:
+        """True when `query_text` can answer without a Chroma round trip."""
+        return self._lexical is not None
+
+    @property
+    def lexical(self) -> LexicalIndex:
+        if self._lexical is None:
+            with self._lexical_lock:
+                if self._lexical is None:
+                    index = LexicalIndex()
+                    self._fill_lexical(index)
+                    self._lexical = index
+        return self._lexical
+
+    def _fill_lexical(self, index: LexicalIndex) -> None:
+        index.sync_from_collection(self.collection)
+
+    @property
+    def facets(self) -> FacetIndex:
+        if self._facets is None:
+            with self._facets_lock:
+                if self._facets is None:
+                    index = FacetIndex()
+                    self._fill_facets(index)
+                    self._facets = index
+        return self._facets
+
+    def _fill_facets(self, index: FacetIndex) -> None:
+        index.sync_from_collection(self.collection)
+
+    @property
+    def suggest(self) -> SuggestIndex:
+        if self._suggest is None:
+            with self._suggest_lock:
+                if self._suggest is None:
+                    index = SuggestIndex()
+                    self._fill_suggest(index)
+                    self._suggest = index
+        return self._suggest
+
+    def _fill_suggest(self, index: SuggestIndex) -> None:
+        index.sync_from_collection(self.collection)
+
+    @property
+    def similar(self) -> KnnGraph:
+        if self._similar is None:
+            with self._similar_lock:
+                if self._similar is None:
+                    self._similar = KnnGraph(self._similar_vectors(), similar_k_from_env()).build()
+        return self._similar
+
+    def _similar_vectors(self) -> LocalVectorIndex:
+        # The graph needs every embedding in memory: a private copy of the collection
+        index = LocalVectorIndex()
+        index.sync_from_collection(self.collection)
+        return index
+
+    def add(self, ids: List[str], embeddings: List[List[float]],
+            documents: List[str], metadatas: List[Dict[str, Any]]) -> None:
+        self._chroma(
+            lambda: self.collection.add(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas),
+            write=True,
+        )
+        if self._lexical is not None:
+            self._lexical.add(ids, documents, metadatas)
+        if self._facets is not None:
+            self._facets.add(ids, metadatas)
+        if self._suggest is not None:
+            self._suggest.add(ids, metadatas)
+        self._mirror(ids, embeddings, documents, metadatas)
+
+    def _mirror(self, ids, embeddings, documents, metadatas) -> None:
+        """Apply a write to the in-process vector copies (only the similar graph's here)."""
+        if self._similar is not None:
+            index = self._similar.index
+            changed = [row for row in map(index.row, ids) if row is not None]
+            index.add(ids, embeddings, documents, metadatas)
+            self._similar.refresh(changed)
+
+    def existing_ids(self, ids: List[str]) -> Set[str]:
+        if not ids:
+            return set()
+        return set(self._chroma(lambda: self.collection.get(ids=ids, include=[]))["ids"])
+
+    def query(self, embedding: List[float], n_results: int = 25,
+              where: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return self._chroma(lambda: self.collection.query(query_embeddings=[embedding], n_results=n_results, where=where))
+
+    def query_text(self, text: str, n_results: int = 25,
+                   where: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return self.lexical.query(text, n_results=n_results, where=where)
+
+    def get(self, where: Optional[Dict[str, Any]] = None,
+            limit: Optional[int] = None, offset: Optional[int] = None) -> Dict[str, Any]:
+        return self._chroma(lambda: self.collection.get(where=where, limit=limit, offset=offset))
+
+
+class LocalSearchBackend(ChromaSearchBackend):
+    """Serves reads from a `LocalVectorIndex`, writes through to Chroma."""
+
+    def __init__(self, collection: "Collection", snapshot_path: Optional[str] = None,
+                 refresh_seconds: Optional[float] = None, quantization: str = "none",
+                 rerank_factor: int = 4, guard: Optional[Upstream] = None):
+        super().__init__(collection, guard)
+        self.snapshot_path = snapshot_path
+        self.quantization = quantization
+        self.rerank_factor = rerank_factor
+        self.refresh_seconds = refresh_seconds
+        self.index = self._open_index()
+        self._last_sync = time.monotonic()
+        self._refreshing = threading.Lock()
+
+    def _open_index(self) -> LocalVectorIndex:
+        if self.snapshot_path and os.path.exists(self.snapshot_path):
+            index = LocalVectorIndex.load(self.snapshot_path, quantization=self.quantization,
+                                          rerank_factor=self.rerank_factor)
+            # Records added since the snapshot was saved are fetched by id, the
+            # rest stays memory-mapped; a rebuild only if records were removed
+            added = index.sync_missing(self.collection)
+            if len(index) == self.collection.count():
+                if added:
+                    index.save(self.snapshot_path)
+                return index
+        index = LocalVectorIndex(quantization=self.quantization, rerank_factor=self.rerank_factor)
+        index.sync_from_collection(self.collection)
+        if self.snapshot_path:
+            index.save(self.snapshot_path)
+        return index
+
+    def _maybe_refresh(self) -> None:
+        if not self.refresh_seconds or time.monotonic() - self._last_sync < self.refresh_seconds:
+            return
+        if not self._refreshing.acquire(blocking=False):
+            return
+        self._last_sync = time.monotonic()
+
+        def refresh():
+            try:
+                self.index.sync_from_collection(self.collection)
+                if self.snapshot_path:
+                    self.index.save(self.snapshot_path)
+                if self._lexical is not None:
+                    self._fill_lexical(self._lexical)
+                if self._facets is not None:
+                    self._fill_facets(self._facets)
+                if self._suggest is not None:
+                    self._fill_suggest(self._suggest)
+                if self._similar is not None:
+                    self._similar.refresh()
+            finally:
+                self._refreshing.release()
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    @property
+    def lexical_ready(self) -> bool:
+        return True  # built from the vector index
+
+    def _fill_lexical(self, index: LexicalIndex) -> None:
+        # Same records as the vector index, no extra Chroma round trip
+        index.add(self.index.ids, self.index.documents, self.index.metadatas)
+
+    def _fill_facets(self, index: FacetIndex) -> None:
+        index.add(self.index.ids, self.index.metadatas)
+
+    def _fill_suggest(self, index: SuggestIndex) -> None:
+        index.add(self.index.ids, self.index.metadatas)
+        index.prime()
+
+    def _similar_vectors(self) -> LocalVectorIndex:
+        return self.index
+
+    def _mirror(self, ids, embeddings, documents, metadatas) -> None:
+        changed = [row for row in map(self.index.row, ids) if row is not None]
+        self.index.add(ids, embeddings, documents, metadatas)
+        if self._similar is not None:
+            self._similar.refresh(changed)
+
+    def query(self, embedding: List[float], n_results: int = 25,
+              where: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        self._maybe_refresh()
+        return self.index.query([embedding], n_results=n_results, where=where)
+
+    def query_text(self, text: str, n_results: int = 25,
+                   where: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        self._maybe_refresh()
+        return super().query_text(text, n_results=n_results, where=where)
+
+    def get(self, where: Optional[Dict[str, Any]] = None,
+            limit: Optional[int] = None, offset: Optional[int] = None) -> Dict[str, Any]:
+        self._maybe_refresh()
+        return self.index.get(where=where, limit=limit, offset=offset)
+
+
+def backend_from_env(collection: "Collection", guard: Optional[Upstream] = None) -> ChromaSearchBackend:
+    name = os.getenv("SEARCH_BACKEND", "chroma").lower()
+    if name == "chroma":
+        return ChromaSearchBackend(collection, guard)
+    if name == "local":
+        refresh = os.getenv("VECTOR_INDEX_REFRESH")
+        return LocalSearchBackend(
+            collection,
+            snapshot_path=os.getenv("VECTOR_INDEX_PATH") or None,
+            refresh_seconds=float(refresh) if refresh else None,
+            quantization=os.getenv("VECTOR_QUANTIZATION", "none").lower(),
+            rerank_factor=int(os.getenv("VECTOR_RERANK_FACTOR", "4")),
+            guard=guard,
+        )
+    raise ValueError(f"Unknown SEARCH_BACKEND: {name}")
@@ -0,0 +1,181 @@
+"""Process-wide clients for the API apps, created on first use.
+
+Importing an app no longer talks to Chroma or Gemini: the SDKs are imported
+and the clients built the first time a request needs them, once per
+process, and then shared by every request. Right after start the app runs
+`warm_up()` in a background thread, which does all of that eagerly (Chroma
+handshake, collection and its filter-field backfill, search backend with
+its local/lexical/facet/suggest indexes and similar-offers graph, photo
+matcher, Gemini client) so the first real request does not pay for it.
+`/readyz` reports whether that has finished; a failed warm-up is retried
+on the next probe instead of crashing the import.
+
+Settings come from the `config` passed to `create_app`, falling back to the
+environment:
+
+CHROMA_API_KEY / CHROMA_TENANT / CHROMA_DATABASE - Chroma Cloud credentials
+GOOGLE_GENAI_KEY / GEMINI_BASE_URL               - Gemini client
+WARM_UP                                          - "1" (default) warm up in the background
+                                                   when the app is created, "0" to wait for
+                                                   the first request or /readyz probe
+FILTER_BACKFILL                                  - "1" (default) add the derived filter fields
+                                                   (query_filters.py) to older records during
+                                                   warm-up, "0" to leave that to the script
+"""
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import metrics
+from opportunities import PICKLISTS
+from photo_matcher import matcher_from_env, used_photos
+from query_filters import backfill_filter_fields
+from resilience import upstreams_from_env
+from search_backend import backend_from_env
+
+logger = logging.getLogger(__name__)
+
+COLLECTION_NAME = "Ogloszenia"
+
+
+class Services:
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        self.config = dict(config or {})
+        self._values: Dict[str, Any] = {}
+        self._locks = {name: threading.Lock() for name in
+                       ("chroma_client", "collection", "gemini_client", "search_backend", "photo_matcher")}
+        self._warm_lock = threading.Lock()
+        self.warm_state = "cold"  # cold | warming | ready | failed
+        self.warm_error: Optional[str] = None
+        self.warm_steps: Dict[str, float] = {}
+        # Deadline / circuit breaker per dependency (see resilience.py)
+        self.upstreams = upstreams_from_env()
+
+    def setting(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        value = self.config.get(name)
+        return value if value is not None else os.getenv(name, default)
+
+    def _get(self, name: str, create: Callable[[], Any]) -> Any:
+        if name not in self._values:
+            with self._locks[name]:
+                if name not in self._values:
+                    self._values[name] = create()
+        return self._values[name]
+
+    # ----------------- Clients -----------------
+    @property
+    def chroma_client(self):
+        def create():
+            import chromadb
+
+            return chromadb.CloudClient(
+                api_key=self.setting("CHROMA_API_KEY"),
+                tenant=self.setting("CHROMA_TENANT"),
+                database=self.setting("CHROMA_DATABASE"),
+            )
+
+        return self._get("chroma_client", create)
+
+    @property
+    def collection(self):
+        return self._get("collection", lambda: self.chroma_client.get_or_create_collection(name=COLLECTION_NAME))
+
+    @property
+    def gemini_client(self):
+        def create():
+            from google import genai
+
+            base_url = self.setting("GEMINI_BASE_URL")
+            return genai.Client(
+                api_key=self.setting("GOOGLE_GENAI_KEY"),
+                http_options={"base_url": base_url} if base_url else None,
+            )
+
+        return self._get("gemini_client", create)
+
+    @property
+    def search_backend(self):
+        return self._get("search_backend", lambda: backend_from_env(self.collection, self.upstreams["chroma"]))
+
+    @property
+    def photo_matcher(self):
+        """None until `python photo_matcher.py build` has run."""
+        def create():
+            matcher = matcher_from_env()
+            if matcher is not None:
+                matcher.mark_used(used_photos(self.collection))
+            return matcher
+
+        return self._get("photo_matcher", create)
+
+    # ----------------- Warm-up / readiness -----------------
+    def warm_up(self) -> None:
+        """Create every client and prime the in-process indexes; records per-step timings."""
+        steps = [
+            ("collection", lambda: self.collection),
+            ("filter_fields", self.backfill_filter_fields),
+            ("search_backend", lambda: self.search_backend),
+            ("lexical_index", lambda: self.search_backend.lexical),
+            ("facet_index", lambda: self.search_backend.facets),
+            ("suggest_index", lambda: self.search_backend.suggest),
+            ("similar_graph", lambda: self.search_backend.similar),
+            ("photo_matcher", lambda: self.photo_matcher),
+            ("gemini_client", lambda: self.gemini_client),
+        ]
+        self.warm_state, self.warm_error = "warming", None
+        try:
+            for name, step in steps:
+                started = time.perf_counter()
+                step()
+                self.warm_steps[name] = round(time.perf_counter() - started, 3)
+        except Exception as e:
+            logger.exception("Warm-up failed")
+            self.warm_state, self.warm_error = "failed", f"{type(e).__name__}: {e}"
+        else:
+            self.warm_state = "ready"
+
+    def backfill_filter_fields(self) -> int:
+        """Records stored before the derived filter fields existed match no pushed-down filter."""
+        if self.setting("FILTER_BACKFILL", "1") == "0":
+            return 0
+        updated = backfill_filter_fields(self.collection, PICKLISTS)
+        if updated:
+            logger.info("Backfilled filter fields on %d records", updated)
+        return updated
+
+    def start_warm_up(self) -> bool:
+        """Warm up in a daemon thread unless that is already running or done."""
+        with self._warm_lock:
+            if self.warm_state in ("warming", "ready"):
+                return False
+            self.warm_state = "warming"
+        threading.Thread(target=self.warm_up, daemon=True, name="warm-up").start()
+        return True
+
+    def readiness(self) -> Tuple[bool, Dict[str, Any]]:
+        """(ready, details) for /readyz; kicks off (another) warm-up when cold or failed."""
+        if self.warm_state in ("cold", "failed"):
+            self.start_warm_up()
+        body: Dict[str, Any] = {"status": self.warm_state, "steps_s": dict(self.warm_steps)}
+        body["breakers"] = {name: upstream.breaker.state for name, upstream in self.upstreams.items()}
+        if self.warm_error:
+            body["error"] = self.warm_error
+        return self.warm_state == "ready", body
+
+
+def register_gauges(get_services: Callable[[], Services], embedding_cache, query_cache, geocoder,
+                    flights: Dict[str, Any], ingest_queue=None) -> None:
+    """Export an app's cache, single-flight, queue and upstream counters on /metrics."""
+    metrics.register_gauges("embedding_cache", "Embedding cache counters", embedding_cache.stats)
+    metrics.register_gauges("query_cache", "Query cache counters", query_cache.stats)
+    metrics.register_gauges("geocoder_cache", "Reverse-geocoder LRU counters", lambda: geocoder.cache_info()._asdict())
+    for name, flight in flights.items():
+        metrics.register_gauges(f"singleflight_{name}", "Single-flight executions and coalesced waiters", flight.stats)
+    if ingest_queue is not None:
+        metrics.register_gauges("ingest_jobs", "Queued adds by status", ingest_queue.stats)
+    for name in get_services().upstreams:
+        # create_app() may replace the app's Services, so look the upstream up on every scrape
+        metrics.register_gauges(f"upstream_{name}", "Upstream calls, timeouts, hedges and breaker state (2 = open)",
+                                lambda name=name: get_services().upstreams[name].stats())
@@ -0,0 +1,145 @@
+"""Precomputed "similar offers" (k-nearest-neighbour graph).
+
+`/opportunities/<id>/similar` is answered from a table holding, for every
+stored offer, the ids of its `k` most similar offers (cosine on the stored
+embeddings) and their scores. Serving it is a lookup: no embedding call
+and no vector store query.
+
+The table is built once from a `LocalVectorIndex` (the local backend's own
+index, or a private copy synced from Chroma) with blocked matrix products.
+A block has as many rows as fit its temporaries (the block × N scores and
+the argpartition indices) in BUILD_BYTES, so memory stays flat as N grows. After an add only the new offer's row is
+computed (one matrix-vector product), and the offers it now outranks get
+it inserted into their lists, displacing their last neighbour. An offer
+whose embedding was replaced gets its own row and every row that listed it
+recomputed.
+
+SIMILAR_K  - neighbours kept per offer (default 20); also the max `n`
+             (results per request, default 10)
+"""
+import os
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from vector_index import LocalVectorIndex
+
+DEFAULT_K = 20
+DEFAULT_N = 10
+BUILD_BYTES = 128 * 2 ** 20
+MAX_BLOCK = 1024
+
+
+def _block_rows(size: int) -> int:
+    # float32 score + int64 argpartition index per value
+    return max(1, min(MAX_BLOCK, BUILD_BYTES // (12 * max(1, size))))
+
+
+class KnnGraph:
+    def __init__(self, index: LocalVectorIndex, k: int = DEFAULT_K):
+        self.index = index
+        self.k = k
+        self.size = 0  # index rows covered so far
+        self.neighbours = np.full((0, k), -1, dtype=np.int64)  # -1 pads rows with < k others
+        self.scores = np.full((0, k), -np.inf, dtype=np.float32)
+        self._lock = threading.RLock()
+
+    def _top_k(self, scores: np.ndarray, rows: np.ndarray):
+        """Best k columns of each score row, best first, skipping each row's own column."""
+        scores[np.arange(len(rows)), rows] = -np.inf
+        k = min(self.k, scores.shape[1] - 1)
+        neighbours = np.full((len(rows), self.k), -1, dtype=np.int64)
+        best = np.full((len(rows), self.k), -np.inf, dtype=np.float32)
+        if k <= 0:
+            return neighbours, best
+        top = np.argpartition(scores, -k, axis=1)[:, -k:]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        neighbours[:, :k] = np.take_along_axis(top, order, axis=1)
+        best[:, :k] = np.take_along_axis(top_scores, order, axis=1)
+        return neighbours, best
+
+    def _compute_rows(self, matrix: np.ndarray, rows: np.ndarray) -> None:
+        step = _block_rows(len(matrix))
+        for start in range(0, len(rows), step):
+            block = rows[start:start + step]
+            scores = np.asarray(matrix[block]) @ matrix.T
+            self.neighbours[block], self.scores[block] = self._top_k(scores, block)
+
+    def _grow(self, size: int) -> None:
+        extra = size - len(self.neighbours)
+        if extra > 0:
+            self.neighbours = np.vstack([self.neighbours, np.full((extra, self.k), -1, dtype=np.int64)])
+            self.scores = np.vstack([self.scores, np.full((extra, self.k), -np.inf, dtype=np.float32)])
+
+    def build(self) -> "KnnGraph":
+        """(Re)compute every row."""
+        with self._lock:
+            matrix = self.index.matrix
+            self._grow(len(matrix))
+            self._compute_rows(matrix, np.arange(len(matrix)))
+            self.size = len(matrix)
+        return self
+
+    def _insert(self, row: int, neighbour: int, score: float) -> None:
+        """Put `neighbour` into `row`'s sorted list if it beats the last entry."""
+        if score <= self.scores[row, -1] or neighbour in self.neighbours[row]:
+            return
+        at = int(np.searchsorted(-self.scores[row], -score, side="right"))
+        self.neighbours[row, at + 1:] = self.neighbours[row, at:-1].copy()
+        self.scores[row, at + 1:] = self.scores[row, at:-1].copy()
+        self.neighbours[row, at], self.scores[row, at] = neighbour, score
+
+    def refresh(self, changed: Iterable[int] = ()) -> None:
+        """
+        Cover rows added to the index since the last call, and rows whose
+        embedding was replaced (`changed`).
+        """
+        with self._lock:
+            matrix = self.index.matrix
+            new = np.arange(self.size, len(matrix))
+            changed = np.asarray(sorted(set(changed)), dtype=np.int64)
+            changed = changed[changed < self.size]
+            if not len(new) and not len(changed):
+                return
+            self._grow(len(matrix))
+            if len(changed):
+                # Lists holding a replaced vector have a stale score: recompute them whole
+                stale = np.flatnonzero(np.isin(self.neighbours[:self.size], changed).any(axis=1))
+                self._compute_rows(matrix, np.union1d(changed, stale))
+            old_size = self.size
+            self._compute_rows(matrix, new)
+            self.size = len(matrix)
+            # New and replaced vectors may displace the tail of the older lists
+            for row in np.concatenate([new, changed]):
+                scores = np.asarray(matrix) @ np.asarray(matrix[row])
+                better = np.flatnonzero(scores[:old_size] > self.scores[:old_size, -1])
+                for other in better:
+                    if other != row:
+                        self._insert(other, int(row), float(scores[other]))
+
+    def similar(self, record_id: str, n: Optional[int] = None) -> Optional[List[Dict[str, Any]]]:
+        """Up to `n` most similar offers (best first), or None for an unknown id."""
+        row = self.index.row(record_id)
+        with self._lock:
+            if row is None or row >= self.size:
+                return None
+            pairs = [(int(i), float(s)) for i, s in zip(self.neighbours[row], self.scores[row]) if i >= 0]
+        return [
+            {
+                "id": self.index.ids[i],
+                "document": self.index.documents[i],
+                "metadata": self.index.metadatas[i],
+                "score": round(score, 6),
+            }
+            for i, score in pairs[:n]
+        ]
+
+    @property
+    def nbytes(self) -> int:
+        return self.neighbours.nbytes + self.scores.nbytes
+
+
+def similar_k_from_env() -> int:
+    return int(os.getenv("SIMILAR_K", str(DEFAULT_K)))
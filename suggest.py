@@ -0,0 +1,160 @@
+"""Typeahead suggestions for /suggest, from a sorted prefix array.
+
+The search box asks for completions on every keystroke. `SuggestIndex`
+keeps one entry per distinct offer title, organiser and city (`FIELDS`)
+with its popularity (offers carrying it), and a sorted array of keys: the
+folded value (lexical_index.fold, "Łódź" -> "lodz") starting at each of its
+first MAX_WORDS words, so "lodz" finds "Łódź" and "dom" finds
+"Fundacja Dom Nadziei".
+
+A lookup is a binary search for the keys starting with the folded prefix.
+Ranges of up to SCAN_LIMIT keys are scanned for their most popular
+entries. The best entries of longer ranges (typically one or two letters)
+are cached per prefix, primed when the index is filled and kept exact on
+every add, since adding offers only raises popularity.
+"""
+import bisect
+import heapq
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from lexical_index import fold
+from paging import iter_collection
+
+# metadata field -> suggestion type
+FIELDS = {"Nazwa": "title", "Nazwa organizatora": "organizer", "Lokalizacja": "location"}
+DEFAULT_N = 8
+TOP_K = 20  # most suggestions per request
+SCAN_LIMIT = 512
+MAX_WORDS = 8
+SORT_LIMIT = 64  # new keys above this are merged with one sort instead of inserted one by one
+_WORD = re.compile(r"[a-z0-9]+")
+_END = "\x7f"  # sorts after every key character
+
+
+def _words(text: str) -> List[str]:
+    return _WORD.findall(fold(text))
+
+
+class SuggestIndex:
+    def __init__(self):
+        self.entries: List[Tuple[str, str]] = []  # entry -> (type, value as first stored)
+        self.counts: List[int] = []  # entry -> offers carrying it
+        self._folded: List[str] = []
+        self._entry_ids: Dict[Tuple[str, str], int] = {}  # (type, folded value) -> entry
+        self._records: Dict[str, Tuple[int, ...]] = {}  # record id -> its entries
+        self.keys: List[str] = []
+        self._owners: List[int] = []  # key -> entry
+        self._top: Dict[str, List[int]] = {}  # prefix -> best TOP_K entries, for long ranges
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _rank(self, entry: int):
+        return -self.counts[entry], self._folded[entry]
+
+    def _entry(self, kind: str, value: Any, new_keys: List[Tuple[str, int]]) -> Optional[int]:
+        words = _words(str(value or ""))
+        if not words:
+            return None
+        folded = " ".join(words)
+        entry = self._entry_ids.get((kind, folded))
+        if entry is None:
+            entry = self._entry_ids[(kind, folded)] = len(self.entries)
+            self.entries.append((kind, str(value).strip()))
+            self.counts.append(0)
+            self._folded.append(folded)
+            new_keys.extend((" ".join(words[i:]), entry) for i in range(min(len(words), MAX_WORDS)))
+        return entry
+
+    # ----------------- Writes -----------------
+    def add(self, ids: List[str], metadatas: List[Dict[str, Any]]) -> None:
+        """Insert or replace rows."""
+        with self._lock:
+            new_keys: List[Tuple[str, int]] = []
+            raised, lowered = set(), False
+            for record_id, metadata in zip(ids, metadatas):
+                entries = tuple(
+                    entry for entry in (self._entry(kind, metadata.get(field), new_keys) for field, kind in FIELDS.items())
+                    if entry is not None
+                )
+                old = self._records.get(record_id, ())
+                if entries == old:
+                    continue
+                for entry in old:
+                    self.counts[entry] -= 1
+                    lowered = True
+                for entry in entries:
+                    self.counts[entry] += 1
+                    raised.add(entry)
+                self._records[record_id] = entries
+            self._insert(new_keys)
+            if lowered:
+                self._top.clear()  # recomputed on the next lookups
+            else:
+                for entry in raised:
+                    self._promote(entry)
+
+    def _insert(self, pairs: List[Tuple[str, int]]) -> None:
+        if len(pairs) > SORT_LIMIT:
+            merged = sorted([*zip(self.keys, self._owners), *pairs])
+            self.keys = [key for key, _ in merged]
+            self._owners = [entry for _, entry in merged]
+            return
+        for key, entry in pairs:
+            at = bisect.bisect_right(self.keys, key)
+            self.keys.insert(at, key)
+            self._owners.insert(at, entry)
+
+    def _promote(self, entry: int) -> None:
+        """Re-rank `entry` in the cached lists of every prefix of its keys."""
+        words = self._folded[entry].split(" ")
+        prefixes = {key[:end] for key in (" ".join(words[i:]) for i in range(min(len(words), MAX_WORDS)))
+                    for end in range(1, len(key) + 1)}
+        for prefix in prefixes & self._top.keys():
+            top = self._top[prefix]
+            if entry not in top:
+                top.append(entry)
+            top.sort(key=self._rank)
+            del top[TOP_K:]
+
+    def sync_from_collection(self, collection, batch_size: int = 500) -> None:
+        """Page every record's metadata out of a Chroma collection, then index them in one go."""
+        ids, metadatas = [], []
+        for batch in iter_collection(collection, ["metadatas"], batch_size):
+            ids.extend(batch["ids"])
+            metadatas.extend(batch["metadatas"])
+        self.add(ids, metadatas)
+        self.prime()
+
+    def prime(self) -> None:
+        """Cache the one- and two-letter prefixes, the only long ranges in practice."""
+        for prefix in {key[:end] for key in self.keys for end in (1, 2)}:
+            self.suggest(prefix.rstrip())
+
+    # ----------------- Reads -----------------
+    def _best(self, prefix: str) -> List[int]:
+        top = self._top.get(prefix)
+        if top is not None:
+            return top
+        lo = bisect.bisect_left(self.keys, prefix)
+        hi = bisect.bisect_left(self.keys, prefix + _END, lo)
+        candidates = {self._owners[i] for i in range(lo, hi)}
+        top = heapq.nsmallest(TOP_K, (e for e in candidates if self.counts[e] > 0), key=self._rank)
+        if hi - lo > SCAN_LIMIT:
+            self._top[prefix] = top
+        return top
+
+    def suggest(self, prefix: str, n: int = DEFAULT_N) -> List[Dict[str, Any]]:
+        """Up to `n` (at most TOP_K) most popular values with a word starting with `prefix`."""
+        words = _words(prefix)
+        if not words:
+            return []
+        with self._lock:
+            top = self._best(" ".join(words))[:n]
+            return [
+                {"type": self.entries[entry][0], "value": self.entries[entry][1], "count": self.counts[entry]}
+                for entry in top
+            ]
@@ -0,0 +1,52 @@
+import os
+import sys
+
+import pytest
+
+# The app modules are flat files at the repository root
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(scope="session")
+def records():
+    """The offers from output_data.json that the API accepts."""
+    from benchmarks import corpus
+
+    return corpus.load_records()
+
+
+@pytest.fixture(scope="session")
+def metadatas(records):
+    """Their stored metadata, cities from the offline gazetteer (as GEOCODER=offline)."""
+    from benchmarks import corpus
+    from offline_geocoder import ReverseGeocoder
+    from opportunities import build_metadata
+
+    geocoder = ReverseGeocoder.from_csv()
+    return [build_metadata(r, corpus.offline_city(geocoder, r)) for r in records]
+
+
+class Clock:
+    """A settable stand-in for time.monotonic / time.time; tests move `now` forward."""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock_targets():
+    """(module, function name) pairs the `clock` fixture replaces; a test module overrides this."""
+    return []
+
+
+@pytest.fixture
+def clock(monkeypatch, clock_targets):
+    clock = Clock()
+    for module, name in clock_targets:
+        monkeypatch.setattr(module, name, clock)
+    return clock
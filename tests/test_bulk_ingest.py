@@ -0,0 +1,81 @@
+"""Bulk loading (bulk_ingest.py) of the raw export, including offers without coordinates."""
+import json
+
+import chromadb
+import pytest
+
+from benchmarks import corpus, fakes
+from bulk_ingest import ingest, iter_records
+from offline_geocoder import ReverseGeocoder
+from opportunities import build_metadata, validate_payload
+from query_filters import compile_where
+from search_backend import ChromaSearchBackend
+
+DIM = 8
+
+
+@pytest.fixture
+def backend():
+    client = chromadb.EphemeralClient()
+    yield ChromaSearchBackend(client.get_or_create_collection("bulk-test"))
+    client.delete_collection("bulk-test")
+
+
+def load(records, backend, **options):
+    geocoder = ReverseGeocoder.from_csv()
+    return ingest(
+        records,
+        backend=backend,
+        validate=validate_payload,
+        build_metadata=lambda data: build_metadata(data, corpus.offline_city(geocoder, data)),
+        embed_batch=lambda texts: [fakes.fake_vector(text, DIM) for text in texts],
+        **options,
+    )
+
+
+def test_offers_without_coordinates_are_valid(records):
+    online = next(r for r in records if r["lat"] is None)
+
+    assert validate_payload(online) == {}
+    metadata = build_metadata(online, "")
+    assert "lat" not in metadata and "lon" not in metadata
+
+
+@pytest.mark.parametrize("lat, lon, error", [
+    (None, 21.0, "lat and lon must be numbers, or both null"),
+    ("północ", 21.0, "lat and lon must be numbers, or both null"),
+    (True, 21.0, "lat and lon must be numbers, or both null"),
+    (91.0, 21.0, "lat must be within -90..90 and lon within -180..180"),
+    (52.2, float("nan"), "lat must be within -90..90 and lon within -180..180"),
+])
+def test_invalid_coordinates_get_a_clear_error(records, lat, lon, error):
+    assert validate_payload({**records[0], "lat": lat, "lon": lon}) == {"error": error}
+
+
+def test_raw_export_loads_every_valid_offer(backend):
+    with open(corpus.DATA_PATH, encoding="utf-8") as f:
+        raw = json.load(f)
+    valid = [r for r in raw if not validate_payload(r)]
+    online = {r["uuid"] for r in valid if r["lat"] is None}
+    assert online
+
+    with open(corpus.DATA_PATH, encoding="utf-8") as f:
+        report = load(iter_records(f), backend, write_batch_size=50)
+
+    assert report["inserted"] == len(valid)
+    assert len(report["errors"]) == len(raw) - len(valid)
+    assert all(e["error"].startswith("Invalid values in") for e in report["errors"])
+    stored = backend.collection.get(ids=sorted(online), include=["metadatas"])["metadatas"]
+    assert len(stored) == len(online) and not any("lat" in m for m in stored)
+    # Geo filters skip offers without a place
+    near = backend.get(where=compile_where({"lat": "52.23", "lon": "21.01", "radius_km": "1000"}))
+    assert near["ids"] and not online & set(near["ids"])
+
+
+def test_bad_coordinates_fail_only_their_record(records, backend):
+    payloads = [{**records[0], "uuid": "bad", "lat": "n/a"}, records[1]]
+
+    report = load(payloads, backend)
+
+    assert report["inserted"] == 1
+    assert report["errors"] == [{"index": 0, "id": "bad", "error": "lat and lon must be numbers, or both null", "retryable": False}]
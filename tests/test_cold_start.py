@@ -0,0 +1,57 @@
+"""Cold start of mock.py, each case in a fresh interpreter (see benchmarks/cold_start.py)."""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+from benchmarks import cold_start
+
+CONNECT_MS = 300.0
+
+IMPORT_THEN_CREATE = """
+import json, threading
+from benchmarks import fakes
+fakes.install()
+import mock
+imported = {"app": hasattr(mock, "app"), "threads": sorted(t.name for t in threading.enumerate())}
+mock.create_app()
+created = sorted(t.name for t in threading.enumerate())
+print(json.dumps({"imported": imported, "created": created}))
+"""
+
+
+def measure(path: str) -> dict:
+    args = argparse.Namespace(runs=1, connect_ms=CONNECT_MS, chroma_ms=5.0, gemini_ms=5.0)
+    return cold_start.measure(path, args)[0]
+
+
+def test_import_builds_no_app_and_starts_no_threads(tmp_path):
+    env = {
+        **os.environ, "WARM_UP": "1", "GOOGLE_GENAI_KEY": "fake",
+        "INGEST_QUEUE_PATH": str(tmp_path / "ingest_queue.db"),
+    }
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_THEN_CREATE], capture_output=True, text=True, check=True,
+        cwd=cold_start.ROOT, env=env,
+    )
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+
+    assert report["imported"] == {"app": False, "threads": ["MainThread"]}
+    assert "warm-up" in report["created"]
+    assert any(name.startswith("ingest-worker-") for name in report["created"])
+
+
+def test_lazy_start_pays_the_handshake_on_the_first_query():
+    timings = measure("lazy")
+
+    assert timings["import"] <= timings["healthz"] <= timings["first_query"]
+    assert timings["first_query_request"] >= CONNECT_MS
+
+
+def test_warm_start_is_ready_before_the_first_query():
+    timings = measure("warm")
+
+    assert timings["healthz"] <= timings["readyz"] <= timings["first_query"]
+    assert timings["readyz"] - timings["import"] >= CONNECT_MS
+    assert timings["first_query_request"] < CONNECT_MS
@@ -0,0 +1,186 @@
+import asyncio
+import unicodedata
+
+import pytest
+
+import embedding_cache
+from embedding_cache import EmbeddingCache, SQLiteEmbeddingStore
+
+MODEL = "gemini-embedding-001"
+
+
+class CountingEmbedder:
+    """Deterministic small vectors (exact in float32); records every text sent upstream."""
+
+    def __init__(self):
+        self.calls = []
+
+    def vector(self, text):
+        return [float(len(text)), float(sum(map(ord, text)) % 1000), 1.0]
+
+    def __call__(self, text):
+        self.calls.append([text])
+        return self.vector(text)
+
+    def many(self, texts):
+        self.calls.append(list(texts))
+        return [self.vector(text) for text in texts]
+
+    @property
+    def texts(self):
+        return [text for call in self.calls for text in call]
+
+
+@pytest.fixture
+def clock_targets():
+    return [(embedding_cache.time, "monotonic"), (embedding_cache.time, "time")]
+
+
+def test_hit_skips_the_embedder():
+    embed, cache = CountingEmbedder(), EmbeddingCache()
+
+    first = cache.get_or_compute(MODEL, "pomoc dzieciom", embed)
+    second = cache.get_or_compute(MODEL, "pomoc dzieciom", embed)
+
+    assert first == second == embed.vector("pomoc dzieciom")
+    assert embed.texts == ["pomoc dzieciom"]
+    assert cache.stats() == {"hits": 1, "disk_hits": 0, "misses": 1, "size": 1}
+
+
+def test_normalized_text_shares_a_key():
+    embed, cache = CountingEmbedder(), EmbeddingCache()
+
+    cache.get_or_compute(MODEL, "Łódź  centrum", embed)
+    cache.get_or_compute(MODEL, unicodedata.normalize("NFD", " Łódź\tcentrum "), embed)
+    cache.get_or_compute(MODEL, "Łódź centrum", embed)
+
+    assert len(embed.calls) == 1
+
+
+def test_models_do_not_share_entries():
+    embed, cache = CountingEmbedder(), EmbeddingCache()
+
+    cache.get_or_compute(MODEL, "tekst", embed)
+    cache.get_or_compute(f"{MODEL}@768", "tekst", embed)
+
+    assert len(embed.calls) == 2
+
+
+def test_lru_evicts_the_least_recently_used_entry():
+    embed, cache = CountingEmbedder(), EmbeddingCache(max_entries=2)
+
+    cache.get_or_compute(MODEL, "a", embed)
+    cache.get_or_compute(MODEL, "b", embed)
+    cache.get_or_compute(MODEL, "a", embed)  # "b" is now the oldest
+    cache.get_or_compute(MODEL, "c", embed)
+
+    assert cache.get(MODEL, "b") is None
+    assert cache.get(MODEL, "a") is not None
+    assert cache.get(MODEL, "c") is not None
+    assert cache.stats()["size"] == 2
+    assert embed.texts == ["a", "b", "c"]
+
+
+def test_zero_size_disables_the_memory_tier():
+    embed, cache = CountingEmbedder(), EmbeddingCache(max_entries=0)
+
+    cache.get_or_compute(MODEL, "a", embed)
+    cache.get_or_compute(MODEL, "a", embed)
+
+    assert embed.texts == ["a", "a"]
+    assert cache.stats() == {"hits": 0, "disk_hits": 0, "misses": 2, "size": 0}
+
+
+def test_ttl_expires_memory_entries(clock):
+    embed, cache = CountingEmbedder(), EmbeddingCache(ttl_seconds=60)
+
+    cache.get_or_compute(MODEL, "a", embed)
+    clock.now += 59
+    cache.get_or_compute(MODEL, "a", embed)
+    clock.now += 2  # 61 s after it was stored
+    cache.get_or_compute(MODEL, "a", embed)
+
+    assert embed.texts == ["a", "a"]
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 2
+
+
+def test_sqlite_tier_survives_a_restart(tmp_path):
+    path = str(tmp_path / "embeddings.db")
+    embed = CountingEmbedder()
+    EmbeddingCache(store=SQLiteEmbeddingStore(path)).get_or_compute(MODEL, "pomoc", embed)
+
+    restarted = EmbeddingCache(store=SQLiteEmbeddingStore(path))
+    assert restarted.get_or_compute(MODEL, "pomoc", embed) == embed.vector("pomoc")
+    assert restarted.get_or_compute(MODEL, "pomoc", embed) == embed.vector("pomoc")
+
+    assert embed.texts == ["pomoc"]
+    # First read comes from SQLite and is promoted to memory, the second is a memory hit
+    assert restarted.stats() == {"hits": 1, "disk_hits": 1, "misses": 0, "size": 1}
+
+
+def test_sqlite_tier_is_shared_by_workers(tmp_path):
+    path = str(tmp_path / "embeddings.db")
+    embed = CountingEmbedder()
+    worker_a = EmbeddingCache(store=SQLiteEmbeddingStore(path))
+    worker_b = EmbeddingCache(store=SQLiteEmbeddingStore(path))
+
+    worker_a.get_or_compute(MODEL, "pomoc", embed)
+    worker_b.get_or_compute(MODEL, "pomoc", embed)
+
+    assert embed.texts == ["pomoc"]
+    assert worker_b.stats()["disk_hits"] == 1
+
+
+def test_sqlite_tier_respects_the_ttl(tmp_path, clock):
+    path = str(tmp_path / "embeddings.db")
+    embed = CountingEmbedder()
+    EmbeddingCache(ttl_seconds=60, store=SQLiteEmbeddingStore(path)).get_or_compute(MODEL, "a", embed)
+
+    clock.now += 61
+    restarted = EmbeddingCache(ttl_seconds=60, store=SQLiteEmbeddingStore(path))
+    restarted.get_or_compute(MODEL, "a", embed)
+
+    assert embed.texts == ["a", "a"]
+    assert restarted.stats()["disk_hits"] == 0
+
+
+def test_batch_sends_only_the_misses_in_one_call():
+    embed, cache = CountingEmbedder(), EmbeddingCache()
+    cache.get_or_compute(MODEL, "b", embed)
+
+    vectors = cache.get_or_compute_many(MODEL, ["a", "b", "c"], embed.many)
+
+    assert vectors == [embed.vector(text) for text in ["a", "b", "c"]]
+    assert embed.calls == [["b"], ["a", "c"]]
+    assert cache.stats() == {"hits": 1, "disk_hits": 0, "misses": 3, "size": 3}
+
+    cache.get_or_compute_many(MODEL, ["a", "b", "c"], embed.many)
+    assert len(embed.calls) == 2
+    assert cache.stats()["hits"] == 4
+
+
+def test_async_variant_shares_entries_and_counters():
+    embed, cache = CountingEmbedder(), EmbeddingCache()
+
+    async def compute(text):
+        return embed(text)
+
+    asyncio.run(cache.get_or_compute_async(MODEL, "a", compute))
+    cache.get_or_compute(MODEL, "a", embed)
+
+    assert embed.texts == ["a"]
+    assert cache.stats() == {"hits": 1, "disk_hits": 0, "misses": 1, "size": 1}
+
+
+def test_clear_drops_both_tiers_and_counters(tmp_path):
+    embed = CountingEmbedder()
+    cache = EmbeddingCache(store=SQLiteEmbeddingStore(str(tmp_path / "embeddings.db")))
+    cache.get_or_compute(MODEL, "a", embed)
+
+    cache.clear()
+
+    assert cache.stats() == {"hits": 0, "disk_hits": 0, "misses": 0, "size": 0}
+    assert len(cache.store) == 0
+    cache.get_or_compute(MODEL, "a", embed)
+    assert embed.texts == ["a", "a"]
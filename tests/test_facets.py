@@ -0,0 +1,50 @@
+"""/facets counts (facets.py) against a brute-force count over the corpus."""
+from collections import Counter
+
+import pytest
+
+from facets import FACETS, FacetIndex
+
+COMMA_TAG = "Usługi komunalne (np. woda, śmieci)"
+
+
+@pytest.fixture(scope="module")
+def index(records, metadatas):
+    index = FacetIndex()
+    index.add([r["uuid"] for r in records], metadatas)
+    return index
+
+
+def brute_force(records, metadatas, selected):
+    rows = [(r, m) for r, m in zip(records, metadatas) if selected(r, m)]
+    facets = {facet: {value: sum(value in r[facet] for r, _ in rows) for value in values}
+              for facet, values in FACETS.items()}
+    facets["location"] = dict(Counter(m["Lokalizacja"] for _, m in rows if m["Lokalizacja"]))
+    return {"total": len(rows), "facets": facets}
+
+
+def test_counts_without_filters(records, metadatas, index):
+    counts = index.counts({})
+
+    assert counts == brute_force(records, metadatas, lambda r, m: True)
+    assert counts["facets"]["tags"][COMMA_TAG] > 0
+
+
+@pytest.mark.parametrize("args", [
+    {"tags": COMMA_TAG},
+    {"tags": "Zdrowie"},
+    {"form": "Spotkaj się z mieszkańcami", "start_date_from": "2025-06-01"},
+    {"location": "warsz"},
+])
+def test_counts_for_a_selection(records, metadatas, index, args):
+    def selected(record, metadata):
+        return (
+            all(args[arg] in record[arg] for arg in FACETS if arg in args)
+            and args.get("location", "").lower() in metadata["Lokalizacja"].lower()
+            and record["start_date"] >= args.get("start_date_from", "")
+        )
+
+    counts = index.counts(args)
+
+    assert counts == brute_force(records, metadatas, selected)
+    assert counts["total"] > 0
@@ -0,0 +1,76 @@
+"""Radius and bbox search (geo.py, the local index's GridIndex) against a brute-force haversine scan."""
+import pytest
+
+from benchmarks import corpus, fakes
+from geo import GridIndex, distance_from, haversine_km, parse_geo
+from opportunities import build_metadata
+from query_filters import compile_where
+from vector_index import LocalVectorIndex
+
+SIZE = 2000
+
+
+@pytest.fixture(scope="module")
+def offers(records):
+    # Jittered copies put several offers in most grid cells around the cities
+    return list(corpus.scaled(records, SIZE))
+
+
+@pytest.fixture(scope="module")
+def index(offers):
+    index = LocalVectorIndex()
+    index.add(
+        [r["uuid"] for r in offers],
+        [fakes.fake_vector(r["description"], 8) for r in offers],
+        [r["description"] for r in offers],
+        [build_metadata(r, "") for r in offers],
+    )
+    return index
+
+
+def located(offers):
+    return [r for r in offers if r["lat"] is not None]
+
+
+@pytest.mark.parametrize("lat, lon, radius_km", [
+    (52.2297, 21.0122, 5),  # Warszawa
+    (50.0647, 19.9450, 50),  # Kraków
+    (51.1, 17.03, 300),
+    (54.0, 14.0, 20),  # the sea: nothing
+])
+def test_radius_matches_a_haversine_scan(offers, index, lat, lon, radius_km):
+    args = {"lat": str(lat), "lon": str(lon), "radius_km": str(radius_km)}
+    geo, _ = parse_geo(args)
+    expected = {r["uuid"] for r in located(offers) if haversine_km(lat, lon, r["lat"], r["lon"]) <= radius_km}
+
+    candidates = index.get(where=compile_where(args))
+    found = {i for i, m in zip(candidates["ids"], candidates["metadatas"]) if distance_from(m, geo)[0]}
+
+    assert found == expected
+    assert lat == 54.0 or found
+
+
+@pytest.mark.parametrize("bbox", [(20.8, 52.1, 21.3, 52.4), (14.0, 49.0, 24.2, 55.0), (19.94, 50.06, 19.95, 50.07)])
+def test_bbox_matches_a_scan(offers, index, bbox):
+    min_lon, min_lat, max_lon, max_lat = bbox
+    expected = {r["uuid"] for r in located(offers)
+                if min_lat <= r["lat"] <= max_lat and min_lon <= r["lon"] <= max_lon}
+
+    found = index.get(where=compile_where({"bbox": ",".join(map(str, bbox))}))["ids"]
+
+    assert set(found) == expected and len(found) == len(expected)
+
+
+def test_grid_cells_cover_every_row_in_the_box(offers):
+    metadatas = [build_metadata(r, "") for r in offers]
+    grid = GridIndex.from_metadatas(metadatas)
+    box = (52.0, 20.5, 52.5, 21.5)
+
+    rows = set(grid.rows_in_bbox(box).tolist())
+
+    inside = {row for row, r in enumerate(offers)
+              if r["lat"] is not None and box[0] <= r["lat"] <= box[2] and box[1] <= r["lon"] <= box[3]}
+    assert inside and inside <= rows
+    # Offers without coordinates are in no cell
+    everywhere = set(grid.rows_in_bbox((-90, -180, 90, 180)).tolist())
+    assert everywhere == {row for row, r in enumerate(offers) if r["lat"] is not None}
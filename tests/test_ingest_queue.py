@@ -0,0 +1,84 @@
+"""Queued adds (ingest_queue.py): upstream errors are retried, bad payloads fail at once."""
+import chromadb
+import pytest
+
+from benchmarks import fakes
+from bulk_ingest import ingest
+from ingest_queue import IngestWorkers, SQLiteJobQueue, job_processor
+from opportunities import build_metadata, validate_payload
+from resilience import CircuitOpen, DeadlineExceeded
+from search_backend import ChromaSearchBackend
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return SQLiteJobQueue(str(tmp_path / "jobs.db"))
+
+
+@pytest.fixture
+def backend():
+    client = chromadb.EphemeralClient()
+    yield ChromaSearchBackend(client.get_or_create_collection("queue-test"))
+    client.delete_collection("queue-test")
+
+
+def workers(queue, process):
+    return IngestWorkers(queue, process, batch_size=10, max_attempts=3, backoff_s=60)
+
+
+def processor(backend, embed_error=None):
+    def embed_batch(texts):
+        if embed_error is not None:
+            raise embed_error
+        return [fakes.fake_vector(text, 8) for text in texts]
+
+    def ingest_records(records, **options):
+        return ingest(records, backend=backend, validate=validate_payload,
+                      build_metadata=lambda data: build_metadata(data, ""), embed_batch=embed_batch, **options)
+
+    return job_processor(ingest_records, lambda: None)
+
+
+def test_invalid_payload_fails_on_the_first_attempt(records, queue, backend):
+    bad = queue.enqueue({**records[0], "lat": "n/a"})
+    good = queue.enqueue(records[1])
+
+    assert workers(queue, processor(backend)).run_once() == 2
+
+    assert queue.get(bad["job_id"])["status"] == "failed"
+    assert queue.get(bad["job_id"])["attempts"] == 1
+    assert queue.get(good["job_id"])["status"] == "done"
+
+
+@pytest.mark.parametrize("error", [ConnectionError("reset"), DeadlineExceeded("gemini"), CircuitOpen("gemini")])
+def test_upstream_errors_are_retried(records, queue, backend, error):
+    job = queue.enqueue(records[0])
+
+    workers(queue, processor(backend, embed_error=error)).run_once()
+
+    status = queue.get(job["job_id"])
+    assert (status["status"], status["attempts"]) == ("queued", 1)
+    assert status["error"].startswith("Embedding failed")
+
+
+@pytest.mark.parametrize("error, status", [(ConnectionError("down"), "queued"), (KeyError("uuid"), "failed")])
+def test_a_failed_batch_is_retried_only_when_transient(records, queue, error, status):
+    job = queue.enqueue(records[0])
+
+    def process(jobs):
+        raise error
+
+    workers(queue, process).run_once()
+
+    assert queue.get(job["job_id"])["status"] == status
+
+
+def test_transient_errors_stop_after_max_attempts(records, queue, backend):
+    job = queue.enqueue(records[0])
+    pool = workers(queue, processor(backend, embed_error=ConnectionError("down")))
+    pool.backoff_s = 0
+
+    for _ in range(pool.max_attempts):
+        pool.run_once()
+
+    assert (queue.get(job["job_id"])["status"], queue.get(job["job_id"])["attempts"]) == ("failed", 3)
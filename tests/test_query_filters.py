@@ -0,0 +1,75 @@
+"""Pushed-down /query filters (query_filters.py) against a brute-force scan of the corpus."""
+import chromadb
+import numpy as np
+import pytest
+
+from columnar import MetadataColumns
+from opportunities import ALLOWED_FORM, ALLOWED_TAGS, ALLOWED_WORKLOAD, PICKLISTS
+from query_filters import backfill_filter_fields, compile_where, filter_fields, matches_where, split_values
+
+COMMA_TAG = "Usługi komunalne (np. woda, śmieci)"
+
+
+@pytest.fixture
+def collection(records, metadatas):
+    client = chromadb.EphemeralClient()
+    collection = client.get_or_create_collection("filters-test")
+    collection.add(
+        ids=[r["uuid"] for r in records],
+        embeddings=[[1.0, 0.0]] * len(records),
+        metadatas=metadatas,
+    )
+    yield collection
+    client.delete_collection("filters-test")
+
+
+def expected_ids(records, arg, value):
+    return {r["uuid"] for r in records if value in r[arg]}
+
+
+def test_split_keeps_allowed_values_with_a_comma():
+    joined = ", ".join(["Zdrowie", COMMA_TAG, "Zwierzęta"])
+
+    assert split_values(joined, ALLOWED_TAGS) == ["Zdrowie", COMMA_TAG, "Zwierzęta"]
+    assert split_values(joined) == ["Zdrowie", "Usługi komunalne (np. woda", "śmieci)", "Zwierzęta"]
+    assert split_values("") == []
+
+
+@pytest.mark.parametrize("arg, values", [("tags", ALLOWED_TAGS), ("form", ALLOWED_FORM), ("workload", ALLOWED_WORKLOAD)])
+def test_flag_filters_match_a_brute_force_scan(records, metadatas, arg, values):
+    columns = MetadataColumns()
+    for row, metadata in enumerate(metadatas):
+        columns.set(row, metadata)
+
+    for value in values:
+        where = compile_where({arg: value})
+        expected = expected_ids(records, arg, value)
+        assert {r["uuid"] for r, m in zip(records, metadatas) if matches_where(m, where)} == expected, value
+        assert {records[row]["uuid"] for row in np.flatnonzero(columns.mask(where, metadatas))} == expected, value
+
+
+def test_comma_tag_matches_in_chroma(records, collection):
+    expected = expected_ids(records, "tags", COMMA_TAG)
+
+    found = collection.get(where=compile_where({"tags": COMMA_TAG}), include=[])["ids"]
+
+    assert expected and set(found) == expected
+
+
+def test_backfill_repairs_flags_split_on_the_comma(records, metadatas, collection):
+    # As stored before: the comma tag written as two flags
+    broken_ids, broken = [], []
+    for r, metadata in zip(records, metadatas):
+        if COMMA_TAG in r["tags"]:
+            broken_ids.append(r["uuid"])
+            broken.append({**metadata, f"tag:{COMMA_TAG}": None, **filter_fields(metadata)})
+    collection.update(ids=broken_ids, metadatas=broken)
+    assert not collection.get(where=compile_where({"tags": COMMA_TAG}), include=[])["ids"]
+
+    assert backfill_filter_fields(collection, PICKLISTS) == len(broken_ids)
+
+    repaired = collection.get(ids=broken_ids, include=["metadatas"])["metadatas"]
+    assert all(f"tag:{COMMA_TAG}" in m and "tag:śmieci)" not in m for m in repaired)
+    found = collection.get(where=compile_where({"tags": COMMA_TAG}), include=[])["ids"]
+    assert set(found) == expected_ids(records, "tags", COMMA_TAG)
+    assert backfill_filter_fields(collection, PICKLISTS) == 0
@@ -0,0 +1,359 @@
+"""Deadlines, hedging and breakers (resilience.py), and how /query and the bulk load use them."""
+import asyncio
+import contextvars
+import functools
+import importlib
+import json
+import threading
+import time
+
+import pytest
+
+import opportunities
+import resilience
+from benchmarks import corpus, fakes
+from benchmarks.faults import reset
+from benchmarks.run import seed_store
+from resilience import CircuitBreaker, CircuitOpen, DeadlineExceeded, Upstream, start_deadline
+
+ENV = {
+    "API_KEY": "test",
+    "GOOGLE_GENAI_KEY": "fake",
+    "WARM_UP": "0",
+    "SEARCH_BACKEND": "chroma",
+    "EMBEDDING_CACHE_SIZE": "0",
+    "QUERY_CACHE_SIZE": "0",
+    "REQUEST_DEADLINE_MS": "1000",
+    "EMBED_HEDGE_MS": "0",
+    "BREAKER_FAILURES": "3",
+    "BREAKER_RESET_MS": "600000",
+}
+SEEDED = 60
+
+
+@pytest.fixture
+def clock_targets():
+    return [(resilience.time, "monotonic")]
+
+
+def fail():
+    raise ConnectionError("down")
+
+
+def in_request(fn, budget_s):
+    """Run `fn` in a fresh context holding a request budget, as a request handler would."""
+    def run():
+        start_deadline(budget_s)
+        return fn()
+
+    return contextvars.copy_context().run(run)
+
+
+# ----------------- Circuit breaker -----------------
+def test_breaker_opens_after_consecutive_failures():
+    upstream = Upstream("chroma", timeout_s=1.0, breaker=CircuitBreaker(failures=3, reset_s=30))
+
+    for _ in range(3):
+        with pytest.raises(ConnectionError):
+            upstream.call(fail)
+    with pytest.raises(CircuitOpen):
+        upstream.call(lambda: "never sent")
+
+    assert upstream.stats() == {
+        "breaker_state": 2, "breaker_opens": 1, "calls": 3, "timeouts": 0, "rejected": 1, "hedges": 0, "hedge_wins": 0,
+    }
+
+
+def test_success_resets_the_failure_count():
+    upstream = Upstream("chroma", timeout_s=1.0, breaker=CircuitBreaker(failures=2, reset_s=30))
+
+    with pytest.raises(ConnectionError):
+        upstream.call(fail)
+    upstream.call(lambda: "ok")
+    with pytest.raises(ConnectionError):
+        upstream.call(fail)
+
+    assert upstream.breaker.state == "closed"
+
+
+def test_half_open_lets_one_probe_through_and_closes_on_success(clock):
+    breaker = CircuitBreaker(failures=1, reset_s=30)
+    breaker.before()
+    breaker.failure()
+
+    clock.now += 29
+    with pytest.raises(CircuitOpen):
+        breaker.before()
+    clock.now += 1
+    breaker.before()  # the probe
+    assert breaker.state == "half_open"
+    with pytest.raises(CircuitOpen):
+        breaker.before()  # a second caller while the probe is out
+
+    breaker.success()
+    assert breaker.state == "closed"
+    breaker.before()
+
+
+def test_failed_probe_reopens_the_breaker(clock):
+    breaker = CircuitBreaker(failures=1, reset_s=30)
+    breaker.before()
+    breaker.failure()
+
+    clock.now += 30
+    breaker.before()
+    breaker.failure()
+
+    assert (breaker.state, breaker.opens) == ("open", 2)
+    with pytest.raises(CircuitOpen):
+        breaker.before()
+
+
+def test_unused_probe_slot_is_released(clock):
+    upstream = Upstream("chroma", timeout_s=1.0, breaker=CircuitBreaker(failures=1, reset_s=30))
+    with pytest.raises(ConnectionError):
+        upstream.call(fail)
+
+    clock.now += 30
+    # The budget is spent, so the probe is never sent and the slot goes back
+    with pytest.raises(DeadlineExceeded):
+        in_request(lambda: upstream.call(lambda: "late"), -1)
+    assert upstream.call(lambda: "probe") == "probe"
+    assert upstream.breaker.state == "closed"
+
+
+# ----------------- Deadlines -----------------
+def test_call_is_capped_by_the_request_budget():
+    upstream = Upstream("gemini", timeout_s=5.0)
+
+    started = time.perf_counter()
+    with pytest.raises(DeadlineExceeded):
+        in_request(lambda: upstream.call(lambda: time.sleep(0.5)), 0.05)
+
+    assert time.perf_counter() - started < 0.4
+    assert upstream.timeouts == 1
+    # Cut short by the budget, not by its own timeout: no breaker failure
+    assert upstream.breaker.consecutive_failures == 0
+
+
+def test_writes_are_waited_for_past_the_budget():
+    upstream = Upstream("chroma", timeout_s=5.0)
+
+    def write():
+        time.sleep(0.2)
+        return "stored"
+
+    assert in_request(lambda: upstream.call(write, deadline=False), 0.05) == "stored"
+    assert upstream.timeouts == 0
+
+
+# ----------------- Hedging -----------------
+def slow_then_fast(slow_s):
+    """A call whose first attempt takes `slow_s`; every later one answers at once."""
+    attempts, lock = [], threading.Lock()
+
+    def call():
+        with lock:
+            attempts.append(len(attempts))
+            first = len(attempts) == 1
+        if first:
+            time.sleep(slow_s)
+            return "slow"
+        return "fast"
+
+    return call, attempts
+
+
+def test_hedge_wins_over_a_slow_first_attempt():
+    upstream = Upstream("gemini", timeout_s=2.0, hedge_after_s=0.05)
+    call, attempts = slow_then_fast(0.5)
+
+    started = time.perf_counter()
+    assert upstream.call(call, hedge=True) == "fast"
+
+    assert time.perf_counter() - started < 0.4
+    assert len(attempts) == 2
+    assert (upstream.hedges, upstream.hedge_wins) == (1, 1)
+
+
+def test_no_hedge_for_a_prompt_answer_or_without_hedge():
+    upstream = Upstream("gemini", timeout_s=2.0, hedge_after_s=0.05)
+    call, attempts = slow_then_fast(0.1)
+
+    assert upstream.call(call) == "slow"
+    assert upstream.call(lambda: "fast", hedge=True) == "fast"
+
+    assert len(attempts) == 1
+    assert (upstream.hedges, upstream.hedge_wins) == (0, 0)
+
+
+def test_async_hedge_wins_and_cancels_the_slow_attempt():
+    upstream = Upstream("gemini", timeout_s=2.0, hedge_after_s=0.05)
+    attempts, cancelled = [], []
+
+    async def call():
+        attempts.append(len(attempts))
+        if len(attempts) == 1:
+            try:
+                await asyncio.sleep(0.5)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+            return "slow"
+        return "fast"
+
+    async def run():
+        result = await upstream.call_async(call, hedge=True)
+        await asyncio.sleep(0)  # let the cancellation land
+        return result
+
+    assert asyncio.run(run()) == "fast"
+    assert (upstream.hedges, upstream.hedge_wins) == (1, 1)
+    assert cancelled == [True]
+
+
+# ----------------- App -----------------
+@pytest.fixture(scope="module")
+def mock():
+    with pytest.MonkeyPatch.context() as patch:
+        for name, value in ENV.items():
+            patch.setenv(name, value)
+        for name in ("EMBEDDING_CACHE_PATH", "QUERY_CACHE_PATH", "VECTOR_INDEX_PATH", "INGEST_QUEUE_PATH"):
+            patch.delenv(name, raising=False)
+        fakes.install()
+        module = importlib.import_module("mock")
+        module.limiter.enabled = False
+        # create_app() and the Services read settings too, so the env stays patched
+        yield module
+
+
+@pytest.fixture(scope="module")
+def app(mock):
+    app = mock.create_app()
+    seed_store(mock, list(corpus.scaled(corpus.load_records(), SEEDED)))
+    return app
+
+
+@pytest.fixture
+def client(mock, app, monkeypatch):
+    reset(mock, {"connect": 0.0, "chroma": 0.0, "gemini": 0.0, "nominatim": 0.0})
+    # Each test states whether the lexical index is in memory
+    monkeypatch.setattr(mock.services.search_backend, "_lexical", None)
+    return app.test_client()
+
+
+def query(mock, client, **params):
+    response = client.get("/query", query_string={"mode": "semantic", **params}, headers={"x-api-key": mock.API_KEY})
+    return response.status_code, response.get_json()
+
+
+def test_healthy_query_is_semantic(mock, client):
+    status, body = query(mock, client, text="pomoc osobom starszym")
+
+    assert status == 200
+    assert body["mode"] == "semantic"
+    assert "degraded" not in body
+    assert body["results"]
+
+
+def test_gemini_down_degrades_to_the_lexical_index(mock, client):
+    mock.services.search_backend.lexical
+    fakes.FAILING["gemini"] = True
+
+    status, body = query(mock, client, text="pomoc osobom starszym")
+
+    assert status == 200
+    assert body["mode"] == "lexical"
+    assert body["degraded"].startswith("ConnectionError")
+
+
+def test_without_a_lexical_index_degrades_to_filters(mock, client):
+    fakes.FAILING["gemini"] = True
+
+    status, body = query(mock, client, text="pomoc osobom starszym")
+
+    assert status == 200
+    assert body["mode"] == "filter"
+    assert body["degraded"]
+
+
+def test_slow_chroma_is_cut_at_the_deadline(mock, client):
+    mock.services.search_backend.lexical
+    fakes.LATENCY["chroma"] = 1.5
+
+    started = time.perf_counter()
+    status, body = query(mock, client, text="pomoc osobom starszym")
+
+    assert time.perf_counter() - started < 1.4
+    assert status == 200
+    assert body["mode"] == "lexical"
+    assert body["degraded"].startswith("DeadlineExceeded")
+
+
+def test_open_chroma_breaker_stops_calls_and_serves_lexical(mock, client):
+    mock.services.search_backend.lexical
+    fakes.FAILING["chroma"] = True
+    chroma = mock.services.upstreams["chroma"]
+
+    for i in range(chroma.breaker.failures):
+        assert query(mock, client, text=f"pomoc {i}")[0] == 200
+    assert chroma.breaker.state == "open"
+
+    calls = fakes.CALLS["chroma"]
+    status, body = query(mock, client, text="pomoc po otwarciu")
+    assert fakes.CALLS["chroma"] == calls
+    assert (status, body["mode"]) == (200, "lexical")
+    assert body["degraded"].startswith("CircuitOpen")
+    assert chroma.stats()["rejected"] == 1
+
+
+def test_open_breaker_without_a_fallback_answers_503(mock, client):
+    fakes.FAILING["chroma"] = True
+    chroma = mock.services.upstreams["chroma"]
+    for _ in range(chroma.breaker.failures):
+        chroma.breaker.failure()
+
+    status, body = query(mock, client, text="pomoc osobom starszym")
+
+    assert status == 503
+    assert "circuit open" in body["error"]
+
+
+def test_bulk_load_outlasts_the_request_deadline(mock, client):
+    originals = corpus.load_records()
+    # Synthetic offers with fresh uuids, none of them seeded
+    records = list(corpus.scaled(originals, len(originals) + 120, seed=1))[len(originals):]
+    fakes.LATENCY["chroma"] = 0.15  # 12 chunks x (duplicate check + write) = ~3.6 s
+
+    response = client.post(
+        "/add_opportunities/bulk", query_string={"write_batch_size": 10}, json=records,
+        headers={"x-api-key": mock.API_KEY},
+    )
+    body = response.get_json()
+
+    assert response.status_code == 200
+    assert body["elapsed_s"] > 1.0
+    assert (body["status"], body["inserted"], body["errors"]) == ("success", 120, [])
+    fakes.LATENCY["chroma"] = 0.0
+    stored = mock.services.search_backend.existing_ids([record["uuid"] for record in records])
+    assert len(stored) == 120
+
+
+@pytest.mark.parametrize("fmt", ["ndjson", "json"])
+def test_full_listing_outlasts_the_request_deadline(mock, client, monkeypatch, fmt):
+    total = mock.services.collection.count()
+    # Pages of 20 at 0.4 s each: the whole listing takes several request budgets
+    monkeypatch.setattr(opportunities, "iter_matching_docs",
+                        functools.partial(opportunities.iter_matching_docs, page_size=20))
+    fakes.LATENCY["chroma"] = 0.4
+
+    started = time.perf_counter()
+    response = client.get("/query", query_string={"format": fmt}, headers={"x-api-key": mock.API_KEY})
+    if fmt == "ndjson":
+        ids = [json.loads(line)["id"] for line in response.get_data(as_text=True).splitlines()]
+    else:
+        ids = [doc["id"] for doc in response.get_json()["results"]]
+
+    assert response.status_code == 200
+    assert time.perf_counter() - started > 1.0
+    assert len(ids) == len(set(ids)) == total
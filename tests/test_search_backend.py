@@ -0,0 +1,74 @@
+"""The local backend's snapshot (search_backend.py, vector_index.py) survives adds made after it was saved."""
+import chromadb
+import pytest
+
+from benchmarks import fakes
+from search_backend import LocalSearchBackend
+from vector_index import LocalVectorIndex
+
+DIM = 8
+
+
+class RecordingCollection:
+    """A Chroma collection that remembers the ids of every record read with its embedding."""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.fetched = []
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+    def get(self, **kwargs):
+        batch = self.collection.get(**kwargs)
+        if "embeddings" in kwargs.get("include", []):
+            self.fetched.extend(batch["ids"])
+        return batch
+
+
+@pytest.fixture
+def collection():
+    client = chromadb.EphemeralClient()
+    collection = client.get_or_create_collection("snapshot-test")
+    yield collection
+    client.delete_collection("snapshot-test")
+
+
+def add(collection, records, metadatas):
+    collection.add(
+        ids=[r["uuid"] for r in records],
+        embeddings=[fakes.fake_vector(r["description"], DIM) for r in records],
+        documents=[r["description"] for r in records],
+        metadatas=metadatas,
+    )
+
+
+def test_snapshot_fetches_only_records_added_since_it_was_saved(records, metadatas, collection, tmp_path):
+    path = str(tmp_path / "index.npy")
+    add(collection, records[:100], metadatas[:100])
+    LocalSearchBackend(collection, snapshot_path=path)
+    # Another worker adds offers after the snapshot was saved
+    add(collection, records[100:], metadatas[100:])
+
+    recording = RecordingCollection(collection)
+    backend = LocalSearchBackend(recording, snapshot_path=path)
+
+    assert sorted(recording.fetched) == sorted(r["uuid"] for r in records[100:])
+    assert sorted(backend.index.ids) == sorted(r["uuid"] for r in records)
+    # Saved again, so the next worker starts without fetching anything
+    assert len(LocalVectorIndex.load(path)) == len(records)
+    recording.fetched.clear()
+    LocalSearchBackend(recording, snapshot_path=path)
+    assert recording.fetched == []
+
+
+def test_snapshot_with_removed_records_is_rebuilt(records, metadatas, collection, tmp_path):
+    path = str(tmp_path / "index.npy")
+    add(collection, records, metadatas)
+    LocalSearchBackend(collection, snapshot_path=path)
+    collection.delete(ids=[records[0]["uuid"]])
+
+    backend = LocalSearchBackend(collection, snapshot_path=path)
+
+    assert len(backend.index) == len(records) - 1
+    assert backend.index.row(records[0]["uuid"]) is None
@@ -0,0 +1,66 @@
+"""The kNN "similar offers" table (similar.py) against brute-force cosine over all offers."""
+import numpy as np
+import pytest
+
+from benchmarks import corpus, fakes
+from opportunities import build_metadata
+from similar import KnnGraph
+from vector_index import LocalVectorIndex
+
+DIM = 16
+K = 10
+
+
+def add(index, offers):
+    index.add(
+        [r["uuid"] for r in offers],
+        [fakes.fake_vector(r["description"], DIM) for r in offers],
+        [r["description"] for r in offers],
+        [build_metadata(r, "") for r in offers],
+    )
+
+
+def assert_exact(graph, index):
+    """Every offer's list holds the k best cosine scores of all other offers, best first."""
+    scores = index.matrix @ index.matrix.T
+    np.fill_diagonal(scores, -np.inf)
+    for row, record_id in enumerate(index.ids):
+        expected = np.sort(scores[row])[::-1][:K]
+        similar = graph.similar(record_id, K)
+        found = [index.row(doc["id"]) for doc in similar]
+        assert row not in found and len(set(found)) == len(found) == K
+        # Scores match the brute force, and each is the true score of the offer listed
+        np.testing.assert_allclose([doc["score"] for doc in similar], expected, atol=1e-5)
+        np.testing.assert_allclose(scores[row, found], expected, atol=1e-5)
+
+
+@pytest.fixture
+def offers(records):
+    return list(corpus.scaled(records, 400))
+
+
+def test_built_graph_matches_brute_force(offers):
+    index = LocalVectorIndex()
+    add(index, offers)
+
+    graph = KnnGraph(index, k=K).build()
+
+    assert_exact(graph, index)
+    assert graph.similar("no-such-id") is None
+
+
+def test_refresh_after_adds_and_replacements_matches_brute_force(offers):
+    index = LocalVectorIndex()
+    add(index, offers[:300])
+    graph = KnnGraph(index, k=K).build()
+
+    add(index, offers[300:])
+    graph.refresh()
+    assert_exact(graph, index)
+
+    # New descriptions (and so embeddings) for offers already in the graph
+    changed = [{**r, "description": f"{r['description']} (zmiana)"} for r in offers[:20]]
+    rows = [index.row(r["uuid"]) for r in changed]
+    add(index, changed)
+    graph.refresh(rows)
+    assert_exact(graph, index)
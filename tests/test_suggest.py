@@ -0,0 +1,70 @@
+"""/suggest (suggest.py) against a plain prefix match over every title, organiser and city."""
+import re
+
+import pytest
+
+from benchmarks import corpus
+from lexical_index import fold
+from offline_geocoder import ReverseGeocoder
+from opportunities import build_metadata
+from suggest import FIELDS, MAX_WORDS, TOP_K, SuggestIndex
+
+PREFIXES = ["w", "wa", "P", "fund", "Fundacja", "lodz", "Łódź", "archidiecezji gd", "dom", "#12", "zzzz", " ", "ś"]
+
+
+@pytest.fixture(scope="module")
+def seeded(records):
+    # Scaled up so the one- and two-letter prefixes span more than SCAN_LIMIT keys
+    offers = list(corpus.scaled(records, 1500))
+    geocoder = ReverseGeocoder.from_csv()
+    return [r["uuid"] for r in offers], [build_metadata(r, corpus.offline_city(geocoder, r)) for r in offers]
+
+
+def words(text):
+    return re.findall(r"[a-z0-9]+", fold(text))
+
+
+def prefix_match(metadatas, prefix, n):
+    """Most popular values with a word (among their first MAX_WORDS) starting with `prefix`."""
+    wanted = " ".join(words(prefix))
+    if not wanted:
+        return []
+    values, counts = {}, {}
+    for metadata in metadatas:
+        for field, kind in FIELDS.items():
+            folded = " ".join(words(str(metadata.get(field) or "")))
+            if folded:
+                values.setdefault((kind, folded), str(metadata[field]).strip())
+                counts[(kind, folded)] = counts.get((kind, folded), 0) + 1
+    found = [key for key in values
+             if any(" ".join(key[1].split(" ")[i:]).startswith(wanted)
+                    for i in range(min(len(key[1].split(" ")), MAX_WORDS)))]
+    found.sort(key=lambda key: (-counts[key], key[1]))
+    return [{"type": kind, "value": values[(kind, folded)], "count": counts[(kind, folded)]}
+            for kind, folded in found[:n]]
+
+
+@pytest.mark.parametrize("prefix", PREFIXES)
+def test_suggestions_match_a_prefix_scan(seeded, prefix):
+    ids, metadatas = seeded
+    index = SuggestIndex()
+    index.add(ids, metadatas)
+    index.prime()
+
+    assert index.suggest(prefix, TOP_K) == prefix_match(metadatas, prefix, TOP_K)
+    assert index.suggest(prefix, 3) == prefix_match(metadatas, prefix, 3)
+
+
+def test_cached_prefixes_stay_exact_after_adds(seeded):
+    ids, metadatas = seeded
+    index = SuggestIndex()
+    index.add(ids[:500], metadatas[:500])
+    index.prime()
+
+    # One by one, as /add_opportunity does
+    for record_id, metadata in zip(ids[500:], metadatas[500:]):
+        index.add([record_id], [metadata])
+
+    for prefix in PREFIXES:
+        assert index.suggest(prefix, TOP_K) == prefix_match(metadatas, prefix, TOP_K), prefix
+    assert any(index.suggest(prefix) for prefix in PREFIXES)
@@ -0,0 +1,233 @@
+"""In-memory vector index for the opportunity corpus.
+
+Keeps unit-normalized float32 embeddings in one NumPy matrix next to the
+ids, documents and metadata, so cosine top-k is a single matrix-vector
+product. The matrix can be snapshotted to a `.npy` file and re-opened
+memory-mapped, which lets new workers start without pulling vectors from
+Chroma again. Filters are evaluated on a columnar copy of the metadata
+(see columnar.py); a lat/lon box only looks at the rows of the grid cells
+it overlaps (see geo.py).
+
+With `quantization` set to "int8" or "binary" the index also keeps
+compressed codes of every row (see quantization.py). A query then scores
+the codes, keeps the best `n_results * rerank_factor` candidates and
+re-ranks only those against the float32 rows, so returned distances are
+exact. Opened from a memory-mapped snapshot, only the candidate rows of
+the float32 matrix are read from disk.
+"""
+import json
+import os
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from columnar import MetadataColumns
+from geo import GridIndex, bbox_from_where
+from paging import iter_collection
+from quantization import QUANTIZATIONS, QuantizedCodes, normalize_rows
+
+
+class LocalVectorIndex:
+    def __init__(self, dim: Optional[int] = None, quantization: str = "none", rerank_factor: int = 4):
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unknown quantization: {quantization}")
+        self.dim = dim
+        self.quantization = quantization
+        self.rerank_factor = max(1, rerank_factor)
+        self.codes: Optional[QuantizedCodes] = None
+        self.ids: List[str] = []
+        self.documents: List[str] = []
+        self.metadatas: List[Dict[str, Any]] = []
+        self._rows: Dict[str, int] = {}
+        self.columns = MetadataColumns()
+        self.grid = GridIndex()
+        self._matrix = np.zeros((0, dim or 0), dtype=np.float32)
+        self._size = 0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def row(self, record_id: str) -> Optional[int]:
+        """Row of `record_id`, or None if it is not stored."""
+        return self._rows.get(record_id)
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """Normalized embeddings of the live rows (a view, do not mutate)."""
+        return self._matrix[:self._size]
+
+    @property
+    def nbytes(self) -> Dict[str, int]:
+        """Bytes held by the float32 rows and by the quantized codes."""
+        return {"vectors": self.matrix.nbytes, "codes": self.codes.nbytes if self.codes is not None else 0}
+
+    def _reserve(self, extra: int) -> None:
+        needed = self._size + extra
+        capacity = self._matrix.shape[0]
+        if needed <= capacity and self._matrix.flags.writeable:
+            return
+        new_capacity = max(needed, capacity * 2, 64)
+        grown = np.zeros((new_capacity, self.dim), dtype=np.float32)
+        grown[:self._size] = self._matrix[:self._size]
+        self._matrix = grown
+
+    # ----------------- Writes -----------------
+    def add(
+        self,
+        ids: List[str],
+        embeddings: Iterable[Iterable[float]],
+        documents: List[str],
+        metadatas: List[Dict[str, Any]],
+    ) -> None:
+        """Insert or replace rows; ids already present are overwritten in place."""
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if vectors.ndim != 2 or len(vectors) != len(ids):
+            raise ValueError("embeddings must be a 2D array with one row per id")
+        with self._lock:
+            if self.dim is None or self._size == 0 and self._matrix.shape[1] != vectors.shape[1]:
+                self.dim = vectors.shape[1]
+                self._matrix = np.zeros((0, self.dim), dtype=np.float32)
+                self.codes = None
+            if vectors.shape[1] != self.dim:
+                raise ValueError(f"Expected {self.dim}-dimensional embeddings, got {vectors.shape[1]}")
+            vectors = normalize_rows(vectors)
+            self._reserve(len(ids))
+            if self.quantization != "none" and self.codes is None:
+                self.codes = QuantizedCodes(self.quantization, self.dim)
+            for record_id, vector, document, metadata in zip(ids, vectors, documents, metadatas):
+                row = self._rows.get(record_id)
+                if row is None:
+                    row = self._size
+                    self._rows[record_id] = row
+                    self.ids.append(record_id)
+                    self.documents.append(document)
+                    self.metadatas.append(metadata)
+                    self._size += 1
+                else:
+                    self.documents[row] = document
+                    self.metadatas[row] = metadata
+                self._matrix[row] = vector
+                if self.codes is not None:
+                    self.codes.set(row, vector[None, :])
+                self.columns.set(row, metadata)
+                self.grid.set(row, metadata)
+
+    # ----------------- Reads -----------------
+    def _where_rows(self, where: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        if not where:
+            return None
+        bbox = bbox_from_where(where)
+        if bbox is None:
+            return np.flatnonzero(self.columns.mask(where, self.metadatas))
+        candidates = self.grid.rows_in_bbox(bbox)
+        return candidates[self.columns.mask(where, self.metadatas, candidates)]
+
+    def _scores(self, query: np.ndarray, rows: Optional[np.ndarray], k: int):
+        """(rows, exact cosine scores) to pick the top k from: every row, or a re-ranked shortlist."""
+        if self.codes is None:
+            matrix = self.matrix if rows is None else self.matrix[rows]
+            return (np.arange(self._size) if rows is None else rows), matrix @ query
+        size = self._size if rows is None else len(rows)
+        shortlist = min(size, k * self.rerank_factor)
+        approx = self.codes.scores(query, self._size, rows)
+        if shortlist < size:
+            top = np.argpartition(-approx, shortlist - 1)[:shortlist]
+        else:
+            top = np.arange(size)
+        candidates = np.sort(top if rows is None else rows[top])  # sorted: sequential reads on a mmap
+        return candidates, self._matrix[candidates] @ query
+
+    def query(self, query_embeddings: List[List[float]], n_results: int = 25,
+              where: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Cosine top-k, returned in the same nested shape as `Collection.query`.
+        Distances are `2 - 2*cos`, i.e. Chroma's default squared L2 on unit vectors.
+        """
+        out = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        queries = normalize_rows(np.asarray(query_embeddings, dtype=np.float32))
+        with self._lock:
+            rows = self._where_rows(where)
+            k = min(n_results, self._size if rows is None else len(rows))
+            for query in queries:
+                if k == 0:
+                    candidates, scores, top = rows, np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.int64)
+                else:
+                    candidates, scores = self._scores(query, rows, k)
+                    if k < len(scores):
+                        top = np.argpartition(-scores, k - 1)[:k]
+                        top = top[np.argsort(-scores[top])]
+                    else:
+                        top = np.argsort(-scores)
+                distances = [float(2.0 - 2.0 * scores[i]) for i in top]
+                top = candidates[top] if len(top) else top
+                out["ids"].append([self.ids[i] for i in top])
+                out["documents"].append([self.documents[i] for i in top])
+                out["metadatas"].append([self.metadatas[i] for i in top])
+                out["distances"].append(distances)
+        return out
+
+    def get(self, where: Optional[Dict[str, Any]] = None,
+            limit: Optional[int] = None, offset: Optional[int] = None) -> Dict[str, Any]:
+        """Matching rows (all by default), in the same flat shape as `Collection.get`."""
+        with self._lock:
+            rows = self._where_rows(where)
+            if rows is None:
+                rows = range(self._size)
+            start = offset or 0
+            rows = rows[start:None if limit is None else start + limit]
+            return {
+                "ids": [self.ids[i] for i in rows],
+                "documents": [self.documents[i] for i in rows],
+                "metadatas": [self.metadatas[i] for i in rows],
+            }
+
+    # ----------------- Sync / snapshot -----------------
+    def sync_from_collection(self, collection, batch_size: int = 500) -> None:
+        """Page every record (with embeddings) out of a Chroma collection."""
+        for batch in iter_collection(collection, ["embeddings", "documents", "metadatas"], batch_size):
+            self.add(batch["ids"], batch["embeddings"], batch["documents"], batch["metadatas"])
+
+    def sync_missing(self, collection, batch_size: int = 500) -> int:
+        """Fetch only the records whose ids are not in the index yet. Returns records added."""
+        missing = [record_id for batch in iter_collection(collection, [], batch_size)
+                   for record_id in batch["ids"] if self.row(record_id) is None]
+        for start in range(0, len(missing), batch_size):
+            batch = collection.get(ids=missing[start:start + batch_size],
+                                   include=["embeddings", "documents", "metadatas"])
+            self.add(batch["ids"], batch["embeddings"], batch["documents"], batch["metadatas"])
+        return len(missing)
+
+    def save(self, path: str) -> None:
+        """Write `<path>` (float32 matrix) and `<path>.json` (ids, documents, metadata)."""
+        with self._lock:
+            tmp = path + ".tmp.npy"
+            np.save(tmp, np.ascontiguousarray(self.matrix))
+            with open(path + ".json.tmp", "w", encoding="utf-8") as f:
+                json.dump(
+                    {"ids": self.ids, "documents": self.documents, "metadatas": self.metadatas},
+                    f, ensure_ascii=False,
+                )
+        os.replace(tmp, path)
+        os.replace(path + ".json.tmp", path + ".json")
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True, quantization: str = "none",
+             rerank_factor: int = 4) -> "LocalVectorIndex":
+        """Open a snapshot; with `mmap` the matrix stays on disk until the first write."""
+        matrix = np.load(path, mmap_mode="r" if mmap else None)
+        with open(path + ".json", encoding="utf-8") as f:
+            sidecar = json.load(f)
+        index = cls(dim=matrix.shape[1], quantization=quantization, rerank_factor=rerank_factor)
+        index._matrix = matrix
+        index._size = matrix.shape[0]
+        index.ids = sidecar["ids"]
+        index.documents = sidecar["documents"]
+        index.metadatas = sidecar["metadatas"]
+        index._rows = {record_id: row for row, record_id in enumerate(index.ids)}
+        index.columns = MetadataColumns.from_metadatas(index.metadatas)
+        index.grid = GridIndex.from_metadatas(index.metadatas)
+        if quantization != "none":
+            index.codes = QuantizedCodes.build(quantization, matrix)
+        return index